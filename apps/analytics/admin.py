@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .models import CreatorDailyStats, TripDailyStats
+
+
+@admin.register(TripDailyStats)
+class TripDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['trip', 'day', 'bookings', 'confirmations', 'cancellations', 'revenue']
+    list_filter = ['day']
+    raw_id_fields = ['trip']
+
+
+@admin.register(CreatorDailyStats)
+class CreatorDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['creator', 'day', 'bookings', 'confirmations', 'cancellations', 'revenue']
+    list_filter = ['day']
+    raw_id_fields = ['creator']
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.analytics.rollups import rebuild
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the daily analytics rollups from the bookings table
+    Why: Backfill existing bookings, and repair rows written with
+    bulk_create/update() outside the booking signals
+    Usage: python manage.py rebuild_analytics
+    """
+    help = 'Recompute the trip and creator daily analytics rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        trip_rows, creator_rows = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {trip_rows} trip and {creator_rows} creator daily rows'
+        ))
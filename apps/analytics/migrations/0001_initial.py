@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trips', '0005_tripimage_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('confirmations', models.PositiveIntegerField(default=0)),
+                ('cancellations', models.PositiveIntegerField(default=0)),
+                ('seats_confirmed', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='trips.trip')),
+            ],
+            options={
+                'db_table': 'analytics_trip_daily',
+                'unique_together': {('trip', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CreatorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('confirmations', models.PositiveIntegerField(default=0)),
+                ('cancellations', models.PositiveIntegerField(default=0)),
+                ('seats_confirmed', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('creator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'analytics_creator_daily',
+                'unique_together': {('creator', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from apps.trips.models import Trip
+
+METRICS = ['bookings', 'confirmations', 'cancellations', 'seats_confirmed', 'revenue']
+INTERVALS = {'day': None, 'week': TruncWeek, 'month': TruncMonth}
+
+
+class DailyStatsQuerySet(models.QuerySet):
+    """Incremental writes and range reads on a daily rollup table"""
+
+    def add(self, day, deltas, **keys):
+        """
+        Add `deltas` to the row for `keys` and `day`, creating it if needed
+        Why: One UPDATE ... SET x = x + n per event - concurrent writers can't
+        lose each other's increments the way read-modify-write would
+        """
+        updates = {metric: F(metric) + value for metric, value in deltas.items() if value}
+        if not updates:
+            return
+        rows = self.filter(day=day, **keys)
+        if rows.update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                self.create(day=day, **keys, **deltas)
+        except IntegrityError:
+            # Another transaction created the row first
+            rows.update(**updates)
+
+    def in_range(self, start, end):
+        return self.filter(day__gte=start, day__lte=end)
+
+    def totals(self):
+        """Metrics summed over the queryset - zero when there are no rows"""
+        totals = self.aggregate(**{metric: Sum(metric) for metric in METRICS})
+        return {metric: value or 0 for metric, value in totals.items()}
+
+    def series(self, interval='day'):
+        """Metrics summed per day/week/month, oldest first"""
+        trunc = INTERVALS[interval]
+        period = trunc('day') if trunc else F('day')
+        return (
+            self.annotate(period=period).order_by().values('period')
+            .annotate(**{metric: Sum(metric) for metric in METRICS})
+            .order_by('period')
+        )
+
+
+class DailyStats(models.Model):
+    """
+    Booking activity of one day, recorded when it happens
+    Why: Revenue and occupancy over time would otherwise mean scanning bookings
+    All metrics are changes on that day - seats_confirmed and revenue go
+    down when a confirmed booking is cancelled
+    """
+    day = models.DateField()
+    bookings = models.PositiveIntegerField(default=0)
+    confirmations = models.PositiveIntegerField(default=0)
+    cancellations = models.PositiveIntegerField(default=0)
+    seats_confirmed = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    objects = DailyStatsQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+
+class TripDailyStats(DailyStats):
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta:
+        db_table = 'analytics_trip_daily'
+        unique_together = ['trip', 'day']
+
+
+class CreatorDailyStats(DailyStats):
+    """Sum of TripDailyStats over the creator's trips - kept after a trip is deleted"""
+    creator = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_stats'
+    )
+
+    class Meta:
+        db_table = 'analytics_creator_daily'
+        unique_together = ['creator', 'day']
@@ -0,0 +1,120 @@
+"""
+Maintenance of the daily rollup tables
+Why: Creator analytics must not scan the bookings table per request
+What: Booking events become per-day metric changes that are added to the
+trip and creator rows in the same transaction as the booking change.
+rebuild() recomputes both tables from the bookings themselves.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from .models import METRICS, CreatorDailyStats, TripDailyStats
+
+
+def _empty():
+    return dict.fromkeys(METRICS, 0)
+
+
+def transition_deltas(from_status, to_status, seats, amount):
+    if to_status == 'confirmed':
+        return {'confirmations': 1, 'seats_confirmed': seats, 'revenue': amount}
+    if to_status == 'cancelled':
+        deltas = {'cancellations': 1}
+        if from_status == 'confirmed':
+            deltas.update(seats_confirmed=-seats, revenue=-amount)
+        return deltas
+    return {}
+
+
+def apply(events):
+    """
+    Add (trip_id, creator_id, day, deltas) events to both tables
+    Events for the same row are merged first - one write per row
+    """
+    trips, creators = defaultdict(_empty), defaultdict(_empty)
+    for trip_id, creator_id, day, deltas in events:
+        for metric, value in deltas.items():
+            trips[trip_id, day][metric] += value
+            creators[creator_id, day][metric] += value
+    for (trip_id, day), deltas in trips.items():
+        TripDailyStats.objects.add(day, deltas, trip_id=trip_id)
+    for (creator_id, day), deltas in creators.items():
+        CreatorDailyStats.objects.add(day, deltas, creator_id=creator_id)
+
+
+def record_bookings(bookings):
+    """New bookings, counted on the day they were made"""
+    events = []
+    for booking in bookings:
+        # Bookings are normally created pending; admin/imports may not be
+        deltas = {
+            'bookings': 1,
+            **transition_deltas(None, booking.status, booking.number_of_people, booking.total_price),
+        }
+        day = timezone.localdate(booking.booking_date)
+        events.append((booking.trip_id, booking.trip.creator_id, day, deltas))
+    apply(events)
+
+
+def record_transitions(changes, to_status):
+    """Confirmations/cancellations, counted today - changes are (booking, from_status) pairs"""
+    today = timezone.localdate()
+    apply(
+        (
+            booking.trip_id, booking.trip.creator_id, today,
+            transition_deltas(from_status, to_status, booking.number_of_people, booking.total_price),
+        )
+        for booking, from_status in changes
+    )
+
+
+def rebuild(batch_size=1000):
+    """
+    Recompute both tables from the bookings table
+    Bookings only keep their current status, so a booking's last status
+    change is dated by updated_at, and a cancelled booking counts as a
+    cancellation that never earned revenue. Totals match the trips' counters.
+    Returns the number of (trip rows, creator rows) written
+    """
+    def per_day(bookings, date_field):
+        return bookings.order_by().values('trip_id', 'trip__creator_id', day=TruncDate(date_field))
+
+    created = per_day(Booking.objects.all(), 'booking_date').annotate(
+        bookings=Count('id'),
+    )
+    confirmed = per_day(Booking.objects.filter(status='confirmed'), 'updated_at').annotate(
+        confirmations=Count('id'),
+        seats_confirmed=Sum('number_of_people'),
+        revenue=Sum('total_price'),
+    )
+    cancelled = per_day(Booking.objects.filter(status='cancelled'), 'updated_at').annotate(
+        cancellations=Count('id'),
+    )
+
+    trips, creators = defaultdict(_empty), defaultdict(_empty)
+    for rows in (created, confirmed, cancelled):
+        for row in rows.iterator():
+            trip_id, creator_id, day = row.pop('trip_id'), row.pop('trip__creator_id'), row.pop('day')
+            for metric, value in row.items():
+                trips[trip_id, day][metric] += value
+                creators[creator_id, day][metric] += value
+
+    with transaction.atomic():
+        TripDailyStats.objects.all().delete()
+        CreatorDailyStats.objects.all().delete()
+        TripDailyStats.objects.bulk_create(
+            (TripDailyStats(trip_id=trip_id, day=day, **metrics)
+             for (trip_id, day), metrics in trips.items()),
+            batch_size=batch_size,
+        )
+        CreatorDailyStats.objects.bulk_create(
+            (CreatorDailyStats(creator_id=creator_id, day=day, **metrics)
+             for (creator_id, day), metrics in creators.items()),
+            batch_size=batch_size,
+        )
+    return len(trips), len(creators)
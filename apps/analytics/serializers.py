@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import INTERVALS
+
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 731
+
+
+class RangeSerializer(serializers.Serializer):
+    """
+    Query parameters of the analytics endpoints
+    Defaults to the last 30 days, one row per day
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    interval = serializers.ChoiceField(choices=list(INTERVALS), default='day')
+
+    def validate(self, attrs):
+        end = attrs.get('end') or timezone.localdate()
+        start = attrs.get('start') or end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+        if start > end:
+            raise serializers.ValidationError({'start': 'Must not be after end'})
+        if (end - start).days >= MAX_RANGE_DAYS:
+            raise serializers.ValidationError(f'Range is limited to {MAX_RANGE_DAYS} days')
+        return dict(attrs, start=start, end=end)
+
+
+class StatsSerializer(serializers.Serializer):
+    """Summed rollup metrics"""
+    bookings = serializers.IntegerField()
+    confirmations = serializers.IntegerField()
+    cancellations = serializers.IntegerField()
+    seats_confirmed = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class PeriodStatsSerializer(StatsSerializer):
+    period = serializers.DateField()
+
+
+class TripPeriodStatsSerializer(PeriodStatsSerializer):
+    """A trip's period with its confirmed seats and occupancy at the end of it"""
+    total_seats_confirmed = serializers.IntegerField()
+    occupancy_rate = serializers.FloatField()
+
+
+class TripStatsSerializer(StatsSerializer):
+    trip_id = serializers.IntegerField()
+    title = serializers.CharField()
+    occupancy_rate = serializers.FloatField()
@@ -0,0 +1,33 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.bookings.models import Booking
+from apps.bookings.signals import (
+    booking_status_changed, bookings_bulk_created, bookings_bulk_status_changed,
+)
+from .rollups import record_bookings, record_transitions
+
+
+# All of these run inside the booking's transaction, so the rollups commit
+# or roll back together with the booking change
+@receiver(post_save, sender=Booking)
+def record_new_booking(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_bookings([instance])
+
+
+@receiver(bookings_bulk_created)
+def record_bulk_bookings(sender, bookings, **kwargs):
+    record_bookings(bookings)
+
+
+@receiver(booking_status_changed)
+def record_status_change(sender, booking, from_status, to_status, bulk=False, **kwargs):
+    # Bulk transitions are recorded once per batch below
+    if not bulk:
+        record_transitions([(booking, from_status)], to_status)
+
+
+@receiver(bookings_bulk_status_changed)
+def record_bulk_status_change(sender, bookings, to_status, **kwargs):
+    record_transitions([(booking, booking.previous_status) for booking in bookings], to_status)
@@ -0,0 +1,129 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from apps.bookings.tests import make_trip, make_user
+from .models import CreatorDailyStats, TripDailyStats
+from .rollups import rebuild
+
+
+class RollupTests(APITestCase):
+    """Booking actions keep the daily rollups in step with the trip counters"""
+
+    def setUp(self):
+        self.creator = make_user('creator')
+        self.trip = make_trip(self.creator, max_participants=10)
+        self.other = make_trip(self.creator, max_participants=10, title='Tea Gardens')
+
+    def book(self, username, trip=None, seats=2):
+        self.client.force_authenticate(make_user(username))
+        response = self.client.post(
+            reverse('booking-create'), {'trip_id': (trip or self.trip).id, 'participants': seats}
+        )
+        return response.data['id']
+
+    def row(self, model=TripDailyStats, **keys):
+        return model.objects.values(
+            'bookings', 'confirmations', 'cancellations', 'seats_confirmed', 'revenue'
+        ).get(day=timezone.localdate(), **keys)
+
+    def test_booking_actions_update_trip_and_creator_rows(self):
+        first, second = self.book('asha'), self.book('rafi', trip=self.other, seats=3)
+        self.client.force_authenticate(self.creator)
+        self.client.post(reverse('confirm-booking', args=[self.trip.id, first]))
+        self.client.post(reverse('confirm-booking', args=[self.other.id, second]))
+        self.client.force_authenticate(self.trip.bookings.get().user)
+        self.client.post(reverse('cancel-booking', args=[first]))
+
+        self.assertEqual(self.row(trip=self.trip), {
+            'bookings': 1, 'confirmations': 1, 'cancellations': 1,
+            'seats_confirmed': 0, 'revenue': Decimal('0.00'),
+        })
+        self.assertEqual(self.row(CreatorDailyStats, creator=self.creator), {
+            'bookings': 2, 'confirmations': 2, 'cancellations': 1,
+            'seats_confirmed': 3, 'revenue': Decimal('300.00'),
+        })
+
+    def test_bulk_confirm_writes_each_row_once(self):
+        ids = [self.book(f'customer{i}') for i in range(3)]
+        self.client.force_authenticate(self.creator)
+        url = reverse('booking-bulk-confirm', args=[self.trip.id])
+        # One UPDATE per rollup row (trip, creator), whatever the number of bookings
+        with self.assertNumQueries(8):
+            response = self.client.post(url, {'booking_ids': ids}, format='json')
+        self.assertEqual(response.data['succeeded'], 3)
+        self.assertEqual(self.row(trip=self.trip)['revenue'], Decimal('600.00'))
+
+    def test_rebuild_matches_trip_counters(self):
+        ids = [self.book(f'customer{i}') for i in range(3)]
+        self.client.force_authenticate(self.creator)
+        self.client.post(reverse('booking-bulk-confirm', args=[self.trip.id]), {'booking_ids': ids[:2]}, format='json')
+        TripDailyStats.objects.all().delete()
+
+        self.assertEqual(rebuild(), (1, 1))
+        self.trip.refresh_from_db()
+        row = self.row(trip=self.trip)
+        self.assertEqual(row['bookings'], 3)
+        self.assertEqual(row['seats_confirmed'], self.trip.confirmed_seats)
+        self.assertEqual(row['revenue'], self.trip.total_revenue())
+
+
+class AnalyticsAPITests(APITestCase):
+    """Range queries are answered from the rollups"""
+
+    def setUp(self):
+        self.creator = make_user('creator')
+        self.trip = make_trip(self.creator, max_participants=10, confirmed_seats=4)
+        self.other = make_trip(self.creator, max_participants=10, title='Tea Gardens')
+        start = date(2030, 1, 1)
+        for offset, (trip, seats, revenue) in enumerate([
+            (self.trip, 2, '200.00'), (self.trip, 2, '200.00'), (self.other, 1, '100.00'),
+        ]):
+            day = start + timedelta(days=offset * 10)
+            deltas = {'bookings': 1, 'confirmations': 1, 'seats_confirmed': seats,
+                      'revenue': Decimal(revenue)}
+            TripDailyStats.objects.add(day, deltas, trip=trip)
+            CreatorDailyStats.objects.add(day, deltas, creator=self.creator)
+        self.client.force_authenticate(self.creator)
+
+    def test_creator_totals_and_series(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('creator-analytics'), {'start': '2030-01-05', 'end': '2030-03-01', 'interval': 'month'}
+            )
+        self.assertEqual(response.data['totals']['revenue'], '300.00')
+        self.assertEqual(response.data['totals']['bookings'], 2)
+        self.assertEqual(response.data['occupancy_rate'], 0.2)
+        self.assertEqual(response.data['series'], [
+            {'period': '2030-01-01', 'bookings': 2, 'confirmations': 2, 'cancellations': 0,
+             'seats_confirmed': 3, 'revenue': '300.00'},
+        ])
+
+    def test_revenue_per_trip(self):
+        response = self.client.get(
+            reverse('creator-trip-analytics'), {'start': '2030-01-01', 'end': '2030-12-31'}
+        )
+        trips = response.data['trips']
+        self.assertEqual([trip['trip_id'] for trip in trips], [self.trip.id, self.other.id])
+        self.assertEqual(trips[0]['revenue'], '400.00')
+        self.assertEqual(trips[0]['occupancy_rate'], 0.4)
+
+    def test_trip_occupancy_over_time(self):
+        response = self.client.get(
+            reverse('trip-analytics', args=[self.trip.id]), {'start': '2030-01-05', 'end': '2030-01-31'}
+        )
+        self.assertEqual(response.data['totals']['seats_confirmed'], 2)
+        # Seats confirmed before the range count towards occupancy
+        self.assertEqual(response.data['series'][0]['total_seats_confirmed'], 4)
+        self.assertEqual(response.data['series'][0]['occupancy_rate'], 0.4)
+
+    def test_only_own_trips_and_valid_ranges(self):
+        self.client.force_authenticate(make_user('stranger'))
+        self.assertEqual(self.client.get(reverse('trip-analytics', args=[self.trip.id])).status_code, 404)
+        response = self.client.get(reverse('creator-analytics'), {'start': '2030-02-01', 'end': '2030-01-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('creator-analytics'))
+        self.assertEqual(response.data['totals']['revenue'], '0.00')
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('creator/', views.creator_analytics, name='creator-analytics'),
+    path('creator/trips/', views.creator_trip_analytics, name='creator-trip-analytics'),
+    path('trips/<int:trip_pk>/', views.trip_analytics, name='trip-analytics'),
+]
@@ -0,0 +1,108 @@
+from django.db.models import F, Sum
+from django.shortcuts import get_object_or_404
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from apps.trips.models import Trip
+from .models import METRICS, CreatorDailyStats, TripDailyStats
+from .serializers import (
+    PeriodStatsSerializer, RangeSerializer, StatsSerializer, TripPeriodStatsSerializer,
+    TripStatsSerializer,
+)
+
+
+def range_params(request):
+    params = RangeSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    return params.validated_data
+
+
+def occupancy(seats, capacity):
+    return round(seats / capacity, 4) if capacity else 0.0
+
+
+def range_response(params, **data):
+    return Response({
+        'start': params['start'],
+        'end': params['end'],
+        'interval': params['interval'],
+        **data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def creator_analytics(request):
+    """
+    Booking activity and revenue across the current user's trips
+    Why: Creators want revenue and bookings over time, not just a total
+    What: Totals and a day/week/month series for ?start=&end=&interval=,
+    read from the creator rollup, plus current occupancy of all their trips
+    """
+    params = range_params(request)
+    stats = CreatorDailyStats.objects.filter(creator=request.user).in_range(params['start'], params['end'])
+    seats = Trip.objects.filter(creator=request.user).aggregate(
+        confirmed=Sum('confirmed_seats'), capacity=Sum('max_participants')
+    )
+    return range_response(
+        params,
+        totals=StatsSerializer(stats.totals()).data,
+        occupancy_rate=occupancy(seats['confirmed'] or 0, seats['capacity']),
+        series=PeriodStatsSerializer(stats.series(params['interval']), many=True).data,
+    )
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def creator_trip_analytics(request):
+    """
+    Revenue per trip
+    Why: Which of a creator's trips earn the most in a period
+    What: The trip rollup grouped by trip for ?start=&end=, highest revenue
+    first - trips without activity in the range are left out
+    """
+    params = range_params(request)
+    rows = (
+        TripDailyStats.objects.filter(trip__creator=request.user)
+        .in_range(params['start'], params['end'])
+        .order_by()
+        .values('trip_id', title=F('trip__title'), confirmed=F('trip__confirmed_seats'),
+                capacity=F('trip__max_participants'))
+        .annotate(**{metric: Sum(metric) for metric in METRICS})
+        .order_by('-revenue', 'trip_id')
+    )
+    trips = [dict(row, occupancy_rate=occupancy(row['confirmed'], row['capacity'])) for row in rows]
+    return range_response(params, trips=TripStatsSerializer(trips, many=True).data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def trip_analytics(request, trip_pk):
+    """
+    Booking activity and occupancy of one of the current user's trips
+    What: Totals and a series for ?start=&end=&interval= - each period also
+    carries the confirmed seats and occupancy rate at its end
+    """
+    trip = get_object_or_404(Trip, pk=trip_pk, creator=request.user)
+    params = range_params(request)
+    stats = TripDailyStats.objects.filter(trip=trip)
+    series = list(stats.in_range(params['start'], params['end']).series(params['interval']))
+
+    # Running total from the seats confirmed before the range
+    seats = stats.filter(day__lt=params['start']).aggregate(seats=Sum('seats_confirmed'))['seats'] or 0
+    for period in series:
+        seats += period['seats_confirmed']
+        period.update(
+            total_seats_confirmed=seats,
+            occupancy_rate=occupancy(seats, trip.max_participants),
+        )
+    return range_response(
+        params,
+        trip_id=trip.id,
+        max_participants=trip.max_participants,
+        confirmed_seats=trip.confirmed_seats,
+        occupancy_rate=occupancy(trip.confirmed_seats, trip.max_participants),
+        totals=StatsSerializer(stats.in_range(params['start'], params['end']).totals()).data,
+        series=TripPeriodStatsSerializer(series, many=True).data,
+    )
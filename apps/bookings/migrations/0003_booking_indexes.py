@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_booking_special_requests_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['trip', 'status'], name='bookings_trip_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-booking_date'], name='bookings_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'confirmed')), fields=['trip'], name='bookings_confirmed_trip_idx'),
+        ),
+    ]
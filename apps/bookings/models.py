@@ -2,12 +2,159 @@ from django.db import models
 from django.conf import settings
 
 # Create your models here.
+from collections import defaultdict
 from django.db import models
 from django.contrib.auth import get_user_model
-from apps.trips.models import Trip
+from django.utils import timezone
+from apps.trips.models import SeatInventoryError, Trip
+from sharetrip.transactions import write_atomic
+from .signals import booking_status_changed, bookings_bulk_created, bookings_bulk_status_changed
 
 User = get_user_model()
 
+class BookingQuerySet(models.QuerySet):
+    """
+    Reusable query building blocks for bookings
+    Why: Nested trip data in booking lists must not cost queries per row
+    """
+    
+    def with_listing_relations(self):
+        """
+        Load user, trip, trip creator and trip images in bulk
+        Why: Prefetching the trip (instead of select_related) gives every
+        booking of the same trip one shared Trip instance, so its images
+        and stats are loaded and computed once per response
+        """
+        return self.select_related('user').prefetch_related(
+            models.Prefetch('trip', queryset=Trip.objects.with_listing_stats())
+        )
+    
+    # Bulk operations
+    # Why: Group bookings and post-sale confirmations touch hundreds of rows;
+    # these do it in one transaction with one write per table (and per trip)
+    def bulk_book(self, user, items):
+        """
+        Create pending bookings for `user` from validated items
+        items: dicts with trip_id, number_of_people and special_requests
+        Returns one result per item: {'booking': Booking} or {'error': message}
+        """
+        results = [None] * len(items)
+        trip_ids = {item['trip_id'] for item in items}
+        
+        with write_atomic():
+            # Lock the trips so the capacity check below can't go stale
+            trips = Trip.objects.select_for_update().filter(
+                id__in=trip_ids, status='published'
+            ).in_bulk()
+            booked = set(self.filter(user=user, trip_id__in=trip_ids).values_list('trip_id', flat=True))
+            remaining = {trip_id: trip.available_spots() for trip_id, trip in trips.items()}
+            
+            # One pass over the items - check capacity per trip in memory
+            accepted = defaultdict(list)
+            for index, item in enumerate(items):
+                trip = trips.get(item['trip_id'])
+                seats = item['number_of_people']
+                if trip is None:
+                    results[index] = {'error': 'Trip not found or not available'}
+                elif trip.id in booked:
+                    results[index] = {'error': 'You have already booked this trip'}
+                elif seats > remaining[trip.id]:
+                    results[index] = {'error': f'Only {remaining[trip.id]} spots available'}
+                else:
+                    remaining[trip.id] -= seats
+                    booked.add(trip.id)
+                    accepted[trip.id].append(index)
+            
+            # Reserve each trip's seats with one conditional UPDATE
+            bookings = []
+            for trip_id, indexes in accepted.items():
+                trip = trips[trip_id]
+                seats = sum(items[index]['number_of_people'] for index in indexes)
+                if not trip.reserve_seats(seats):
+                    for index in indexes:
+                        results[index] = {'error': 'Trip is fully booked'}
+                    continue
+                for index in indexes:
+                    item = items[index]
+                    bookings.append(Booking(
+                        user=user,
+                        trip=trip,
+                        number_of_people=item['number_of_people'],
+                        special_requests=item.get('special_requests', ''),
+                        total_price=item['number_of_people'] * trip.price_per_person,
+                    ))
+                    results[index] = {'booking': bookings[-1]}
+            
+            Booking.objects.bulk_create(bookings)
+            bookings_bulk_created.send(sender=Booking, bookings=bookings)
+        return results
+    
+    def bulk_confirm(self):
+        """
+        Confirm every pending booking in this queryset
+        Returns {booking_id: error message or None} for the bookings found
+        """
+        return self._bulk_transition(['pending'], 'confirmed', 'Only pending bookings can be confirmed')
+    
+    def bulk_cancel(self):
+        """
+        Cancel every pending or confirmed booking in this queryset
+        Returns {booking_id: error message or None} for the bookings found
+        """
+        return self._bulk_transition(['pending', 'confirmed'], 'cancelled', 'Booking already cancelled')
+    
+    def _bulk_transition(self, from_statuses, to_status, error):
+        results = {}
+        with write_atomic():
+            bookings = list(self.select_for_update().select_related('trip'))
+            changed = []
+            now = timezone.now()
+            for booking in bookings:
+                if booking.status in from_statuses:
+                    booking.previous_status = booking.status
+                    booking.status = to_status
+                    booking.updated_at = now
+                    changed.append(booking)
+                    results[booking.id] = None
+                else:
+                    results[booking.id] = error
+            Booking.objects.bulk_update(changed, ['status', 'updated_at'])
+            
+            # Move seats once per trip, not once per booking
+            per_trip = defaultdict(lambda: {'pending': 0, 'confirmed': 0, 'revenue': 0})
+            trips = {}
+            for booking in changed:
+                totals = per_trip[booking.trip_id]
+                trips[booking.trip_id] = booking.trip
+                totals[booking.previous_status] += booking.number_of_people
+                if booking.previous_status == 'confirmed' or to_status == 'confirmed':
+                    totals['revenue'] += booking.total_price
+            for trip_id, totals in per_trip.items():
+                trip = trips[trip_id]
+                if to_status == 'confirmed':
+                    moved = trip.confirm_seats(totals['pending'], totals['revenue'])
+                else:
+                    moved = (
+                        (not totals['pending'] or trip.release_seats(totals['pending']))
+                        and (not totals['confirmed'] or trip.release_seats(
+                            totals['confirmed'], amount=totals['revenue'], confirmed=True
+                        ))
+                    )
+                if not moved:
+                    # Rolls back the whole batch - statuses included
+                    raise SeatInventoryError(f"Trip {trip_id}'s seat counters don't hold this batch's seats")
+            
+            for booking in changed:
+                booking_status_changed.send(
+                    sender=Booking,
+                    booking=booking,
+                    from_status=booking.previous_status,
+                    to_status=to_status,
+                    bulk=True
+                )
+            bookings_bulk_status_changed.send(sender=Booking, bookings=changed, to_status=to_status)
+        return results
+
 class Booking(models.Model):
     """
     Booking model represents a user's trip booking
@@ -36,13 +183,104 @@ class Booking(models.Model):
     booking_date = models.DateTimeField(auto_now_add=True)
     number_of_people = models.PositiveIntegerField(default=1)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    special_requests = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = BookingQuerySet.as_manager()
+    
+    # CSV/NDJSON export columns (sharetrip/exports.py) - name: lookup
+    EXPORT_COLUMNS = {
+        'id': 'id',
+        'trip_id': 'trip_id',
+        'trip_title': 'trip__title',
+        'trip_start_date': 'trip__start_date',
+        'user_id': 'user_id',
+        'username': 'user__username',
+        'email': 'user__email',
+        'status': 'status',
+        'participants': 'number_of_people',
+        'total_price': 'total_price',
+        'special_requests': 'special_requests',
+        'booking_date': 'booking_date',
+        'updated_at': 'updated_at',
+    }
     
     def __str__(self):
         return f"{self.user.username} - {self.trip.title}"
     
+    def _transition(self, from_status, to_status):
+        """
+        Move booking from one status to another with a conditional UPDATE
+        Why: Two concurrent confirm/cancel requests can't both succeed
+        """
+        updated = Booking.objects.filter(pk=self.pk, status=from_status).update(
+            status=to_status,
+            updated_at=timezone.now()
+        )
+        if updated:
+            self.status = to_status
+            booking_status_changed.send(
+                sender=Booking,
+                booking=self,
+                from_status=from_status,
+                to_status=to_status
+            )
+        return bool(updated)
+    
+    def confirm(self):
+        """
+        Confirm a pending booking and move its seats to confirmed
+        Returns False if the booking is no longer pending
+        """
+        with write_atomic():
+            if not self._transition('pending', 'confirmed'):
+                return False
+            if not self.trip.confirm_seats(self.number_of_people, self.total_price):
+                self.status = 'pending'
+                raise SeatInventoryError(
+                    f'Trip {self.trip_id} holds fewer than {self.number_of_people} pending seats'
+                )
+        return True
+    
+    def cancel(self):
+        """
+        Cancel a pending or confirmed booking and release its seats
+        Returns False if the booking is already cancelled
+        """
+        # Retry once if the status changed under us (e.g. confirmed meanwhile)
+        for _ in range(2):
+            previous_status = self.status
+            if previous_status == 'cancelled':
+                return False
+            with write_atomic():
+                if self._transition(previous_status, 'cancelled'):
+                    released = self.trip.release_seats(
+                        self.number_of_people,
+                        amount=self.total_price,
+                        confirmed=previous_status == 'confirmed'
+                    )
+                    if not released:
+                        self.status = previous_status
+                        raise SeatInventoryError(
+                            f'Trip {self.trip_id} holds fewer than {self.number_of_people} {previous_status} seats'
+                        )
+                    return True
+            self.refresh_from_db(fields=['status'])
+        return False
+    
     class Meta:
         db_table = 'bookings'
         unique_together = ['user', 'trip']
         ordering = ['-booking_date']
+        # Indexes for the query shapes the API actually runs
+        indexes = [
+            models.Index(fields=['trip', 'status'], name='bookings_trip_status_idx'),
+            models.Index(fields=['user', '-booking_date'], name='bookings_user_date_idx'),
+            models.Index(
+                fields=['trip'],
+                condition=models.Q(status='confirmed'),
+                name='bookings_confirmed_trip_idx',
+            ),
+        ]
         verbose_name = 'Booking'
         verbose_name_plural = 'Bookings'
\ No newline at end of file
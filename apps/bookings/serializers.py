@@ -1,29 +1,38 @@
 from rest_framework import serializers
 from .models import Booking
+from apps.trips.models import Trip
 from apps.trips.serializers import TripSerializer
 from apps.users.serializers import UserSerializer
+from sharetrip.compiled import CompiledRepresentationMixin
+from sharetrip.sparse import SparseFieldsMixin
+from sharetrip.transactions import write_atomic
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsMixin, CompiledRepresentationMixin, serializers.ModelSerializer):
     """
     Serializer for Booking model
     Why: Handle booking data with nested trip and user info
+    What: Lists render the card fields with a trip card - ?expand=user,trip.creator for more
     """
     # Nested serializers for complete information
     trip = TripSerializer(read_only=True)
     user = UserSerializer(read_only=True)
-    
+
     # Trip ID for creation
     trip_id = serializers.IntegerField(write_only=True)
-    
+    participants = serializers.IntegerField(source='number_of_people', default=1)
+
+    card_fields = ['id', 'trip', 'participants', 'total_price', 'status', 'booking_date']
+
     class Meta:
         model = Booking
         fields = [
-            'id', 'user', 'trip', 'trip_id', 'participants', 
-            'total_price', 'status', 'special_requests', 
+            'id', 'user', 'trip', 'trip_id', 'participants',
+            'total_price', 'status', 'special_requests',
             'booking_date', 'updated_at'
         ]
-        read_only_fields = ['user', 'total_price', 'booking_date', 'updated_at']
-    
+        # Status changes go through confirm/cancel so seat counters stay in sync
+        read_only_fields = ['user', 'total_price', 'status', 'booking_date', 'updated_at']
+
     def validate_trip_id(self, value):
         """
         Validate trip exists and is available
@@ -33,50 +42,124 @@ class BookingSerializer(serializers.ModelSerializer):
             trip = Trip.objects.get(id=value, status='published')
         except Trip.DoesNotExist:
             raise serializers.ValidationError("Trip not found or not available")
-        
+
         if not trip.is_available():
             raise serializers.ValidationError("Trip is fully booked")
-        
+
+        # One booking per user and trip (unique_together on Booking)
+        request = self.context.get('request')
+        if self.instance is None and request and Booking.objects.filter(
+            user=request.user, trip=trip
+        ).exists():
+            raise serializers.ValidationError("You have already booked this trip")
+
+        # Keep the trip for validate() and create() - no need to fetch it again
+        self._trip = trip
         return value
-    
+
     def validate_participants(self, value):
         """
         Validate number of participants
-        Why: Ensure positive number and within limits
+        Why: Ensure positive number
         """
         if value < 1:
             raise serializers.ValidationError("At least 1 participant required")
-        
-        # Check if enough spots available
-        trip_id = self.initial_data.get('trip_id')
-        if trip_id:
-            try:
-                trip = Trip.objects.get(id=trip_id)
-                if value > trip.available_spots():
-                    raise serializers.ValidationError(
-                        f"Only {trip.available_spots()} spots available"
-                    )
-            except Trip.DoesNotExist:
-                pass  # Will be caught by trip_id validation
-        
         return value
-    
+
+    def validate(self, attrs):
+        """
+        Check if enough spots are available
+        Why: Seat counters on Trip make this a plain attribute read
+        """
+        trip = getattr(self, '_trip', None)
+        participants = attrs.get('number_of_people')
+        if trip and participants and participants > trip.available_spots():
+            raise serializers.ValidationError({
+                'participants': f"Only {trip.available_spots()} spots available"
+            })
+        return attrs
+
     def create(self, validated_data):
         """
         Custom create method
-        Why: Set user and calculate total price
+        Why: Set user, calculate total price and reserve the seats atomically
         """
         request = self.context.get('request')
         trip_id = validated_data.pop('trip_id')
-        
-        # Get trip and set user
-        trip = Trip.objects.get(id=trip_id)
-        validated_data['user'] = request.user
-        validated_data['trip'] = trip
-        
-        # Calculate total price
-        validated_data['total_price'] = (
-            validated_data['participants'] * trip.price_per_person
-        )
-        
-        return super().create(validated_data)
\ No newline at end of file
+        participants = validated_data['number_of_people']
+
+        with write_atomic():
+            trip = getattr(self, '_trip', None) or Trip.objects.get(id=trip_id)
+
+            # Conditional UPDATE - fails instead of overselling the last seats
+            if not trip.reserve_seats(participants):
+                raise serializers.ValidationError({
+                    'participants': f"Only {trip.available_spots()} spots available"
+                })
+
+            validated_data['user'] = request.user
+            validated_data['trip'] = trip
+
+            # Calculate total price
+            validated_data['total_price'] = participants * trip.price_per_person
+
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        """
+        Custom update method
+        Why: Trip and participants are fixed once seats are reserved
+        """
+        validated_data.pop('trip_id', None)
+        validated_data.pop('number_of_people', None)
+        return super().update(instance, validated_data)
+
+
+class BookingItemSerializer(serializers.Serializer):
+    """
+    One booking inside a bulk booking request
+    Why: Shape checks only - capacity is checked for the whole batch at once
+    """
+    trip_id = serializers.IntegerField()
+    participants = serializers.IntegerField(source='number_of_people', min_value=1, default=1)
+    special_requests = serializers.CharField(allow_blank=True, default='')
+
+
+class BulkBookingSerializer(serializers.Serializer):
+    """
+    Serializer for bulk booking requests
+    Why: Group operators book many trips in one request
+    """
+    max_items = 100
+
+    bookings = BookingItemSerializer(many=True, allow_empty=False)
+
+    def validate_bookings(self, value):
+        if len(value) > self.max_items:
+            raise serializers.ValidationError(f"At most {self.max_items} bookings per request")
+        return value
+
+
+class BookingIdsSerializer(serializers.Serializer):
+    """
+    Serializer for bulk confirm/cancel requests
+    Why: Creators confirm hundreds of pending bookings after a sale
+    """
+    max_items = 500
+
+    booking_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+    def validate_booking_ids(self, value):
+        if len(value) > self.max_items:
+            raise serializers.ValidationError(f"At most {self.max_items} bookings per request")
+        # Keep the order the client sent, drop repeats
+        return list(dict.fromkeys(value))
+
+
+class BookingExportSerializer(serializers.Serializer):
+    """
+    Query parameters of the bookings export
+    Why: Finance exports one trip or one status at a time
+    """
+    trip = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=Booking.STATUS_CHOICES, required=False)
@@ -0,0 +1,18 @@
+from django.dispatch import Signal
+
+# Sent after a booking moves between statuses (confirm/cancel)
+# Why: Those transitions use queryset.update(), which skips post_save,
+# but caches and counters elsewhere still need to hear about them
+# Sent inside the transaction - use transaction.on_commit for side effects
+# Arguments: booking, from_status, to_status, bulk (True when sent by a bulk
+# confirm/cancel - bookings_bulk_status_changed follows with the whole batch)
+booking_status_changed = Signal()
+
+# Sent once after a bulk confirm/cancel, inside its transaction
+# Why: Receivers that write per event can do one write per batch instead
+# Arguments: bookings (each with .previous_status), to_status
+bookings_bulk_status_changed = Signal()
+
+# Sent after Booking.objects.bulk_book() - bulk_create skips post_save
+# Arguments: bookings (list of the new Booking objects)
+bookings_bulk_created = Signal()
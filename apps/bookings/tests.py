@@ -1,3 +1,466 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.trips.models import SeatInventoryError, Trip
+from apps.trips.tests import view_queryset
+from sharetrip.databases import SQLITE_TUNED_PRAGMAS
+from sharetrip.query_plans import full_scans
+from sharetrip.sqlite3.base import DatabaseWrapper
+from sharetrip.transactions import write_atomic
+from . import views
+from .models import Booking
+
+User = get_user_model()
+
+
+def make_user(username):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com', password='password123'
+    )
+
+
+def make_trip(creator, max_participants=4, **kwargs):
+    defaults = {
+        'title': 'Sundarbans Safari',
+        'description': 'Three days in the mangroves',
+        'destination': 'Khulna',
+        'start_date': date(2030, 1, 10),
+        'end_date': date(2030, 1, 13),
+        'max_participants': max_participants,
+        'price_per_person': Decimal('100.00'),
+        'status': 'published',
+    }
+    defaults.update(kwargs)
+    return Trip.objects.create(creator=creator, **defaults)
+
+
+class SeatInventoryTests(TestCase):
+    """Seat counters on Trip are kept in sync by booking actions"""
+
+    def setUp(self):
+        self.creator = make_user('creator')
+        self.trip = make_trip(self.creator, max_participants=4)
+
+    def book(self, username, seats):
+        self.assertTrue(self.trip.reserve_seats(seats))
+        return Booking.objects.create(
+            user=make_user(username),
+            trip=self.trip,
+            number_of_people=seats,
+            total_price=seats * self.trip.price_per_person,
+        )
+
+    def test_reserve_refuses_to_oversell(self):
+        self.assertTrue(self.trip.reserve_seats(3))
+        self.assertFalse(self.trip.reserve_seats(2))
+        self.assertEqual(self.trip.pending_seats, 3)
+        self.assertEqual(self.trip.available_spots(), 1)
+
+    def test_confirm_moves_seats_and_revenue(self):
+        booking = self.book('alice', 2)
+        self.assertTrue(booking.confirm())
+        self.assertFalse(booking.confirm())
+
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.pending_seats, 0)
+        self.assertEqual(self.trip.confirmed_seats, 2)
+        self.assertEqual(self.trip.total_revenue(), Decimal('200.00'))
+
+    def test_cancel_releases_seats(self):
+        pending = self.book('alice', 1)
+        confirmed = self.book('bob', 3)
+        confirmed.confirm()
+        self.assertFalse(self.trip.is_available())
+
+        self.assertTrue(pending.cancel())
+        self.assertTrue(confirmed.cancel())
+        self.assertFalse(confirmed.cancel())
+
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_spots(), 4)
+        self.assertEqual(self.trip.total_revenue(), Decimal('0.00'))
+
+    def test_counters_out_of_step_roll_the_status_back(self):
+        pending = self.book('alice', 1)
+        confirmed = self.book('bob', 2)
+        confirmed.confirm()
+        # Counters that no longer cover the bookings
+        Trip.objects.filter(pk=self.trip.pk).update(pending_seats=0, confirmed_seats=1)
+
+        with self.assertRaises(SeatInventoryError):
+            pending.confirm()
+        with self.assertRaises(SeatInventoryError):
+            confirmed.cancel()
+
+        self.assertEqual((pending.status, confirmed.status), ('pending', 'confirmed'))
+        self.assertEqual(
+            dict(Booking.objects.values_list('id', 'status')),
+            {pending.id: 'pending', confirmed.id: 'confirmed'},
+        )
+        self.trip.refresh_from_db()
+        self.assertEqual((self.trip.pending_seats, self.trip.confirmed_seats), (0, 1))
+        self.assertEqual(self.trip.total_revenue(), Decimal('200.00'))
+
+
+class BookingAPITests(APITestCase):
+
+    def setUp(self):
+        self.creator = make_user('creator')
+        self.customer = make_user('customer')
+        self.trip = make_trip(self.creator, max_participants=3)
+
+    def test_create_reserves_seats(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post(
+            reverse('booking-create'), {'trip_id': self.trip.id, 'participants': 2}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_price'], '200.00')
+
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.pending_seats, 2)
+
+    def test_create_rejects_more_participants_than_spots(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post(
+            reverse('booking-create'), {'trip_id': self.trip.id, 'participants': 4}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('participants', response.data)
+
+    def test_confirm_and_cancel_endpoints(self):
+        self.client.force_authenticate(self.customer)
+        booking_id = self.client.post(
+            reverse('booking-create'), {'trip_id': self.trip.id, 'participants': 1}
+        ).data['id']
+
+        self.client.force_authenticate(self.creator)
+        url = reverse('confirm-booking', args=[self.trip.id, booking_id])
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.post(url).status_code, 400)
+
+        self.client.force_authenticate(self.customer)
+        url = reverse('cancel-booking', args=[booking_id])
+        self.assertEqual(self.client.post(url).status_code, 200)
+
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_spots(), 3)
+
+
+    def test_delete_releases_seats_with_the_delete(self):
+        self.trip.reserve_seats(2)
+        booking = Booking.objects.create(user=self.customer, trip=self.trip, number_of_people=2, total_price=200)
+        self.client.force_authenticate(self.customer)
+        url = reverse('booking-detail', args=[booking.id])
+
+        # A failed delete keeps the seats held too
+        with mock.patch.object(Booking, 'delete', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.delete(url)
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.pending_seats, 2)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'pending')
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.pending_seats, 0)
+        self.assertFalse(Booking.objects.filter(pk=booking.pk).exists())
+
+    def test_delete_cancelled_booking(self):
+        booking = Booking.objects.create(
+            user=self.customer, trip=self.trip, number_of_people=1, total_price=100, status='cancelled'
+        )
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.delete(reverse('booking-detail', args=[booking.id])).status_code, 204)
+        self.assertFalse(Booking.objects.filter(pk=booking.pk).exists())
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_spots(), 3)
+
+class BookingListQueryCountTests(APITestCase):
+    """Booking lists with nested trips run a fixed number of queries"""
+
+    def setUp(self):
+        self.creator = make_user('creator')
+        trips = [make_trip(self.creator, max_participants=50) for _ in range(3)]
+        customers = [make_user(f'customer{i}') for i in range(12)]
+        for i, customer in enumerate(customers):
+            trip = trips[i % 3]
+            trip.reserve_seats(1)
+            Booking.objects.create(
+                user=customer, trip=trip, number_of_people=1, total_price=trip.price_per_person
+            )
+        self.trip = trips[0]
+
+    def test_trip_bookings_list(self):
+        self.client.force_authenticate(self.creator)
+        # count + bookings with users, trips and creators + images
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('trip-bookings', args=[self.trip.id]), {'expand': 'user,trip.creator,trip.images'}
+            )
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual(response.data['results'][0]['trip']['id'], self.trip.id)
+        self.assertEqual(response.data['results'][0]['trip']['images'], [])
+
+        # Cards: count + bookings with their trips
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('trip-bookings', args=[self.trip.id]))
+        self.assertNotIn('user', response.data['results'][0])
+
+    def test_my_bookings_render_cards(self):
+        customer = Booking.objects.filter(trip=self.trip).first().user
+        self.client.force_authenticate(customer)
+        booking, = self.client.get(reverse('user-bookings')).data['results']
+        self.assertEqual(list(booking), ['id', 'trip', 'participants', 'total_price', 'status', 'booking_date'])
+        self.assertNotIn('description', booking['trip'])
+
+        detail = reverse('booking-detail', args=[booking['id']])
+        self.assertEqual(self.client.get(detail, {'fields': 'status'}).data, {'id': booking['id'], 'status': 'pending'})
+        self.assertIn('special_requests', self.client.get(detail).data)
+
+    def test_bookings_share_trip_instances(self):
+        bookings = list(Booking.objects.with_listing_relations())
+        trips = {id(booking.trip) for booking in bookings}
+        self.assertEqual(len(trips), 3)
+
+
+class BookingQueryPlanTests(TestCase):
+    """EXPLAIN every bookings endpoint query - none may fall back to a full scan"""
+
+    def setUp(self):
+        self.creator = make_user('creator')
+        self.trip = make_trip(self.creator)
+
+    def test_endpoint_querysets_use_indexes(self):
+        querysets = {
+            'user-bookings': view_queryset(views.BookingViewSet, user=self.creator)[:10],
+            'trip-bookings': view_queryset(
+                views.TripBookingViewSet, user=self.creator, trip_pk=self.trip.pk
+            )[:10],
+            'confirmed-bookings': Booking.objects.filter(trip=self.trip, status='confirmed'),
+        }
+        for name, queryset in querysets.items():
+            with self.subTest(name):
+                self.assertEqual(full_scans(queryset), [], queryset.explain())
+
+
+
+class BulkBookingTests(APITestCase):
+
+    def setUp(self):
+        self.creator = make_user('creator')
+        self.operator = make_user('operator')
+        self.small = make_trip(self.creator, max_participants=3)
+        self.large = make_trip(self.creator, max_participants=10)
+
+    def test_bulk_book_reports_each_item(self):
+        self.client.force_authenticate(self.operator)
+        response = self.client.post(reverse('booking-bulk'), {'bookings': [
+            {'trip_id': self.small.id, 'participants': 2},
+            {'trip_id': self.large.id, 'participants': 4},
+            {'trip_id': self.small.id, 'participants': 1},
+            {'trip_id': 999, 'participants': 1},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['succeeded'], 2)
+        errors = [result.get('error') for result in response.data['results']]
+        self.assertEqual(errors, [
+            None, None, 'You have already booked this trip', 'Trip not found or not available'
+        ])
+        self.large.refresh_from_db()
+        self.assertEqual(self.large.pending_seats, 4)
+
+    def test_bulk_book_checks_capacity_across_items(self):
+        other = make_user('other')
+        self.client.force_authenticate(other)
+        self.client.post(reverse('booking-bulk'), {'bookings': [
+            {'trip_id': self.small.id, 'participants': 2},
+        ]}, format='json')
+
+        self.client.force_authenticate(self.operator)
+        response = self.client.post(reverse('booking-bulk'), {'bookings': [
+            {'trip_id': self.small.id, 'participants': 2},
+        ]}, format='json')
+        self.assertEqual(response.data['results'][0]['error'], 'Only 1 spots available')
+
+    def test_bulk_confirm_and_cancel(self):
+        customers = [make_user(f'customer{i}') for i in range(3)]
+        ids = []
+        for customer in customers:
+            self.client.force_authenticate(customer)
+            response = self.client.post(reverse('booking-bulk'), {'bookings': [
+                {'trip_id': self.large.id, 'participants': 2},
+            ]}, format='json')
+            ids.append(response.data['results'][0]['booking_id'])
+
+        self.client.force_authenticate(self.creator)
+        url = reverse('booking-bulk-confirm', args=[self.large.id])
+        response = self.client.post(url, {'booking_ids': ids[:2] + [999]}, format='json')
+        self.assertEqual(response.data['succeeded'], 2)
+        self.assertEqual(response.data['results'][2]['error'], 'Booking not found')
+
+        self.large.refresh_from_db()
+        self.assertEqual(self.large.confirmed_seats, 4)
+        self.assertEqual(self.large.pending_seats, 2)
+        self.assertEqual(self.large.total_revenue(), Decimal('400.00'))
+
+        self.client.force_authenticate(customers[0])
+        response = self.client.post(
+            reverse('booking-bulk-cancel'), {'booking_ids': [ids[0], ids[1]]}, format='json'
+        )
+        self.assertEqual(response.data['succeeded'], 1)
+        self.assertEqual(response.data['results'][1]['error'], 'Booking not found')
+
+        self.large.refresh_from_db()
+        self.assertEqual(self.large.confirmed_seats, 2)
+        self.assertEqual(self.large.total_revenue(), Decimal('200.00'))
+
+    def test_counters_out_of_step_roll_the_batch_back(self):
+        results = Booking.objects.bulk_book(self.operator, [
+            {'trip_id': self.small.id, 'number_of_people': 1},
+            {'trip_id': self.large.id, 'number_of_people': 2},
+        ])
+        ids = [result['booking'].id for result in results]
+        Trip.objects.filter(pk=self.large.pk).update(pending_seats=1)
+
+        with self.assertRaises(SeatInventoryError):
+            Booking.objects.filter(id__in=ids).bulk_confirm()
+        with self.assertRaises(SeatInventoryError):
+            Booking.objects.filter(id__in=ids).bulk_cancel()
+
+        # Neither trip's bookings changed - the small trip's counters included
+        self.assertEqual(set(Booking.objects.filter(id__in=ids).values_list('status', flat=True)), {'pending'})
+        self.small.refresh_from_db()
+        self.assertEqual((self.small.pending_seats, self.small.confirmed_seats), (1, 0))
+
+    @override_settings(PERF_DUPLICATE_QUERY_THRESHOLD=2)
+    def test_repeated_queries_are_logged(self):
+        self.client.force_authenticate(self.operator)
+        with self.assertLogs('sharetrip.performance', 'WARNING') as logs:
+            self.client.post(reverse('booking-bulk'), {'bookings': [
+                {'trip_id': self.small.id, 'participants': 1},
+                {'trip_id': self.large.id, 'participants': 1},
+            ]}, format='json')
+        self.assertIn('POST api/bookings/bulk/', logs.output[0])
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class BookingExportTests(APITestCase):
+    """Exports stream the creator's bookings, one query whatever the size"""
+
+    def setUp(self):
+        self.creator = make_user('creator')
+        self.trip = make_trip(self.creator, max_participants=20)
+        other_trip = make_trip(make_user('rival'), title='Elsewhere')
+        for i in range(5):
+            Booking.objects.create(
+                user=make_user(f'customer{i}'), trip=self.trip, number_of_people=1,
+                total_price=Decimal('100.00'), special_requests='=HYPERLINK("x")' if i == 0 else '',
+            )
+        Booking.objects.create(
+            user=make_user('someone'), trip=other_trip, total_price=Decimal('100.00')
+        )
+        self.client.force_authenticate(self.creator)
+
+    def export(self, **params):
+        response = self.client.get(reverse('booking-export'), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        with self.assertNumQueries(1):
+            response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('filename="bookings.csv"', response['Content-Disposition'])
+
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(list(rows[0]), list(Booking.EXPORT_COLUMNS))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row['trip_id'] for row in rows}, {str(self.trip.id)})
+        self.assertEqual(rows[0]['total_price'], '100.00')
+        # Not run as a formula when opened in a spreadsheet
+        self.assertEqual(rows[0]['special_requests'], '\'=HYPERLINK("x")')
+
+    def test_ndjson_with_filters(self):
+        Booking.objects.filter(user__username='customer1').update(status='cancelled')
+        response, body = self.export(format='ndjson', status='cancelled')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([line['username'] for line in lines], ['customer1'])
+
+    def test_invalid_parameters_are_reported_in_the_format(self):
+        response = self.client.get(reverse('booking-export'), {'format': 'ndjson', 'status': 'lost'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', json.loads(response.content))
+
+    def test_streams_under_asgi(self):
+        self.async_client.force_login(self.creator)
+
+        async def fetch():
+            response = await self.async_client.get(reverse('booking-export'))
+            return [block async for block in response.streaming_content]
+
+        blocks = async_to_sync(fetch)()
+        # Header and two rows per block
+        self.assertEqual(len(blocks), 3)
+        self.assertEqual(len(b''.join(blocks).decode().splitlines()), 6)
+
+
+class TunedSQLiteTests(SimpleTestCase):
+    """The tuned SQLite backend applies its pragmas and takes the write lock at BEGIN"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'tuned.sqlite3')
+        settings_dict = dict(
+            connections['default'].settings_dict,
+            ENGINE='sharetrip.sqlite3', NAME=self.path,
+            OPTIONS={'pragmas': SQLITE_TUNED_PRAGMAS},
+        )
+        self.connection = DatabaseWrapper(settings_dict, alias='tuned')
+        connections['tuned'] = self.connection
+        self.addCleanup(connections.__delitem__, 'tuned')
+        self.addCleanup(self.connection.close)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+
+    def test_write_atomic_begins_immediate(self):
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with CaptureQueriesContext(self.connection) as queries:
+            with write_atomic(using='tuned'):
+                # Nothing read or written yet, but the write lock is already held
+                with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                    other.execute('BEGIN IMMEDIATE')
+            # Plain atomic() blocks keep the deferred BEGIN
+            with transaction.atomic(using='tuned'):
+                pass
+        self.assertEqual(
+            [query['sql'] for query in queries], ['BEGIN IMMEDIATE', 'COMMIT', 'BEGIN', 'COMMIT']
+        )
@@ -1,16 +1,42 @@
 from django.urls import path
 from . import views
 
+# Map the viewset actions onto explicit routes
+booking_list = views.BookingViewSet.as_view({'get': 'list'})
+booking_create = views.BookingViewSet.as_view({'post': 'create'})
+booking_detail = views.BookingViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
+booking_cancel = views.BookingViewSet.as_view({'post': 'cancel'})
+trip_booking_list = views.TripBookingViewSet.as_view({'get': 'list'})
+trip_booking_confirm = views.TripBookingViewSet.as_view({'post': 'confirm'})
+
+# Bulk actions
+booking_bulk = views.BookingViewSet.as_view({'post': 'bulk'})
+booking_bulk_cancel = views.BookingViewSet.as_view({'post': 'bulk_cancel'})
+trip_booking_bulk_confirm = views.TripBookingViewSet.as_view({'post': 'bulk_confirm'})
+
 urlpatterns = [
     # Booking operations
-    path('create/', views.BookingCreateView.as_view(), name='booking-create'),
-    path('my-bookings/', views.UserBookingsView.as_view(), name='user-bookings'),
-    path('<int:pk>/', views.BookingDetailView.as_view(), name='booking-detail'),
+    path('create/', booking_create, name='booking-create'),
+    path('my-bookings/', booking_list, name='user-bookings'),
+    path('<int:pk>/', booking_detail, name='booking-detail'),
     
     # Trip bookings (for trip creators)
-    path('trip/<int:trip_id>/', views.TripBookingsView.as_view(), name='trip-bookings'),
+    path('trip/<int:trip_pk>/', trip_booking_list, name='trip-bookings'),
     
     # Booking actions
-    path('<int:booking_id>/cancel/', views.cancel_booking, name='cancel-booking'),
-    path('<int:booking_id>/confirm/', views.confirm_booking, name='confirm-booking'),
-]
\ No newline at end of file
+    path('<int:pk>/cancel/', booking_cancel, name='cancel-booking'),
+    path('trip/<int:trip_pk>/<int:pk>/confirm/', trip_booking_confirm, name='confirm-booking'),
+    
+    # Bulk actions - one transaction, per-item results
+    path('bulk/', booking_bulk, name='booking-bulk'),
+    path('bulk-cancel/', booking_bulk_cancel, name='booking-bulk-cancel'),
+    path('trip/<int:trip_pk>/bulk-confirm/', trip_booking_bulk_confirm, name='booking-bulk-confirm'),
+    
+    # Streaming CSV/NDJSON export
+    path('export/', views.export_bookings, name='booking-export'),
+]
@@ -1,10 +1,43 @@
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from sharetrip.exports import EXPORT_RENDERERS, export_response
+from sharetrip.instrumentation import InstrumentedSerializerMixin
+from sharetrip.sparse import SparseFieldsViewMixin
+from sharetrip.transactions import write_atomic
 from .models import Booking
-from .serializers import BookingSerializer
+from .serializers import (
+    BookingExportSerializer, BookingIdsSerializer, BookingSerializer, BulkBookingSerializer,
+)
 
-class BookingViewSet(viewsets.ModelViewSet):
+
+def bulk_response(results):
+    """
+    Wrap per-item results of a bulk action
+    Why: Partial failures must be visible item by item
+    """
+    failed = sum(1 for result in results if 'error' in result)
+    return Response({
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'results': results,
+    })
+
+
+def bulk_transition_response(requested_ids, outcome, to_status):
+    """Per-id results for bulk confirm/cancel - unknown ids are reported too"""
+    results = []
+    for booking_id in requested_ids:
+        if booking_id not in outcome:
+            results.append({'booking_id': booking_id, 'error': 'Booking not found'})
+        elif outcome[booking_id]:
+            results.append({'booking_id': booking_id, 'error': outcome[booking_id]})
+        else:
+            results.append({'booking_id': booking_id, 'status': to_status})
+    return bulk_response(results)
+
+class BookingViewSet(SparseFieldsViewMixin, InstrumentedSerializerMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing bookings
     Provides CRUD operations and custom actions
@@ -14,13 +47,24 @@ class BookingViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Return bookings for current user"""
-        return Booking.objects.filter(user=self.request.user)
+        return Booking.objects.filter(
+            user=self.request.user
+        ).with_listing_relations()
     
     def perform_create(self, serializer):
         """Custom creation logic"""
         booking = serializer.save(user=self.request.user)
         return booking
     
+    def perform_destroy(self, instance):
+        """Release the booking's seats and delete it - both or neither"""
+        with write_atomic():
+            # False if it's already cancelled (seats released then) - or if
+            # its status kept changing under us, so it can't be released yet
+            if not instance.cancel() and instance.status != 'cancelled':
+                raise ValidationError({'error': 'Booking changed while being deleted, try again'})
+            instance.delete()
+    
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """Cancel a booking"""
@@ -32,15 +76,60 @@ class BookingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        booking.status = 'cancelled'
-        booking.save()
+        # Releases the seats in the same transaction as the status change
+        if not booking.cancel():
+            return Response(
+                {'error': 'Booking already cancelled'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({
             'message': 'Booking cancelled successfully',
             'booking_id': booking.id
         })
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Book several trips at once
+        Body: {"bookings": [{"trip_id": 1, "participants": 2}, ...]}
+        """
+        serializer = BulkBookingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = []
+        outcome = Booking.objects.bulk_book(request.user, serializer.validated_data['bookings'])
+        for index, result in enumerate(outcome):
+            if 'error' in result:
+                results.append({'index': index, 'error': result['error']})
+                continue
+            booking = result['booking']
+            results.append({
+                'index': index,
+                'booking_id': booking.id,
+                'trip_id': booking.trip_id,
+                'participants': booking.number_of_people,
+                'total_price': str(booking.total_price),
+                'status': booking.status,
+            })
+        return bulk_response(results)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_cancel(self, request):
+        """
+        Cancel several of the user's bookings at once
+        Body: {"booking_ids": [1, 2, 3]}
+        """
+        serializer = BookingIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        booking_ids = serializer.validated_data['booking_ids']
+        
+        outcome = Booking.objects.filter(
+            user=request.user, id__in=booking_ids
+        ).bulk_cancel()
+        return bulk_transition_response(booking_ids, outcome, 'cancelled')
 
-class TripBookingViewSet(viewsets.ReadOnlyModelViewSet):
+class TripBookingViewSet(SparseFieldsViewMixin, InstrumentedSerializerMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for trip creators to view bookings for their trips
     """
@@ -53,7 +142,7 @@ class TripBookingViewSet(viewsets.ReadOnlyModelViewSet):
         return Booking.objects.filter(
             trip_id=trip_id,
             trip__creator=self.request.user
-        )
+        ).with_listing_relations()
     
     @action(detail=True, methods=['post'])
     def confirm(self, request, trip_pk=None, pk=None):
@@ -66,10 +155,54 @@ class TripBookingViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        booking.status = 'confirmed'
-        booking.save()
+        # Moves the held seats to confirmed in the same transaction
+        if not booking.confirm():
+            return Response(
+                {'error': 'Only pending bookings can be confirmed'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({
             'message': 'Booking confirmed successfully',
             'booking_id': booking.id
-        })
\ No newline at end of file
+        })
+    
+    @action(detail=False, methods=['post'])
+    def bulk_confirm(self, request, trip_pk=None):
+        """
+        Confirm several pending bookings of a trip at once (for trip creators)
+        Body: {"booking_ids": [1, 2, 3]}
+        """
+        serializer = BookingIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        booking_ids = serializer.validated_data['booking_ids']
+        
+        outcome = Booking.objects.filter(
+            trip_id=trip_pk,
+            trip__creator=request.user,
+            id__in=booking_ids
+        ).bulk_confirm()
+        return bulk_transition_response(booking_ids, outcome, 'confirmed')
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@renderer_classes(EXPORT_RENDERERS)
+def export_bookings(request):
+    """
+    Export bookings as CSV or NDJSON
+    Why: Paging through trip bookings 10 at a time doesn't scale to a full export
+    What: Streams every booking on the user's trips (all trips for staff),
+    ?format=csv|ndjson, optionally narrowed with ?trip= and ?status=
+    """
+    params = BookingExportSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+
+    bookings = Booking.objects.all()
+    if not request.user.is_staff:
+        bookings = bookings.filter(trip__creator=request.user)
+    if 'trip' in params.validated_data:
+        bookings = bookings.filter(trip_id=params.validated_data['trip'])
+    if 'status' in params.validated_data:
+        bookings = bookings.filter(status=params.validated_data['status'])
+    return export_response(request, bookings, Booking.EXPORT_COLUMNS, 'bookings')
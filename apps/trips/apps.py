@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TripsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.trips'
+
+    def ready(self):
+        # Register signal handlers (catalogue cache, search index)
+        from . import signals  # noqa: F401
@@ -0,0 +1,129 @@
+"""
+Async (ASGI) read path for the trips catalogue
+Why: Under ASGI a sync DRF view runs on a thread for the whole request, so
+concurrent catalogue readers queue up behind each other
+What: TripListView/TripDetailView on Django's async ORM. Querysets, filters,
+ordering, search, sparse fieldsets, pagination, the catalogue cache and the
+serializers are the ones the sync views use, so both paths return the same JSON.
+urls.py routes to these views when settings.ASYNC_CATALOGUE is on (asgi.py does that)
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from sharetrip.instrumentation import timed_serializer_class
+from sharetrip.routers import areplica_reads
+from .cache import acached_response, catalogue_cache, not_modified_page, set_page_validators
+from .models import Trip
+from .search import TripSearchFilter, get_search_backend
+from .views import TripDetailView, TripListView
+
+
+async def authenticated_request(request, view_class):
+    """
+    Wrap the Django request like the DRF view would, with the user loaded
+    Only requests carrying credentials need a (sync) session/user lookup -
+    anonymous readers never leave the event loop
+    """
+    has_credentials = (
+        settings.SESSION_COOKIE_NAME in request.COOKIES or 'HTTP_AUTHORIZATION' in request.META
+    )
+    authenticators = [auth() for auth in view_class.authentication_classes] if has_credentials else []
+    drf_request = Request(request, authenticators=authenticators)
+    if has_credentials:
+        await sync_to_async(lambda: drf_request.user)()
+    else:
+        drf_request.user  # AnonymousUser - no query
+    return drf_request
+
+
+class AsyncCatalogueView(View):
+    """Shared plumbing - auth, error responses and rendering"""
+    sync_view = None
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            drf_request = await authenticated_request(request, self.sync_view)
+            async with areplica_reads(drf_request):
+                page = await self.page_key(drf_request, **kwargs)
+                response = not_modified_page(drf_request, page)
+                if response is not None:
+                    return response
+                status, data, cache_status, on_primary = await acached_response(
+                    drf_request, page, lambda: self.render_data(drf_request, **kwargs)
+                )
+                response = self.render(data, status)
+                if status == 200:
+                    set_page_validators(response, drf_request, page, on_primary)
+        except Exception as exc:
+            return self.handle_exception(exc, request)
+        response['X-Cache'] = cache_status
+        return response
+
+    def drf_view(self, request, **kwargs):
+        """The sync view, set up for its filter/paginator/serializer helpers"""
+        return self.sync_view(request=request, args=(), kwargs=kwargs, format_kwarg=None)
+
+    def serialize(self, view, instance, **kwargs):
+        serializer_class = timed_serializer_class(view.get_serializer_class())
+        return serializer_class(instance, context=view.get_serializer_context(), **kwargs).data
+
+    def handle_exception(self, exc, request):
+        response = exception_handler(exc, {'view': self, 'request': request})
+        if response is None:
+            raise exc
+        rendered = self.render(response.data, response.status_code)
+        # WWW-Authenticate / Retry-After set by the handler
+        for header, value in response.items():
+            if header != 'Content-Type':
+                rendered[header] = value
+        return rendered
+
+    def render(self, data, status):
+        # The API's JSON renderer - the first of DEFAULT_RENDERER_CLASSES
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+        return HttpResponse(
+            renderer.render(data), status=status, content_type=renderer.media_type
+        )
+
+
+class AsyncTripListView(AsyncCatalogueView):
+    """Async TripListView - same filters, search, pagination and cache"""
+    sync_view = TripListView
+
+    async def page_key(self, request):
+        return await catalogue_cache.alist_key(request)
+
+    async def render_data(self, request):
+        view = self.drf_view(request)
+        if request.query_params.get(TripSearchFilter.search_param):
+            # The backend checks once per database whether the index exists
+            await sync_to_async(get_search_backend)()
+        # Only the columns and relations the requested fields use (sharetrip.sparse)
+        queryset = view.filter_queryset(view.get_queryset())
+
+        paginator = view.paginator
+        trips = await paginator.apaginate_queryset(queryset, request, view=view)
+        data = self.serialize(view, trips, many=True)
+        return 200, paginator.get_paginated_response(data).data
+
+
+class AsyncTripDetailView(AsyncCatalogueView):
+    """Async TripDetailView"""
+    sync_view = TripDetailView
+
+    async def page_key(self, request, pk):
+        return await catalogue_cache.adetail_key(request, pk)
+
+    async def render_data(self, request, pk):
+        view = self.drf_view(request, pk=pk)
+        try:
+            trip = await view.filter_queryset(view.get_queryset()).aget(pk=pk)
+        except Trip.DoesNotExist:
+            # Same message as get_object_or_404 in the sync view
+            raise Http404(f'No {Trip._meta.object_name} matches the given query.')
+        return 200, self.serialize(view, trip)
@@ -0,0 +1,359 @@
+import copy
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from sharetrip.conditional import make_etag, not_modified, set_validators
+from sharetrip.routers import current_replica, pin_seconds
+
+from .models import Trip
+
+
+class CatalogueCache:
+    """
+    Cache for serialized public trip pages
+    Why: TripListView/TripDetailView are read-heavy and identical for most users
+    What: Versioned keys - writes bump a version instead of deleting keys
+
+    Versions:
+    - one per trip, used by the detail page
+    - one per destination, used by list pages filtered on that destination
+    - one global, used by every other list page
+    A change to a trip bumps its own version and the versions of the list
+    pages that could contain it, so other destinations stay cached.
+    Each version also records when it last changed - the pages' Last-Modified.
+    """
+
+    PREFIX = 'trips'
+    # Part of every page key - bump it when cached pages change shape, so a
+    # deploy never reads entries written by the previous release
+    FORMAT = 3
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'TRIP_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        timeout = getattr(settings, 'TRIP_CACHE_TIMEOUT', 300)
+        if current_replica():
+            # A page read from a lagging replica may miss the write that just
+            # invalidated it - keep it no longer than replicas are allowed to lag
+            return min(timeout, pin_seconds())
+        return timeout
+
+    # Versions
+    def _version_key(self, *parts):
+        return ':'.join([self.PREFIX, 'v'] + [_digest(part) for part in parts])
+
+    def _get_versions(self, keys):
+        """
+        Read several version keys, and when they changed, in one cache round trip
+        Returns [(version, changed at)]
+        Missing versions start from the current time, so keys written before
+        an eviction can never be served again; a missing change time is now
+        """
+        stored = self.cache.get_many(keys + [_changed_key(key) for key in keys])
+        for key, value in self._missing_versions(keys, stored):
+            self.cache.add(key, value, None)
+        return [(stored[key], stored[_changed_key(key)]) for key in keys]
+
+    async def _aget_versions(self, keys):
+        stored = await self.cache.aget_many(keys + [_changed_key(key) for key in keys])
+        for key, value in self._missing_versions(keys, stored):
+            await self.cache.aadd(key, value, None)
+        return [(stored[key], stored[_changed_key(key)]) for key in keys]
+
+    def _missing_versions(self, keys, stored):
+        """Fill in `stored` and return the (key, value) pairs to add to the cache"""
+        now = time.time()
+        missing = []
+        for key in keys:
+            for name, value in [(key, int(now * 1000)), (_changed_key(key), now)]:
+                if name not in stored:
+                    stored[name] = value
+                    missing.append((name, value))
+        return missing
+
+    def _bump(self, key):
+        # The change time first - a reader seeing the new version never gets an older time
+        self.cache.set(_changed_key(key), time.time(), None)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, int(time.time() * 1000), None)
+
+    def invalidate_trip(self, trip_id, destinations=(), listed=True):
+        """
+        Invalidate the cached pages that could contain a trip
+        destinations: old and new destination of the trip
+        listed: False if the trip was never visible in the public lists
+        """
+        self._bump(self._version_key('trip', trip_id))
+        if listed:
+            self.invalidate_lists(destinations)
+
+    def invalidate_lists(self, destinations=()):
+        """Invalidate every unfiltered list page and the pages of `destinations`"""
+        self._bump(self._version_key('list'))
+        for destination in set(destinations):
+            self._bump(self._version_key('destination', destination))
+
+    # Keys
+    def list_key(self, request):
+        """PageKey for a list page - filters, search, ordering and page included"""
+        [(version, changed)] = self._get_versions([self._list_version_key(request)])
+        return PageKey(self._list_key(request, version), changed)
+
+    async def alist_key(self, request):
+        [(version, changed)] = await self._aget_versions([self._list_version_key(request)])
+        return PageKey(self._list_key(request, version), changed)
+
+    def _list_version_key(self, request):
+        destination = request.query_params.get('destination')
+        if destination:
+            return self._version_key('destination', destination)
+        return self._version_key('list')
+
+    def _list_key(self, request, version):
+        params = sorted(request.query_params.lists())
+        return ':'.join([
+            self.PREFIX, 'list', str(self.FORMAT), str(version),
+            _digest(request.get_host()), _digest(params),
+        ])
+
+    def detail_key(self, request, trip_id):
+        [(version, changed)] = self._get_versions([self._version_key('trip', trip_id)])
+        return PageKey(self._detail_key(request, trip_id, version), changed)
+
+    async def adetail_key(self, request, trip_id):
+        [(version, changed)] = await self._aget_versions([self._version_key('trip', trip_id)])
+        return PageKey(self._detail_key(request, trip_id, version), changed)
+
+    def _detail_key(self, request, trip_id, version):
+        # ?fields=/?expand= change the body - as on list pages, the params are part of the key
+        params = sorted(request.query_params.lists())
+        return ':'.join([
+            self.PREFIX, 'detail', str(self.FORMAT), str(trip_id), str(version),
+            _digest(request.get_host()), _digest(params),
+        ])
+
+    # Reads and writes
+    def get(self, key):
+        return self._count(self.cache.get(key))
+
+    async def aget(self, key):
+        return self._count(await self.cache.aget(key))
+
+    def _count(self, data):
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, key, data):
+        self.cache.set(key, data, self.timeout)
+
+    async def aset(self, key, data):
+        await self.cache.aset(key, data, self.timeout)
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+def _digest(value):
+    return hashlib.md5(repr(value).encode()).hexdigest()[:16]
+
+
+def _changed_key(version_key):
+    return f'{version_key}:changed'
+
+
+class PageKey:
+    """
+    Cache key of a catalogue page and when its version last changed
+    Both come from the version, so they are known before the page is read or rendered
+    """
+
+    def __init__(self, key, modified):
+        self.key = key
+        self.modified = modified
+
+    def etag(self, request):
+        # Creators see total_revenue on their own trips - a tag per user
+        user_id = request.user.pk if request.user.is_authenticated else None
+        return make_etag(self.key, user_id)
+
+
+catalogue_cache = CatalogueCache()
+
+
+def personalize(data, request):
+    """
+    Fill in total_revenue for trips the current user created
+    Why: Cached pages are shared, so they are stored as an anonymous user
+    sees them and the creator-only field is added per request
+    """
+    trip_ids = _own_trip_ids(data, request.user)
+    if not trip_ids:
+        return data
+    revenue = dict(
+        Trip.objects.filter(id__in=trip_ids, creator=request.user).values_list('id', 'confirmed_revenue')
+    )
+    return _with_revenue(data, revenue)
+
+
+async def apersonalize(data, request):
+    """personalize for async views - request.user must already be loaded"""
+    trip_ids = _own_trip_ids(data, request.user)
+    if not trip_ids:
+        return data
+    revenue = {
+        trip_id: amount async for trip_id, amount in
+        Trip.objects.filter(id__in=trip_ids, creator=request.user).values_list('id', 'confirmed_revenue')
+    }
+    return _with_revenue(data, revenue)
+
+
+def _own_trip_ids(data, user):
+    """
+    Trips on the page showing total_revenue that may be the user's - when the
+    page leaves out the creator (?fields=) the query decides
+    """
+    if not user.is_authenticated:
+        return []
+    items = data['results'] if 'results' in data else [data]
+    return [
+        item['id'] for item in items if 'total_revenue' in item
+        and (item.get('creator') or {}).get('id', user.id) == user.id
+    ]
+
+
+def _with_revenue(data, revenue):
+    data = copy.deepcopy(data)
+    items = data['results'] if 'results' in data else [data]
+    for item in items:
+        if item['id'] in revenue:
+            item['total_revenue'] = revenue[item['id']]
+    return data
+
+
+def not_modified_page(request, page):
+    """304 response if the client already has the current version of the page, else None"""
+    return not_modified(request, page.etag(request), page.modified, request.user.is_authenticated)
+
+
+def set_page_validators(response, request, page, on_primary):
+    """
+    ETag/Last-Modified for a successful page
+    Left out when the page may predate its version: rendered from a lagging
+    replica, or personalized with revenue read from one
+    """
+    authenticated = request.user.is_authenticated
+    if on_primary and not (authenticated and current_replica()):
+        set_validators(response, page.etag(request), page.modified, authenticated)
+    return response
+
+
+def cached_response(request, page, render):
+    """
+    Return 304 Not Modified, the cached page for the PageKey `page`, or
+    render it and store it
+    Only successful responses are cached - with whether they were rendered on the primary
+    """
+    response = not_modified_page(request, page)
+    if response is not None:
+        return response
+
+    cached = catalogue_cache.get(page.key)
+    if cached is not None:
+        data, on_primary = cached
+        response = Response(personalize(data, request), headers={'X-Cache': 'HIT'})
+        return set_page_validators(response, request, page, on_primary)
+
+    response = render()
+    on_primary = current_replica() is None
+    if response.status_code == 200:
+        # Store the anonymous version so no user's revenue is shared
+        catalogue_cache.set(page.key, (_shared_version(response.data, request), on_primary))
+        set_page_validators(response, request, page, on_primary)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+async def acached_response(request, page, render):
+    """
+    cached_response for async views, after their not_modified_page() check
+    render: coroutine function returning (status, data)
+    Returns (status, data, 'HIT' or 'MISS', rendered on the primary)
+    """
+    cached = await catalogue_cache.aget(page.key)
+    if cached is not None:
+        data, on_primary = cached
+        return 200, await apersonalize(data, request), 'HIT', on_primary
+
+    status, data = await render()
+    on_primary = current_replica() is None
+    if status == 200:
+        await catalogue_cache.aset(page.key, (_shared_version(data, request), on_primary))
+    return status, data, 'MISS', on_primary
+
+
+def _shared_version(data, request):
+    if request.user.is_authenticated:
+        return _anonymize(data)
+    return data
+
+
+def _anonymize(data):
+    data = copy.deepcopy(data)
+    items = data['results'] if 'results' in data else [data]
+    for item in items:
+        if 'total_revenue' in item:
+            item['total_revenue'] = None
+    return data
+
+
+class CachedListMixin:
+    """Serve list pages from the catalogue cache"""
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request,
+            catalogue_cache.list_key(request),
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs)
+        )
+
+
+class CachedRetrieveMixin:
+    """Serve detail pages from the catalogue cache"""
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            request,
+            catalogue_cache.detail_key(request, kwargs[self.lookup_field]),
+            lambda: super(CachedRetrieveMixin, self).retrieve(request, *args, **kwargs)
+        )
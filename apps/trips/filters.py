@@ -0,0 +1,54 @@
+"""
+Availability search for the trips catalogue
+Why: "Trips to X between these dates under this price with 4 seats free"
+couldn't be asked - only destination/status matched exactly, and free seats
+were only known in Python (Trip.available_spots)
+What: A FilterSet for TripListView - every condition is SQL on trip columns,
+served by the status-led date/price/free-seat indexes (see Trip.Meta.indexes)
+
+    ?destination=Sylhet           exact destination
+    ?date_from=&date_to=          trips overlapping the window (ISO dates, either may be left out)
+    ?min_price=&max_price=        price per person, inclusive
+    ?min_seats=4                  at least this many spots left
+"""
+import django_filters
+from django import forms
+
+from .models import Trip
+
+
+class SeatsFilter(django_filters.NumberFilter):
+    field_class = forms.IntegerField
+
+
+class TripFilterForm(forms.Form):
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for low, high in [('date_from', 'date_to'), ('min_price', 'max_price')]:
+            if cleaned_data.get(low) is not None and cleaned_data.get(high) is not None:
+                if cleaned_data[low] > cleaned_data[high]:
+                    self.add_error(high, f'Must not be less than {low}.')
+        return cleaned_data
+
+
+class TripFilterSet(django_filters.FilterSet):
+    date_from = django_filters.DateFilter(method='filter_date_from')
+    date_to = django_filters.DateFilter(method='filter_date_to')
+    min_price = django_filters.NumberFilter(field_name='price_per_person', lookup_expr='gte', min_value=0)
+    max_price = django_filters.NumberFilter(field_name='price_per_person', lookup_expr='lte', min_value=0)
+    min_seats = SeatsFilter(method='filter_min_seats', min_value=1)
+
+    class Meta:
+        model = Trip
+        fields = ['destination', 'status']
+        form = TripFilterForm
+
+    def filter_date_from(self, queryset, name, value):
+        return queryset.overlapping(start=value)
+
+    def filter_date_to(self, queryset, name, value):
+        return queryset.overlapping(end=value)
+
+    def filter_min_seats(self, queryset, name, value):
+        return queryset.with_free_seats(value)
@@ -0,0 +1,176 @@
+"""
+Bulk trip import
+Why: Operators onboard catalogues of tens of thousands of trips - one POST
+per trip through TripCreateSerializer takes hours
+What: Rows from CSV, JSON or NDJSON are validated with TripImportSerializer,
+creators are looked up once per chunk for the whole chunk, and the valid rows
+are inserted with bulk_create - one transaction per chunk. Rejected rows are
+reported with their row number and errors; a dry run validates only.
+Used by the import_trips command and TripImportView.
+"""
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Trip, trips_bulk_created
+from .serializers import TripImportSerializer
+
+FORMATS = ['csv', 'json', 'ndjson']
+
+
+class ImportFormatError(ValueError):
+    """The input can't be read as rows at all"""
+
+
+def guess_format(filename, default='csv'):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in FORMATS else default
+
+
+def text_stream(file):
+    """Binary upload/file -> text, dropping the BOM spreadsheets write"""
+    return io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+
+
+def read_rows(stream, fmt):
+    """
+    Yield the rows of a text stream as dicts
+    CSV/NDJSON are read lazily; JSON is a list of objects (or {"trips": [...]})
+    Raises ImportFormatError when the input can't be parsed - rows of
+    earlier chunks are already imported by then
+    """
+    try:
+        yield from _read_rows(stream, fmt)
+    except (csv.Error, UnicodeDecodeError) as error:
+        raise ImportFormatError(str(error))
+
+
+def _read_rows(stream, fmt):
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            # Blank cells count as missing, so model defaults apply
+            yield {key: value for key, value in row.items() if key and value != ''}
+    elif fmt == 'ndjson':
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise ImportFormatError(f'Line {number}: {error}')
+    elif fmt == 'json':
+        try:
+            data = json.load(stream)
+        except json.JSONDecodeError as error:
+            raise ImportFormatError(str(error))
+        if isinstance(data, dict):
+            data = data.get('trips')
+        if not isinstance(data, list):
+            raise ImportFormatError('Expected a list of trips')
+        yield from data
+    else:
+        raise ImportFormatError(f'Unknown format {fmt!r}')
+
+
+class ImportReport:
+    """Counts and per-row errors of one import - row numbers start at 1"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, number, errors):
+        self.rejected += 1
+        self.errors.append({'row': number, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'errors': self.errors,
+        }
+
+
+class TripImporter:
+    """
+    creator: import every row as this user (the API) - otherwise each row
+    names its creator by username (the command)
+    """
+
+    def __init__(self, creator=None, dry_run=False, batch_size=1000):
+        self.creator = creator
+        self.batch_size = batch_size
+        self.report = ImportReport(dry_run)
+        # One serializer for all rows - fields are built once, not per row
+        self.serializer = TripImportSerializer()
+        self.creators = {}
+
+    def run(self, rows):
+        chunk = []
+        for number, row in enumerate(rows, 1):
+            chunk.append((number, row))
+            if len(chunk) >= self.batch_size:
+                self.import_chunk(chunk)
+                chunk = []
+        self.import_chunk(chunk)
+        return self.report
+
+    def validate(self, chunk):
+        """Return [(row number, validated data)] - invalid rows go to the report"""
+        valid = []
+        for number, row in chunk:
+            if not isinstance(row, dict):
+                self.report.reject(number, {'non_field_errors': ['Expected an object']})
+                continue
+            try:
+                valid.append((number, self.serializer.run_validation(row)))
+            except serializers.ValidationError as error:
+                self.report.reject(number, error.detail)
+        return valid
+
+    def resolve_creators(self, valid):
+        """Look up the chunk's unknown usernames with one query"""
+        if self.creator is not None:
+            return
+        missing = {data['creator'] for _, data in valid if data.get('creator')} - set(self.creators)
+        if missing:
+            User = get_user_model()
+            self.creators.update(
+                User.objects.filter(username__in=missing).values_list('username', 'id')
+            )
+
+    def creator_id(self, data):
+        if self.creator is not None:
+            return self.creator.pk
+        return self.creators.get(data.get('creator'))
+
+    def import_chunk(self, chunk):
+        valid = self.validate(chunk)
+        self.resolve_creators(valid)
+
+        trips = []
+        for number, data in valid:
+            creator_id = self.creator_id(data)
+            if creator_id is None:
+                error = 'Unknown creator' if data.get('creator') else 'This field is required.'
+                self.report.reject(number, {'creator': [error]})
+                continue
+            data.pop('creator', None)
+            trips.append(Trip(creator_id=creator_id, **data))
+
+        if trips and not self.report.dry_run:
+            with transaction.atomic():
+                Trip.objects.bulk_create(trips, batch_size=self.batch_size)
+                trips_bulk_created.send(sender=Trip, trips=trips)
+        self.report.imported += len(trips)
+
+
+def import_trips(rows, creator=None, dry_run=False, batch_size=1000):
+    """Import an iterable of row dicts - returns an ImportReport"""
+    return TripImporter(creator, dry_run, batch_size).run(rows)
@@ -0,0 +1,61 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.trips.imports import FORMATS, ImportFormatError, guess_format, import_trips, read_rows, text_stream
+
+
+class Command(BaseCommand):
+    """
+    Import trips from a CSV, JSON or NDJSON file
+    Why: Onboard an operator's whole catalogue in one go
+    What: Each row names its creator by username (or use --creator for all
+    rows); valid rows are inserted in chunks, rejected rows are reported
+    Usage: python manage.py import_trips catalogue.csv --dry-run
+    """
+    help = 'Bulk import trips from a CSV/JSON/NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Default: from the file extension')
+        parser.add_argument('--creator', help='Username that creates every imported trip')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per transaction')
+        parser.add_argument('--errors', help='Write the rejected rows report (JSON) to this file')
+
+    def handle(self, *args, **options):
+        creator = None
+        if options['creator']:
+            try:
+                creator = get_user_model().objects.get(username=options['creator'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Unknown user {options['creator']!r}")
+
+        fmt = options['format'] or guess_format(options['path'])
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as file:
+                report = import_trips(
+                    read_rows(text_stream(file), fmt), creator=creator,
+                    dry_run=options['dry_run'], batch_size=options['batch_size'],
+                )
+        except (OSError, ImportFormatError) as error:
+            raise CommandError(str(error))
+        elapsed = time.perf_counter() - started
+
+        if options['errors']:
+            with open(options['errors'], 'w') as output:
+                json.dump(report.errors, output, indent=2)
+        for error in report.errors[:10]:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        if report.rejected > 10:
+            self.stderr.write(f'... {report.rejected - 10} more rejected rows')
+
+        rows = report.imported + report.rejected
+        verb = 'Would import' if report.dry_run else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {report.imported} trips, rejected {report.rejected} '
+            f'({rows / elapsed if elapsed else rows:.0f} rows/s)'
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.trips.models import TripImage
+from apps.users.models import User
+from sharetrip.images import AVATAR_SIZES, TRIP_IMAGE_SIZES, process
+
+
+class Command(BaseCommand):
+    """
+    Make the resized variants of images that don't have them yet
+    Why: Uploads from before the image pipeline, and uploads that failed,
+    have no thumbnails
+    Usage: python manage.py process_images [--retry-failed]
+    """
+    help = 'Generate WebP variants for trip images and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Also reprocess images that failed before')
+
+    def handle(self, *args, **options):
+        jobs = [
+            (TripImage, 'image', 'variants', TRIP_IMAGE_SIZES),
+            (User, 'avatar', 'avatar_variants', AVATAR_SIZES),
+        ]
+        for model, field_name, variants_field, sizes in jobs:
+            todo = Q(**{variants_field: {}})
+            if options['retry_failed']:
+                todo |= Q(**{f'{variants_field}__status': 'failed'})
+            pks = (
+                model.objects.filter(todo)
+                .exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                .values_list('pk', flat=True)
+            )
+            count = 0
+            for pk in pks.iterator():
+                # Inline - the command itself is already off the request path
+                process(model, pk, field_name, variants_field, sizes)
+                count += 1
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {count} processed')
+        self.stdout.write(self.style.SUCCESS('Done'))
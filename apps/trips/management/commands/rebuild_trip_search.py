@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.trips.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the trip full-text search index
+    Why: Rows written with bulk_create/update() skip the save signals
+    Usage: python manage.py rebuild_trip_search
+    """
+    help = 'Rebuild the full-text search index for trips'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = backend.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} trips with {type(backend).__name__}'
+        ))
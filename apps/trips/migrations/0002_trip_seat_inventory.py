@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:00
+
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def backfill_seat_inventory(apps, schema_editor):
+    """Fill the new seat counters from the bookings that already exist"""
+    Trip = apps.get_model('trips', 'Trip')
+    Booking = apps.get_model('bookings', 'Booking')
+
+    totals = Booking.objects.values('trip_id').annotate(
+        confirmed_seats=Sum('number_of_people', filter=Q(status='confirmed')),
+        pending_seats=Sum('number_of_people', filter=Q(status='pending')),
+        confirmed_revenue=Sum('total_price', filter=Q(status='confirmed')),
+    )
+    for row in totals:
+        Trip.objects.filter(pk=row['trip_id']).update(
+            confirmed_seats=row['confirmed_seats'] or 0,
+            pending_seats=row['pending_seats'] or 0,
+            confirmed_revenue=row['confirmed_revenue'] or 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0001_initial'),
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='confirmed_revenue',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='confirmed_seats',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='pending_seats',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_seat_inventory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:40
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Create the full-text index for the database in use
+    SQLite: FTS5 virtual table (skipped if this SQLite build has no FTS5)
+    PostgreSQL: GIN expression index - must match POSTGRES_VECTOR in search.py
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE trips_search USING fts5("
+                "title, description, destination, tokenize = 'unicode61')"
+            )
+        except Exception:
+            return
+        schema_editor.execute(
+            "INSERT INTO trips_search (rowid, title, description, destination) "
+            "SELECT id, title, description, destination FROM trips"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX trips_search_idx ON trips USING GIN ("
+            "to_tsvector('simple', coalesce(trips.title, '') || ' ' || "
+            "coalesce(trips.destination, '') || ' ' || coalesce(trips.description, '')))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS trips_search")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS trips_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0002_trip_seat_inventory'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
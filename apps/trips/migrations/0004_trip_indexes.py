@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0003_trip_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['-created_at'], name='trips_published_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['destination', '-created_at'], name='trips_published_dest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['status', '-created_at'], name='trips_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['creator', '-created_at'], name='trips_creator_created_idx'),
+        ),
+    ]
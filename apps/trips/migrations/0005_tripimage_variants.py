@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0004_trip_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tripimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
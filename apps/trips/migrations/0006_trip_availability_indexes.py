@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:14
+
+import apps.trips.models
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0005_tripimage_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['status', 'start_date', 'end_date', 'price_per_person', 'max_participants', 'confirmed_seats', 'pending_seats'], name='trips_status_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['status', 'price_per_person'], name='trips_status_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(models.F('status'), django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('max_participants'), '-', models.F('confirmed_seats')), '-', models.F('pending_seats')), name='trips_status_free_seats_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(apps.trips.models.TripDays(), name='trips_days_idx'),
+        ),
+    ]
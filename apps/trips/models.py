@@ -1,5 +1,113 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Func, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.dispatch import Signal
+
+# Sent after TripImage.objects.bulk_add() - bulk_create skips post_save
+# Arguments: trip, images (list of the new TripImage objects)
+trip_images_bulk_created = Signal()
+
+# Sent after a bulk trip import (imports.py) - inside the chunk's transaction
+# Arguments: trips (list of the new Trip objects, with ids)
+trips_bulk_created = Signal()
+
+class TripDays(Func):
+    """
+    Length of a trip in days (end_date - start_date)
+    Built from deterministic SQL only, so it can be indexed
+    """
+    output_field = models.IntegerField()
+    
+    def __init__(self, **extra):
+        super().__init__(F('end_date'), F('start_date'), **extra)
+    
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date - date is a number of days
+        return super().as_sql(
+            compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context
+        )
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)', arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+def free_seats():
+    """Spots left on a trip, as SQL (Trip.available_spots without the floor at 0)"""
+    return F('max_participants') - F('confirmed_seats') - F('pending_seats')
+
+class DaysBefore(Func):
+    """The date `days` days before `date`"""
+    output_field = models.DateField()
+    
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date - integer is a date
+        return super().as_sql(
+            compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context
+        )
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template="date(%(expressions)s || ' days')", arg_joiner=", '-' || ",
+            **extra_context
+        )
+
+class TripQuerySet(models.QuerySet):
+    """
+    Reusable query building blocks for trips
+    Why: Keep list endpoints at a constant number of queries
+    """
+    
+    def published(self):
+        """Only trips that are visible in the public catalogue"""
+        return self.filter(status='published')
+    
+    def overlapping(self, start=None, end=None):
+        """
+        Trips under way at some point between start and end (both inclusive)
+        Either bound may be left open
+        """
+        trips = self
+        if start is not None:
+            # A trip ending on or after `start` began at most the longest trip's
+            # length before it - the redundant lower bound turns start_date into a
+            # closed range on the dates index instead of everything before `end`
+            longest = Trip.objects.order_by().annotate(days=TripDays()).order_by('-days').values('days')[:1]
+            trips = trips.filter(
+                end_date__gte=start,
+                start_date__gte=DaysBefore(
+                    Value(start, output_field=models.DateField()), Coalesce(Subquery(longest), 0)
+                ),
+            )
+        if end is not None:
+            trips = trips.filter(start_date__lte=end)
+        return trips
+    
+    def with_free_seats(self, seats):
+        """
+        Trips with at least `seats` spots left
+        On the seat counters - no join to bookings - and in the form of
+        trips_status_free_seats_idx, so counts are answered from the index
+        """
+        return self.alias(free_seats=free_seats()).filter(free_seats__gte=seats)
+    
+    def with_listing_stats(self):
+        """
+        Load everything TripSerializer needs up front
+        Why: Avoid one creator query and one images query per trip.
+        Seat and revenue stats are columns on Trip, so no counting is needed.
+        """
+        return self.select_related('creator').prefetch_related('images')
+
+class SeatInventoryError(IntegrityError):
+    """
+    A trip's seat counters don't hold the seats a booking action moves
+    Raised inside the action's transaction, so its status change rolls back
+    with it instead of leaving the counters out of step
+    """
 
 class Trip(models.Model):
     """
@@ -39,40 +147,162 @@ class Trip(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Seat inventory - denormalized counters kept in sync by booking actions
+    # Why: availability becomes an O(1) read instead of COUNT(*) over bookings
+    confirmed_seats = models.PositiveIntegerField(default=0, editable=False)
+    pending_seats = models.PositiveIntegerField(default=0, editable=False)
+    confirmed_revenue = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
+    INVENTORY_FIELDS = ['confirmed_seats', 'pending_seats', 'confirmed_revenue']
+    
+    # CSV/NDJSON export columns (sharetrip/exports.py) - name: lookup
+    EXPORT_COLUMNS = {
+        'id': 'id',
+        'title': 'title',
+        'description': 'description',
+        'destination': 'destination',
+        'status': 'status',
+        'creator_id': 'creator_id',
+        'creator': 'creator__username',
+        'start_date': 'start_date',
+        'end_date': 'end_date',
+        'max_participants': 'max_participants',
+        'price_per_person': 'price_per_person',
+        'confirmed_seats': 'confirmed_seats',
+        'pending_seats': 'pending_seats',
+        'confirmed_revenue': 'confirmed_revenue',
+        'created_at': 'created_at',
+    }
+    
+    objects = TripQuerySet.as_manager()
+    
     # OOP Concept: Method - behavior of the class
     def __str__(self):
         return f"{self.title} - {self.destination}"
     
     def is_available(self):
         """Check if trip is available for booking"""
-        from .bookings.models import Booking
-        current_bookings = Booking.objects.filter(
-            trip=self, 
-            status='confirmed'
-        ).count()
-        return current_bookings < self.max_participants
+        return self.available_spots() > 0
     
     def available_spots(self):
-        """Calculate available spots"""
-        from apps.bookings.models import Booking
-        confirmed_bookings = Booking.objects.filter(
-            trip=self, 
-            status='confirmed'
-        ).count()
-        return self.max_participants - confirmed_bookings
+        """
+        Calculate available spots
+        Why: Seats held by pending bookings are not available to others
+        """
+        remaining = self.max_participants - self.confirmed_seats - self.pending_seats
+        return max(remaining, 0)
     
     def total_revenue(self):
         """Calculate total revenue from confirmed bookings"""
-        from apps.bookings.models import Booking
-        confirmed_bookings = Booking.objects.filter(
-            trip=self, 
-            status='confirmed'
-        ).count()
-        return confirmed_bookings * self.price_per_person
+        return self.confirmed_revenue
+    
+    # Seat inventory operations
+    # Why: Each one is a single conditional UPDATE, so concurrent requests
+    # can never push the counters past max_participants (no overselling)
+    def reserve_seats(self, seats):
+        """
+        Hold seats for a new pending booking
+        Returns False if fewer than `seats` spots are left
+        """
+        updated = Trip.objects.filter(
+            pk=self.pk,
+            max_participants__gte=F('confirmed_seats') + F('pending_seats') + seats,
+        ).update(pending_seats=F('pending_seats') + seats)
+        self.refresh_from_db(fields=self.INVENTORY_FIELDS)
+        return bool(updated)
+    
+    def confirm_seats(self, seats, amount):
+        """Move held seats from pending to confirmed and add the revenue"""
+        updated = Trip.objects.filter(
+            pk=self.pk,
+            pending_seats__gte=seats,
+        ).update(
+            pending_seats=F('pending_seats') - seats,
+            confirmed_seats=F('confirmed_seats') + seats,
+            confirmed_revenue=F('confirmed_revenue') + amount,
+        )
+        self.refresh_from_db(fields=self.INVENTORY_FIELDS)
+        return bool(updated)
+    
+    def release_seats(self, seats, amount=0, confirmed=False):
+        """Give seats back when a pending or confirmed booking is cancelled"""
+        if confirmed:
+            updated = Trip.objects.filter(
+                pk=self.pk,
+                confirmed_seats__gte=seats,
+            ).update(
+                confirmed_seats=F('confirmed_seats') - seats,
+                confirmed_revenue=F('confirmed_revenue') - amount,
+            )
+        else:
+            updated = Trip.objects.filter(
+                pk=self.pk,
+                pending_seats__gte=seats,
+            ).update(pending_seats=F('pending_seats') - seats)
+        self.refresh_from_db(fields=self.INVENTORY_FIELDS)
+        return bool(updated)
     
     class Meta:
         db_table = 'trips'
         ordering = ['-created_at']
+        # Indexes for the query shapes the API actually runs
+        # Partial indexes only cover published trips (the public catalogue)
+        indexes = [
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(status='published'),
+                name='trips_published_created_idx',
+            ),
+            models.Index(
+                fields=['destination', '-created_at'],
+                condition=models.Q(status='published'),
+                name='trips_published_dest_idx',
+            ),
+            models.Index(fields=['status', '-created_at'], name='trips_status_created_idx'),
+            models.Index(fields=['creator', '-created_at'], name='trips_creator_created_idx'),
+            # Availability search (filters.py) - range scans on dates or price.
+            # The dates index carries the other filtered columns, so a date
+            # window with price/seat filters is checked without row lookups
+            models.Index(
+                fields=[
+                    'status', 'start_date', 'end_date', 'price_per_person',
+                    'max_participants', 'confirmed_seats', 'pending_seats',
+                ],
+                name='trips_status_dates_idx',
+            ),
+            models.Index(fields=['status', 'price_per_person'], name='trips_status_price_idx'),
+            models.Index('status', free_seats(), name='trips_status_free_seats_idx'),
+            # Longest trip, read by TripQuerySet.overlapping() without a scan
+            models.Index(TripDays(), name='trips_days_idx'),
+        ]
+
+class TripImageQuerySet(models.QuerySet):
+    
+    def bulk_add(self, trip, uploads):
+        """
+        Store a gallery of uploads and insert their rows in one query
+        uploads: (file, caption) pairs - files already spooled to disk are
+        moved into storage rather than copied
+        """
+        images = []
+        try:
+            for upload, caption in uploads:
+                image = TripImage(trip=trip, caption=caption)
+                image.image.save(upload.name, upload, save=False)
+                images.append(image)
+            with transaction.atomic():
+                self.bulk_create(images)
+                trip_images_bulk_created.send(sender=TripImage, trip=trip, images=images)
+        except Exception:
+            # No rows point at the stored files - don't leave them behind
+            for image in images:
+                image.image.delete(save=False)
+            raise
+        return images
 
 class TripImage(models.Model):
     """
@@ -86,8 +316,12 @@ class TripImage(models.Model):
     )
     image = models.ImageField(upload_to='trip_images/')
     caption = models.CharField(max_length=200, blank=True)
+    # Resized WebP versions and dimensions, filled in by sharetrip.images
+    variants = models.JSONField(default=dict, blank=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    objects = TripImageQuerySet.as_manager()
+    
     def __str__(self):
         return f"Image for {self.trip.title}"
     
@@ -0,0 +1,203 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+# Column weights - a match in the title counts more than one in the description
+TITLE_WEIGHT, DESCRIPTION_WEIGHT, DESTINATION_WEIGHT = 10.0, 1.0, 5.0
+
+# PostgreSQL expression - must match the GIN index in migration 0003 exactly
+POSTGRES_VECTOR = (
+    "to_tsvector('simple', coalesce(trips.title, '') || ' ' || "
+    "coalesce(trips.destination, '') || ' ' || coalesce(trips.description, ''))"
+)
+
+
+def search_terms(text):
+    """Split user input into plain words - drops any query syntax"""
+    return re.findall(r'\w+', text.lower())
+
+
+class TripSearchBackend:
+    """
+    Full-text search over trip title, description and destination
+    Why: icontains on three columns scans the whole table for every search
+    What: Base class - plain LIKE fallback for databases without an index
+    """
+
+    def is_available(self):
+        return True
+
+    def filter(self, queryset, terms):
+        """
+        Return trips matching all terms (prefix match)
+        Indexed backends also annotate search_rank (higher is better)
+        """
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) |
+                Q(description__icontains=term) |
+                Q(destination__icontains=term)
+            )
+        return queryset
+
+    def index_trip(self, trip):
+        """Add or refresh one trip in the index"""
+
+    def index_new_trips(self, trips):
+        """Add trips that were just created (bulk_create) to the index"""
+
+    def remove_trip(self, trip_id):
+        """Remove one trip from the index"""
+
+    def rebuild(self, batch_size=1000):
+        """Rebuild the whole index - returns the number of indexed trips"""
+        return 0
+
+
+class SQLiteTripSearch(TripSearchBackend):
+    """
+    SQLite FTS5 inverted index
+    What: Virtual table trips_search with rowid = trip id, kept in sync by
+    the post_save/post_delete handlers in signals.py
+    """
+    table = 'trips_search'
+
+    def __init__(self):
+        self._available = {}
+
+    def is_available(self):
+        # Checked once per database file - FTS5 may be missing from the build
+        key = str(connection.settings_dict['NAME'])
+        if key not in self._available:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                    [self.table]
+                )
+                self._available[key] = cursor.fetchone() is not None
+        return self._available[key]
+
+    def match_expression(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def filter(self, queryset, terms):
+        match = self.match_expression(terms)
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [match])
+        ).annotate(search_rank=RawSQL(
+            # bm25() is lower for better matches - negate so higher is better
+            f'SELECT -bm25({self.table}, %s, %s, %s) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND rowid = trips.id',
+            [TITLE_WEIGHT, DESCRIPTION_WEIGHT, DESTINATION_WEIGHT, match]
+        ))
+
+    def index_trip(self, trip):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [trip.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, description, destination) '
+                f'VALUES (%s, %s, %s, %s)',
+                [trip.pk, trip.title, trip.description, trip.destination]
+            )
+
+    def index_new_trips(self, trips):
+        with connection.cursor() as cursor:
+            self._insert_many(
+                cursor, [(trip.pk, trip.title, trip.description, trip.destination) for trip in trips]
+            )
+
+    def remove_trip(self, trip_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [trip_id])
+
+    def rebuild(self, batch_size=1000):
+        from .models import Trip
+
+        count = 0
+        rows = Trip.objects.order_by().values_list('id', 'title', 'description', 'destination')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    count += self._insert_many(cursor, batch)
+                    batch = []
+            count += self._insert_many(cursor, batch)
+        return count
+
+    def _insert_many(self, cursor, rows):
+        if rows:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, description, destination) '
+                f'VALUES (%s, %s, %s, %s)',
+                rows
+            )
+        return len(rows)
+
+
+class PostgresTripSearch(TripSearchBackend):
+    """
+    PostgreSQL tsvector search
+    What: Expression GIN index on the trips table, so the index follows every
+    write by itself and index_trip/remove_trip have nothing to do
+    """
+
+    def match_expression(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def filter(self, queryset, terms):
+        match = self.match_expression(terms)
+        return queryset.filter(RawSQL(
+            f"{POSTGRES_VECTOR} @@ to_tsquery('simple', %s)", [match],
+            output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f"ts_rank({POSTGRES_VECTOR}, to_tsquery('simple', %s))", [match]
+        ))
+
+    def rebuild(self, batch_size=1000):
+        from .models import Trip
+
+        with connection.cursor() as cursor:
+            cursor.execute('REINDEX INDEX trips_search_idx')
+        return Trip.objects.count()
+
+
+_backends = {
+    'sqlite': SQLiteTripSearch(),
+    'postgresql': PostgresTripSearch(),
+}
+_fallback = TripSearchBackend()
+
+
+def get_search_backend():
+    """Pick the search backend for the current database"""
+    backend = _backends.get(connection.vendor, _fallback)
+    return backend if backend.is_available() else _fallback
+
+
+class TripSearchFilter(filters.BaseFilterBackend):
+    """
+    Filter backend for ?search= using the full-text index
+    Why: Drop-in replacement for SearchFilter on TripListView
+    What: Results are ordered by relevance unless ?ordering= is given.
+    Keep it after OrderingFilter in filter_backends so the default ordering
+    doesn't replace the relevance ordering.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        terms = search_terms(request.query_params.get(self.search_param, ''))
+        if not terms:
+            return queryset
+
+        backend = get_search_backend()
+        queryset = backend.filter(queryset, terms)
+        ordered = api_settings.ORDERING_PARAM in request.query_params
+        if 'search_rank' in queryset.query.annotations and not ordered:
+            queryset = queryset.order_by('-search_rank', '-created_at')
+        return queryset
@@ -1,21 +1,61 @@
+import re
+
 from rest_framework import serializers
+from rest_framework.validators import ProhibitSurrogateCharactersValidator
+from sharetrip.compiled import CompiledRepresentationMixin
+from sharetrip.images import ImageVariantsField
+from sharetrip.sparse import SparseFieldsMixin
 from .models import Trip, TripImage
 from apps.users.serializers import UserSerializer
 
-class TripImageSerializer(serializers.ModelSerializer):
+class TripImageSerializer(SparseFieldsMixin, CompiledRepresentationMixin, serializers.ModelSerializer):
     """
     Serializer for trip images
     Why: Handle image uploads and data
+    What: `variants` holds the resized WebP URLs - use them instead of the original
     """
+    variants = ImageVariantsField('image')
+    field_columns = {'variants': ['image', 'variants']}
+
     class Meta:
         model = TripImage
-        fields = ['id', 'image', 'caption', 'uploaded_at']
+        fields = ['id', 'image', 'caption', 'variants', 'uploaded_at']
         read_only_fields = ['uploaded_at']
 
-class TripSerializer(serializers.ModelSerializer):
+class TripGallerySerializer(serializers.Serializer):
+    """
+    Serializer for gallery (multi-image) uploads
+    Why: Validate every file before any of them is stored
+    What: `images` repeated per file, optional `captions` in the same order
+    """
+    images = serializers.ListField(child=serializers.ImageField(), allow_empty=False)
+    captions = serializers.ListField(
+        child=serializers.CharField(max_length=200, allow_blank=True), required=False
+    )
+
+    def validate(self, attrs):
+        captions = attrs.get('captions', [])
+        if len(captions) > len(attrs['images']):
+            raise serializers.ValidationError({'captions': 'More captions than images'})
+        # Pair each file with its caption (blank when missing)
+        captions = captions + [''] * (len(attrs['images']) - len(captions))
+        attrs['uploads'] = list(zip(attrs['images'], captions))
+        return attrs
+
+def validate_trip_dates(attrs):
+    """Date rules shared by TripSerializer and the bulk import"""
+    if attrs.get('start_date') and attrs.get('end_date'):
+        if attrs['start_date'] >= attrs['end_date']:
+            raise serializers.ValidationError(
+                "Start date must be before end date"
+            )
+    return attrs
+
+class TripSerializer(SparseFieldsMixin, CompiledRepresentationMixin, serializers.ModelSerializer):
     """
     Serializer for Trip model
     Why: Handle trip data for API responses
+    What: Lists render the card fields - ?fields=/?expand= for more (sharetrip.sparse)
     """
     # Nested serializers - show creator info and images
     creator = UserSerializer(read_only=True)
@@ -26,12 +66,23 @@ class TripSerializer(serializers.ModelSerializer):
     is_available = serializers.SerializerMethodField()
     total_revenue = serializers.SerializerMethodField()
     
+    # What a trip card shows - no description, creator or images
+    card_fields = [
+        'id', 'title', 'destination', 'start_date', 'end_date', 'price_per_person',
+        'status', 'available_spots', 'is_available',
+    ]
+    field_columns = {
+        'available_spots': ['max_participants', 'confirmed_seats', 'pending_seats'],
+        'is_available': ['max_participants', 'confirmed_seats', 'pending_seats'],
+        'total_revenue': ['creator', 'confirmed_revenue'],
+    }
+    
     class Meta:
         model = Trip
         fields = [
             'id', 'title', 'description', 'destination', 'creator',
             'start_date', 'end_date', 'max_participants', 'price_per_person',
-            'image', 'status', 'available_spots', 'is_available', 
+            'status', 'available_spots', 'is_available', 
             'total_revenue', 'images', 'created_at', 'updated_at'
         ]
         read_only_fields = ['creator', 'created_at', 'updated_at']
@@ -47,7 +98,8 @@ class TripSerializer(serializers.ModelSerializer):
     def get_total_revenue(self, obj):
         """Get total revenue (only for creator)"""
         request = self.context.get('request')
-        if request and request.user == obj.creator:
+        # Compare ids - no need to load the creator row for this check
+        if request and request.user.id == obj.creator_id:
             return obj.total_revenue()
         return None
     
@@ -56,12 +108,7 @@ class TripSerializer(serializers.ModelSerializer):
         Custom validation
         Why: Ensure start date is before end date
         """
-        if attrs.get('start_date') and attrs.get('end_date'):
-            if attrs['start_date'] >= attrs['end_date']:
-                raise serializers.ValidationError(
-                    "Start date must be before end date"
-                )
-        return attrs
+        return validate_trip_dates(attrs)
 
 class TripCreateSerializer(serializers.ModelSerializer):
     """
@@ -72,7 +119,7 @@ class TripCreateSerializer(serializers.ModelSerializer):
         model = Trip
         fields = [
             'title', 'description', 'destination', 'start_date', 
-            'end_date', 'max_participants', 'price_per_person', 'image'
+            'end_date', 'max_participants', 'price_per_person'
         ]
     
     def create(self, validated_data):
@@ -82,4 +129,68 @@ class TripCreateSerializer(serializers.ModelSerializer):
         """
         request = self.context.get('request')
         validated_data['creator'] = request.user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class FastSurrogateValidator(ProhibitSurrogateCharactersValidator):
+    """
+    DRF's surrogate check as one regex scan instead of a Python loop per
+    character - it was half of the import's validation time on long descriptions
+    """
+    pattern = re.compile('[\ud800-\udfff]')
+
+    def __call__(self, value):
+        match = self.pattern.search(str(value))
+        if match:
+            message = self.message.format(code_point=ord(match.group()))
+            raise serializers.ValidationError(message, code=self.code)
+
+
+class TripImportSerializer(serializers.ModelSerializer):
+    """
+    One row of a bulk trip import (imports.py)
+    Why: Same field and date rules as creating a trip through the API
+    What: `creator` is a username - resolved in bulk by the importer
+    """
+    creator = serializers.CharField(required=False)
+
+    class Meta:
+        model = Trip
+        fields = [
+            'title', 'description', 'destination', 'start_date', 'end_date',
+            'max_participants', 'price_per_person', 'status', 'creator'
+        ]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for field in fields.values():
+            field.validators = [
+                FastSurrogateValidator() if isinstance(validator, ProhibitSurrogateCharactersValidator)
+                else validator
+                for validator in field.validators
+            ]
+        return fields
+
+    def validate(self, attrs):
+        return validate_trip_dates(attrs)
+
+
+class TripImportRequestSerializer(serializers.Serializer):
+    """
+    Body of the import endpoint
+    What: A CSV/JSON/NDJSON `file` upload, or the rows inline as `trips`
+    """
+    file = serializers.FileField(required=False)
+    trips = serializers.ListField(child=serializers.DictField(), required=False)
+    format = serializers.ChoiceField(choices=['csv', 'json', 'ndjson'], required=False)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if ('file' in attrs) == ('trips' in attrs):
+            raise serializers.ValidationError('Send either a file or a trips list')
+        return attrs
+
+
+class TripExportSerializer(serializers.Serializer):
+    """Query parameters of the trips export"""
+    status = serializers.ChoiceField(choices=Trip.STATUS_CHOICES, required=False)
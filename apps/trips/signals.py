@@ -0,0 +1,167 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.bookings.models import Booking
+from apps.bookings.signals import booking_status_changed, bookings_bulk_created
+from apps.users.models import User
+from apps.users.serializers import UserSerializer
+from sharetrip.images import (
+    TRIP_IMAGE_SIZES, delete_variants, schedule_processing, track_image_change,
+)
+from .cache import catalogue_cache
+from .models import Trip, TripImage, trip_images_bulk_created, trips_bulk_created
+from .search import get_search_backend
+
+
+def invalidate_trip_on_commit(trip_id, destinations=(), listed=True):
+    """Invalidate cached catalogue pages once the write is committed"""
+    transaction.on_commit(
+        lambda: catalogue_cache.invalidate_trip(trip_id, destinations, listed)
+    )
+
+
+def invalidate_trip_by_id(trip_id):
+    trip = Trip.objects.filter(pk=trip_id).values('status', 'destination').first()
+    if trip is None:
+        return
+    invalidate_trip_on_commit(
+        trip_id, [trip['destination']], listed=trip['status'] == 'published'
+    )
+
+
+# What post_save receivers compare against - the list pages a trip is on
+# (status, destination) and what bookers' dashboards show (apps/users/stats.py)
+PREVIOUS_STATE_FIELDS = ['status', 'destination', 'title', 'start_date']
+
+
+@receiver(pre_save, sender=Trip)
+def remember_previous_trip_state(sender, instance, **kwargs):
+    """
+    Keep the PREVIOUS_STATE_FIELDS the trip had before this save
+    Why: A trip moving out of a destination or out of 'published'
+    must invalidate the pages it used to be on
+    """
+    previous = None
+    if instance.pk:
+        previous = Trip.objects.filter(pk=instance.pk).values(*PREVIOUS_STATE_FIELDS).first()
+    instance._previous_state = previous
+
+
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+def invalidate_trip(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_state', None) or {}
+    destinations = [instance.destination]
+    if previous.get('destination'):
+        destinations.append(previous['destination'])
+    listed = 'published' in (instance.status, previous.get('status'))
+    invalidate_trip_on_commit(instance.pk, destinations, listed)
+
+
+@receiver(post_save, sender=TripImage)
+@receiver(post_delete, sender=TripImage)
+def invalidate_trip_images(sender, instance, **kwargs):
+    invalidate_trip_by_id(instance.trip_id)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_trip_bookings(sender, instance, **kwargs):
+    """New or removed bookings change the trip's available spots"""
+    invalidate_trip_by_id(instance.trip_id)
+
+
+def invalidate_booked_trip(trip):
+    invalidate_trip_on_commit(trip.pk, [trip.destination], listed=trip.status == 'published')
+
+
+@receiver(booking_status_changed)
+def invalidate_trip_booking_status(sender, booking, **kwargs):
+    # booking.trip is already loaded by confirm()/cancel() - no extra query
+    invalidate_booked_trip(booking.trip)
+
+
+@receiver(bookings_bulk_created)
+def invalidate_trips_bulk_booked(sender, bookings, **kwargs):
+    trips = {booking.trip_id: booking.trip for booking in bookings}
+    for trip in trips.values():
+        invalidate_booked_trip(trip)
+
+
+def invalidate_creator_trips(user_id):
+    """
+    Trip pages embed the creator's profile (name, bio, avatar) - drop every
+    trip of theirs, and the lists once if any of them is published
+    """
+    trips = list(Trip.objects.filter(creator_id=user_id).values_list('id', 'destination', 'status'))
+    if not trips:
+        return
+
+    def invalidate():
+        for trip_id, _, _ in trips:
+            catalogue_cache.invalidate_trip(trip_id, listed=False)
+        published = {destination for _, destination, status in trips if status == 'published'}
+        if published:
+            catalogue_cache.invalidate_lists(published)
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=User)
+def invalidate_creator_profile(sender, instance, created=False, update_fields=None, **kwargs):
+    # A new user has no trips; logins save only last_login, which isn't shown
+    if created or (update_fields and not set(update_fields) & set(UserSerializer.Meta.fields)):
+        return
+    invalidate_creator_trips(instance.pk)
+
+
+@receiver(post_save, sender=Trip)
+def index_trip_for_search(sender, instance, **kwargs):
+    """Keep the full-text index in sync with the trip"""
+    get_search_backend().index_trip(instance)
+
+
+@receiver(post_delete, sender=Trip)
+def remove_trip_from_search(sender, instance, **kwargs):
+    get_search_backend().remove_trip(instance.pk)
+
+
+@receiver(trips_bulk_created)
+def index_imported_trips(sender, trips, **kwargs):
+    """Imported trips - one index write and one cache bump per chunk"""
+    get_search_backend().index_new_trips(trips)
+    published = {trip.destination for trip in trips if trip.status == 'published'}
+    if published:
+        transaction.on_commit(lambda: catalogue_cache.invalidate_lists(published))
+
+
+@receiver(pre_save, sender=TripImage)
+def remember_trip_image_upload(sender, instance, update_fields=None, **kwargs):
+    track_image_change(instance, 'image', 'variants', update_fields)
+
+
+@receiver(post_save, sender=TripImage)
+def process_trip_image(sender, instance, **kwargs):
+    """Make the thumbnails off the request, then drop the cached pages showing the trip"""
+    if getattr(instance, '_image_changed', False):
+        trip_id = instance.trip_id
+        schedule_processing(
+            instance, 'image', 'variants', TRIP_IMAGE_SIZES,
+            on_done=lambda: invalidate_trip_by_id(trip_id)
+        )
+
+
+@receiver(trip_images_bulk_created)
+def process_trip_gallery(sender, trip, images, **kwargs):
+    invalidate_trip_on_commit(trip.pk, [trip.destination], listed=trip.status == 'published')
+    for image in images:
+        schedule_processing(
+            image, 'image', 'variants', TRIP_IMAGE_SIZES,
+            on_done=lambda: invalidate_trip_by_id(trip.pk)
+        )
+
+
+@receiver(post_delete, sender=TripImage)
+def delete_trip_image_variants(sender, instance, **kwargs):
+    storage, variants = instance.image.storage, instance.variants
+    transaction.on_commit(lambda: delete_variants(storage, variants))
@@ -1,3 +1,1210 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from PIL import Image
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from sharetrip.compression import brotli
+from sharetrip.instrumentation import endpoint_stats
+from sharetrip.query_plans import full_scans
+from sharetrip.renderers import JSONParser, JSONRenderer
+from sharetrip.sparse import FieldSpec
+
+from apps.bookings.models import Booking
+from .cache import catalogue_cache
+from . import async_views, views
+from .models import Trip, TripImage
+from .serializers import TripSerializer
+
+User = get_user_model()
+
+
+def make_trips(creator, count, **kwargs):
+    defaults = {
+        'description': 'Long description',
+        'destination': 'Cox\'s Bazar',
+        'start_date': date(2030, 3, 1),
+        'end_date': date(2030, 3, 5),
+        'max_participants': 10,
+        'price_per_person': Decimal('250.00'),
+        'status': 'published',
+    }
+    defaults.update(kwargs)
+    return Trip.objects.bulk_create(
+        Trip(creator=creator, title=f'Trip {i}', **defaults) for i in range(count)
+    )
+
+
+class TripListQueryCountTests(APITestCase):
+    """Listing trips runs a fixed number of queries regardless of page size"""
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        trips = make_trips(self.creator, 25)
+        TripImage.objects.bulk_create(
+            TripImage(trip=trip, image=f'trip_images/{trip.id}.jpg')
+            for trip in trips for _ in range(2)
+        )
+
+    def test_list_query_count_is_constant(self):
+        # count + trips joined with creator + prefetched images
+        for page_size in (10, 20):
+            cache.clear()
+            with mock.patch.object(PageNumberPagination, 'page_size', page_size):
+                with self.assertNumQueries(3):
+                    response = self.client.get(reverse('trip-list'), {'expand': 'creator,images'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), page_size)
+            self.assertEqual(len(response.data['results'][0]['images']), 2)
+
+    def test_cards_skip_relations(self):
+        # count + trips - no creator join, no images query
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('trip-list'))
+        self.assertNotIn('images', response.data['results'][0])
+
+    def test_detail_query_count(self):
+        trip = Trip.objects.first()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('trip-detail', args=[trip.id]))
+        self.assertEqual(response.data['available_spots'], 10)
+
+
+class CatalogueCacheTests(APITestCase):
+    """Public trip pages are cached and invalidated by writes"""
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        self.dhaka_trip, = make_trips(self.creator, 1, destination='Dhaka')
+        self.sylhet_trip, = make_trips(self.creator, 1, destination='Sylhet')
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_second_request_is_served_from_cache(self):
+        catalogue_cache.reset_stats()
+        self.assertEqual(self.get(reverse('trip-list'))['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(reverse('trip-list'))['X-Cache'], 'HIT')
+        self.assertEqual(catalogue_cache.stats()['hits'], 1)
+
+    def test_trip_edit_only_invalidates_pages_that_could_contain_it(self):
+        list_url = reverse('trip-list')
+        detail_url = reverse('trip-detail', args=[self.sylhet_trip.id])
+        self.get(list_url, destination='Dhaka')
+        self.get(list_url, destination='Sylhet')
+        self.get(detail_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sylhet_trip.title = 'Tea gardens'
+            self.sylhet_trip.save()
+
+        self.assertEqual(self.get(list_url, destination='Dhaka')['X-Cache'], 'HIT')
+        response = self.get(list_url, destination='Sylhet')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], 'Tea gardens')
+        self.assertEqual(self.get(detail_url)['X-Cache'], 'MISS')
+
+    def test_booking_status_change_invalidates_trip(self):
+        from apps.bookings.models import Booking
+
+        customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='password123'
+        )
+        self.dhaka_trip.reserve_seats(2)
+        booking = Booking.objects.create(
+            user=customer, trip=self.dhaka_trip, number_of_people=2, total_price=500
+        )
+        detail_url = reverse('trip-detail', args=[self.dhaka_trip.id])
+        self.assertEqual(self.get(detail_url).data['available_spots'], 8)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.cancel()
+
+        response = self.get(detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['available_spots'], 10)
+
+    def test_creator_profile_edit_invalidates_their_trips(self):
+        detail_url = reverse('trip-detail', args=[self.dhaka_trip.id])
+        list_url = reverse('trip-list')
+        self.get(detail_url)
+        self.get(list_url, destination='Sylhet', expand='creator')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creator.first_name = 'Rahim'
+            self.creator.save()
+
+        response = self.get(detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['creator']['first_name'], 'Rahim')
+        response = self.get(list_url, destination='Sylhet', expand='creator')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['creator']['full_name'], 'Rahim')
+
+    def test_login_keeps_the_creators_trips_cached(self):
+        detail_url = reverse('trip-detail', args=[self.dhaka_trip.id])
+        self.get(detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creator.save(update_fields=['last_login'])
+        self.assertEqual(self.get(detail_url)['X-Cache'], 'HIT')
+
+    def test_sparse_detail_is_cached_apart_from_full_detail(self):
+        detail_url = reverse('trip-detail', args=[self.dhaka_trip.id])
+        for first, second in [({'fields': 'title'}, {}), ({}, {'fields': 'title'})]:
+            with self.subTest(first=first):
+                cache.clear()
+                etag = self.get(detail_url, **first)['ETag']
+                response = self.client.get(detail_url, second, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['X-Cache'], 'MISS')
+                self.assertEqual(len(response.data) == 2, bool(second))
+                self.assertEqual(self.get(detail_url, **first)['X-Cache'], 'HIT')
+
+    def test_creator_revenue_is_not_shared(self):
+        detail_url = reverse('trip-detail', args=[self.dhaka_trip.id])
+        self.client.force_authenticate(self.creator)
+        self.assertIsNotNone(self.get(detail_url).data['total_revenue'])
+
+        self.client.force_authenticate(None)
+        response = self.get(detail_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertIsNone(response.data['total_revenue'])
+
+
+class ConditionalGetTests(APITestCase):
+    """Catalogue pages carry ETag/Last-Modified and revalidate with 304"""
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        self.trip, = make_trips(self.creator, 1)
+        self.detail = reverse('trip-detail', args=[self.trip.id])
+
+    def test_revalidation_is_answered_without_queries(self):
+        for url in [self.detail, reverse('trip-list')]:
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertIn('no-cache', response['Cache-Control'])
+                with self.assertNumQueries(0):
+                    revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated['ETag'], response['ETag'])
+                revalidated = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(revalidated.status_code, 304)
+
+    def test_booking_changes_the_etag(self):
+        customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='password123'
+        )
+        etag = self.client.get(self.detail)['ETag']
+        list_etag = self.client.get(reverse('trip-list'))['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip.reserve_seats(2)
+            Booking.objects.create(user=customer, trip=self.trip, number_of_people=2, total_price=500)
+
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['available_spots'], 8)
+        response = self.client.get(reverse('trip-list'), HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_creator_profile_edit_changes_the_etag(self):
+        etag = self.client.get(self.detail)['ETag']
+        self.assertEqual(self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creator.first_name = 'Rahim'
+            self.creator.save()
+
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['creator']['full_name'], 'Rahim')
+
+    def test_finished_avatar_changes_the_etag(self):
+        # Variants are stored with an UPDATE, no post_save - on_done has to invalidate
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media), mock.patch('apps.users.signals.schedule_processing') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.creator.avatar = jpeg_upload('me.jpg')
+                self.creator.save()
+        etag = self.client.get(self.detail)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule.call_args.kwargs['on_done']()
+        self.assertEqual(self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_users_get_their_own_private_etag(self):
+        anonymous_etag = self.client.get(self.detail)['ETag']
+        self.client.force_authenticate(self.creator)
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.data['total_revenue'])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_errors_carry_no_validators(self):
+        response = self.client.get(reverse('trip-detail', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_async_views_revalidate(self):
+        etag = self.client.get(self.detail)['ETag']
+
+        async def fetch(headers):
+            return await self.async_client.get(self.detail, headers=headers)
+
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            self.assertEqual(async_to_sync(fetch)({'If-None-Match': etag}).status_code, 304)
+            response = async_to_sync(fetch)({})
+        self.assertEqual(response['ETag'], etag)
+
+
+
+class CursorPaginationTests(APITestCase):
+    """Keyset pagination walks the catalogue without COUNT or OFFSET"""
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        for i in range(25):
+            make_trips(self.creator, 1, price_per_person=Decimal(100 + i % 5))
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(trip['id'] for trip in response.data['results'])
+            url = response.data['next']
+            # Rows inserted mid-walk must not shift the remaining pages
+            if len(ids) == 10:
+                make_trips(self.creator, 1)
+        return ids
+
+    def test_walk_by_created_at(self):
+        ids = self.walk(reverse('trip-list') + '?cursor=')
+        expected = list(
+            Trip.objects.order_by('-created_at', '-pk').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected[1:])
+
+    def test_walk_by_ordering_field_with_ties(self):
+        ids = self.walk(reverse('trip-list') + '?cursor=&ordering=price_per_person')
+        # The trip inserted mid-walk is the most expensive, so it comes last
+        self.assertEqual(len(set(ids)), 26)
+        self.assertEqual(ids[-1], Trip.objects.latest('created_at').id)
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get(reverse('trip-list') + '?cursor=')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [trip['id'] for trip in back.data['results']],
+            [trip['id'] for trip in first.data['results']]
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('trip-list') + '?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+class TripSearchTests(APITestCase):
+    """?search= uses the full-text index with prefix matching and ranking"""
+
+    def setUp(self):
+        cache.clear()
+        creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        defaults = {
+            'creator': creator,
+            'start_date': date(2030, 3, 1),
+            'end_date': date(2030, 3, 5),
+            'max_participants': 10,
+            'price_per_person': Decimal('250.00'),
+            'status': 'published',
+        }
+        self.beach = Trip.objects.create(
+            title='Beach weekend', description='Sunsets and seafood',
+            destination='Cox\'s Bazar', **defaults
+        )
+        self.hills = Trip.objects.create(
+            title='Hill trek', description='Walk to a quiet beach after the trek',
+            destination='Bandarban', **defaults
+        )
+        Trip.objects.create(
+            title='Tea gardens', description='Tea tasting', destination='Sylhet', **defaults
+        )
+
+    def search(self, text):
+        response = self.client.get(reverse('trip-list'), {'search': text})
+        return [trip['id'] for trip in response.data['results']]
+
+    def test_prefix_match_ranked_by_title(self):
+        self.assertEqual(self.search('bea'), [self.beach.id, self.hills.id])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('beach trek'), [self.hills.id])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.hills.description = 'Mountain views'
+        self.hills.save()
+        self.assertEqual(self.search('beach'), [self.beach.id])
+
+        cache.clear()
+        self.beach.delete()
+        self.assertEqual(self.search('beach'), [])
+
+    def test_rebuild_command_indexes_bulk_created_trips(self):
+        make_trips(self.beach.creator, 1, description='Beachfront camp')
+        self.assertEqual(len(self.search('beachfront')), 0)
+
+        call_command('rebuild_trip_search', stdout=StringIO())
+        cache.clear()
+        self.assertEqual(len(self.search('beachfront')), 1)
+
+    def test_query_syntax_is_ignored(self):
+        self.assertEqual(self.search('"beach*" ('), [self.beach.id, self.hills.id])
+
+
+
+class TripAvailabilitySearchTests(APITestCase):
+    """Date window, price range and free seats filters on the trip list"""
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        self.march, = make_trips(self.creator, 1, price_per_person=Decimal('100.00'))
+        self.april, = make_trips(
+            self.creator, 1, start_date=date(2030, 4, 10), end_date=date(2030, 4, 12),
+            price_per_person=Decimal('400.00'), max_participants=4, confirmed_seats=2, pending_seats=1,
+        )
+        # Starts long before any window below - found through the longest-trip bound
+        self.season, = make_trips(
+            self.creator, 1, start_date=date(2029, 12, 1), end_date=date(2030, 5, 31),
+            price_per_person=Decimal('900.00'),
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('trip-list'), params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return {trip['id'] for trip in response.data['results']}
+
+    def test_date_window_overlap_is_inclusive(self):
+        self.assertEqual(self.search(date_from='2030-03-05', date_to='2030-03-05'), {self.march.id, self.season.id})
+        self.assertEqual(self.search(date_from='2030-04-12'), {self.april.id, self.season.id})
+        self.assertEqual(self.search(date_to='2030-03-01'), {self.march.id, self.season.id})
+        self.assertEqual(self.search(date_from='2030-06-01'), set())
+
+    def test_price_range(self):
+        self.assertEqual(self.search(min_price='100', max_price='400'), {self.march.id, self.april.id})
+        self.assertEqual(self.search(max_price='99.99'), set())
+
+    def test_min_seats_counts_confirmed_and_pending(self):
+        self.assertEqual(self.search(min_seats=2), {self.march.id, self.season.id})
+        self.assertEqual(self.search(min_seats=1), {self.march.id, self.april.id, self.season.id})
+
+    def test_filters_combine(self):
+        params = {'date_from': '2030-04-01', 'date_to': '2030-04-30', 'max_price': '500'}
+        self.assertEqual(self.search(**params), {self.april.id})
+        self.assertEqual(self.search(min_seats=2, **params), set())
+
+    def test_invalid_values(self):
+        cases = [
+            {'date_from': '2030-04-02', 'date_to': '2030-04-01'},
+            {'min_price': '10', 'max_price': '5'},
+            {'min_seats': '0'},
+            {'min_seats': '1.5'},
+            {'date_from': 'soon'},
+        ]
+        for params in cases:
+            with self.subTest(params):
+                self.assertEqual(self.client.get(reverse('trip-list'), params).status_code, 400)
+
+
+
+class SparseFieldsetTests(APITestCase):
+    """?fields= and ?expand= shape trip responses and the queries behind them"""
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', bio='Guide'
+        )
+        self.trip, = make_trips(self.creator, 1)
+        TripImage.objects.create(trip=self.trip, image='trip_images/1.jpg')
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_lists_render_cards(self):
+        card, = self.get(reverse('trip-list'))['results']
+        self.assertEqual(list(card), views.TripSerializer.card_fields)
+
+        card, = self.get(reverse('trip-list'), expand='creator,images')['results']
+        self.assertEqual(set(card['creator']), {'id', 'username', 'full_name', 'avatar_variants'})
+        self.assertEqual(len(card['images']), 1)
+
+    def test_detail_renders_every_field(self):
+        trip = self.get(reverse('trip-detail', args=[self.trip.id]))
+        self.assertEqual(trip['description'], 'Long description')
+        self.assertEqual(trip['creator']['bio'], 'Guide')
+
+    def test_fields_select_nested_fields(self):
+        trip, = self.get(reverse('trip-list'), fields='title,creator.username,images.caption')['results']
+        self.assertEqual(trip['creator'], {'id': self.creator.id, 'username': 'creator'})
+        self.assertEqual(list(trip['images'][0]), ['id', 'caption'])
+        self.assertEqual(list(trip), ['id', 'title', 'creator', 'images'])
+
+    def test_unrequested_columns_are_not_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get(reverse('trip-list'), fields='title')
+        page = queries[-1]['sql']
+        self.assertIn('"trips"."title"', page)
+        self.assertNotIn('description', page)
+        self.assertNotIn('users', page)
+
+    def test_cursor_pages_load_the_ordering_column(self):
+        with self.assertNumQueries(1):
+            data = self.get(reverse('trip-list'), fields='title', cursor='')
+        self.assertEqual(len(data['results']), 1)
+
+    def test_unknown_fields_are_rejected(self):
+        for params in [{'fields': 'nope'}, {'expand': 'creator.nope'}, {'fields': 'title.length'}]:
+            with self.subTest(params):
+                response = self.client.get(reverse('trip-list'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('fields', response.data)
+
+    def test_own_trips_list_shows_revenue(self):
+        self.client.force_authenticate(self.creator)
+        trip, = self.get(reverse('user-trips'))['results']
+        self.assertEqual(trip['total_revenue'], Decimal('0.00'))
+        self.assertNotIn('creator', trip)
+
+def view_queryset(view_class, user=None, params=None, **kwargs):
+    """The filtered queryset a view would paginate for a GET request"""
+    request = Request(APIRequestFactory().get('/', params or {}))
+    if user is not None:
+        request.user = user
+    view = view_class(request=request, kwargs=kwargs, format_kwarg=None)
+    return view.filter_queryset(view.get_queryset())
+
+
+class TripQueryPlanTests(APITestCase):
+    """EXPLAIN every trips endpoint query - none may fall back to a full scan"""
+
+    def setUp(self):
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        self.trip, = make_trips(self.creator, 1)
+
+    def assertNoFullScans(self, queryset):
+        self.assertEqual(full_scans(queryset), [], queryset.explain())
+
+    def test_full_scan_is_detected(self):
+        self.assertEqual(full_scans(Trip.objects.filter(description='x')), ['trips'])
+
+    def test_endpoint_querysets_use_indexes(self):
+        querysets = {
+            'trip-list': view_queryset(views.TripListView)[:10],
+            'trip-list-count': view_queryset(views.TripListView),
+            'trip-list-destination': view_queryset(
+                views.TripListView, params={'destination': 'Sylhet'}
+            )[:10],
+            'trip-list-ordering': view_queryset(
+                views.TripListView, params={'ordering': 'created_at'}
+            )[:10],
+            'trip-list-availability': view_queryset(views.TripListView, params={
+                'date_from': '2030-03-01', 'date_to': '2030-03-31', 'max_price': '300', 'min_seats': 2,
+            })[:10],
+            'trip-list-price': view_queryset(views.TripListView, params={'min_price': '100'})[:10],
+            'trip-list-seats': view_queryset(views.TripListView, params={'min_seats': 2})[:10],
+            'trip-detail': view_queryset(views.TripDetailView).filter(pk=self.trip.pk),
+            'user-trips': view_queryset(views.UserTripsView, user=self.creator)[:10],
+            'trip-images': TripImage.objects.filter(trip__in=[self.trip.pk]),
+        }
+        for name, queryset in querysets.items():
+            with self.subTest(name):
+                self.assertNoFullScans(queryset)
+
+
+class PerformanceInstrumentationTests(APITestCase):
+    """Requests are timed and published per endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        endpoint_stats.reset()
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='password123', is_staff=True
+        )
+        make_trips(self.staff, 3)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('trip-list'))
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="2 queries"', timing)
+        self.assertIn('serializer;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        self.client.get(reverse('trip-list'))
+        self.client.get(reverse('trip-list'))
+        self.assertEqual(self.client.get(reverse('performance-metrics')).status_code, 403)
+
+        self.client.force_authenticate(self.staff)
+        metrics = self.client.get(reverse('performance-metrics')).data
+        stats = metrics['GET api/trips/']
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(sum(stats['histogram'].values()), 2)
+        self.assertGreater(stats['avg_bytes'], 0)
+
+
+def jpeg_upload(name='photo.jpg', size=(2400, 1200)):
+    """A JPEG with EXIF data, rotated 90 degrees by its orientation tag"""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW
+    exif[0x010F] = 'Camera maker'
+    buffer = BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImagePipelineTests(APITestCase):
+    """Uploads get resized WebP variants after commit"""
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media, IMAGE_PROCESSING_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        self.trip = make_trips(self.creator, 1)[0]
+        self.client.force_authenticate(self.creator)
+
+    def upload(self):
+        url = reverse('upload-trip-image', args=[self.trip.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'image': jpeg_upload(), 'caption': 'Beach'})
+        self.assertEqual(response.status_code, 201)
+        # The response is sent before processing
+        self.assertEqual(response.data['variants'], {'status': 'pending'})
+        return TripImage.objects.get(pk=response.data['id'])
+
+    def test_upload_is_resized_after_commit(self):
+        image = self.upload()
+        variants = image.variants
+        self.assertEqual(variants['status'], 'ready')
+        # Orientation applied: 2400x1200 stored sideways is 1200x2400
+        self.assertEqual((variants['width'], variants['height']), (1200, 2400))
+        self.assertEqual(set(variants['sizes']), {'small', 'medium', 'large'})
+        self.assertEqual(
+            (variants['sizes']['small']['width'], variants['sizes']['small']['height']), (160, 320)
+        )
+
+        storage = image.image.storage
+        with storage.open(variants['sizes']['medium']['name']) as handle:
+            with Image.open(handle) as variant:
+                self.assertEqual(variant.format, 'WEBP')
+                self.assertEqual(variant.size, (400, 800))
+                self.assertFalse(variant.getexif())
+        self.assertLess(
+            storage.size(variants['sizes']['small']['name']), storage.size(image.image.name)
+        )
+
+    def test_serializer_returns_variant_urls(self):
+        self.upload()
+        response = self.client.get(reverse('trip-detail', args=[self.trip.pk]))
+        variants = response.data['images'][0]['variants']
+        self.assertEqual(variants['status'], 'ready')
+        self.assertTrue(variants['sizes']['small']['url'].startswith('http://testserver/media/'))
+        self.assertTrue(variants['sizes']['small']['url'].endswith('_small.webp'))
+
+    def test_variants_deleted_with_image(self):
+        image = self.upload()
+        names = [variant['name'] for variant in image.variants['sizes'].values()]
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        for name in names:
+            self.assertFalse(image.image.storage.exists(name))
+
+    def test_process_images_command_backfills(self):
+        image = self.upload()
+        TripImage.objects.filter(pk=image.pk).update(variants={})
+        out = StringIO()
+        call_command('process_images', stdout=out)
+        self.assertIn('1 processed', out.getvalue())
+        image.refresh_from_db()
+        self.assertEqual(image.variants['status'], 'ready')
+
+
+class GalleryUploadTests(APITestCase):
+    """Many images per request, one INSERT, limits checked while reading"""
+
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media, IMAGE_PROCESSING_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        self.trip = make_trips(self.creator, 1)[0]
+        self.url = reverse('upload-trip-gallery', args=[self.trip.pk])
+        self.client.force_authenticate(self.creator)
+
+    def post(self, images, **data):
+        return self.client.post(self.url, dict(data, images=images), format='multipart')
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.media) for name in names]
+
+    def test_gallery_is_inserted_with_one_query(self):
+        files = [jpeg_upload(f'photo{i}.jpg', (400, 300)) for i in range(5)]
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(files, captions=['Beach', 'Hill'])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([image['caption'] for image in response.data], ['Beach', 'Hill', '', '', ''])
+        inserts = [q for q in queries if q['sql'].startswith(f'INSERT INTO "{TripImage._meta.db_table}"')]
+        self.assertEqual(len(inserts), 1)
+
+        images = TripImage.objects.filter(trip=self.trip)
+        self.assertEqual(images.count(), 5)
+        # Processed after commit like single uploads
+        self.assertTrue(all(image.variants['status'] == 'ready' for image in images))
+
+    def test_files_are_spooled_to_disk(self):
+        with mock.patch.object(TripImage.objects, 'bulk_add', wraps=TripImage.objects.bulk_add) as bulk_add:
+            self.post([jpeg_upload('small.jpg', (10, 10))])
+        upload, _ = bulk_add.call_args.args[1][0]
+        self.assertTrue(hasattr(upload, 'temporary_file_path'))
+
+    @override_settings(TRIP_GALLERY_MAX_FILES=2)
+    def test_too_many_files(self):
+        response = self.post([jpeg_upload(f'photo{i}.jpg', (10, 10)) for i in range(3)])
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(TripImage.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    @override_settings(TRIP_GALLERY_MAX_BYTES=4096)
+    def test_total_size_limit(self):
+        response = self.post([jpeg_upload('big.jpg', (800, 800))])
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(TripImage.objects.exists())
+
+    def test_invalid_file_rejects_whole_gallery(self):
+        text = SimpleUploadedFile('notes.jpg', b'not an image', content_type='image/jpeg')
+        response = self.post([jpeg_upload('ok.jpg', (10, 10)), text])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TripImage.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    def test_only_the_creator_can_upload(self):
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='password123'
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.post([jpeg_upload()]).status_code, 404)
+
+
+# The catalogue paths routed to the async views, as urls.py does under ASGI
+class AsyncURLConf:
+    urlpatterns = [
+        path('api/trips/', async_views.AsyncTripListView.as_view(), name='trip-list'),
+        path('api/trips/<int:pk>/', async_views.AsyncTripDetailView.as_view(), name='trip-detail'),
+    ]
+
+
+class AsyncCatalogueTests(APITestCase):
+    """The async read path returns exactly what the sync views return"""
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        trips = make_trips(self.creator, 12, description='Beach trip')
+        make_trips(self.creator, 3, destination='Sylhet')
+        TripImage.objects.bulk_create(
+            TripImage(trip=trip, image=f'trip_images/{trip.pk}.jpg') for trip in trips[:3]
+        )
+        call_command('rebuild_trip_search', stdout=StringIO())
+
+    def get_async(self, url, **params):
+        async def fetch():
+            return await self.async_client.get(url, params)
+
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            return async_to_sync(fetch)()
+
+    def get_both(self, url, **params):
+        # Cache off, so both responses are rendered rather than served from cache
+        with override_settings(TRIP_CACHE_ALIAS='dummy', CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'dummy': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        }):
+            return self.client.get(url, params), self.get_async(url, **params)
+
+    def test_list_matches_sync_view(self):
+        cases = [
+            {}, {'page': 2}, {'page': 'last'}, {'destination': 'Sylhet'},
+            {'ordering': 'price_per_person'}, {'search': 'beach'}, {'cursor': ''},
+            {'page': 9}, {'cursor': 'broken'},
+            {'date_from': '2030-03-02', 'min_seats': 3}, {'date_from': '2030-04-01', 'date_to': '2030-03-01'},
+            {'fields': 'title,creator.username'}, {'expand': 'creator,images'}, {'fields': 'nope'},
+        ]
+        for params in cases:
+            with self.subTest(params):
+                sync_response, async_response = self.get_both('/api/trips/', **params)
+                self.assertEqual(async_response.status_code, sync_response.status_code)
+                self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_detail_matches_sync_view(self):
+        trip = Trip.objects.filter(images__isnull=False).first()
+        for url in [f'/api/trips/{trip.pk}/', '/api/trips/999999/', f'/api/trips/{trip.pk}/?fields=images.variants']:
+            with self.subTest(url):
+                sync_response, async_response = self.get_both(url)
+                self.assertEqual(async_response.status_code, sync_response.status_code)
+                self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_cache_is_shared_with_sync_path(self):
+        self.assertEqual(self.client.get('/api/trips/')['X-Cache'], 'MISS')
+        response = self.get_async('/api/trips/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json(), self.client.get('/api/trips/').json())
+
+    def test_sparse_detail_is_cached_apart_from_full_detail(self):
+        url = f'/api/trips/{Trip.objects.first().pk}/'
+        for first, second in [({'fields': 'title'}, {}), ({}, {'fields': 'title'})]:
+            with self.subTest(first=first):
+                cache.clear()
+                self.get_async(url, **first)
+                response = self.get_async(url, **second)
+                self.assertEqual(response['X-Cache'], 'MISS')
+                self.assertEqual(len(response.json()) == 2, bool(second))
+
+    def test_creator_sees_revenue(self):
+        self.async_client.force_login(self.creator)
+        for fields in ['creator,total_revenue', 'id,total_revenue']:
+            for _ in range(2):  # miss, then hit (personalized from the shared page)
+                results = self.get_async('/api/trips/', fields=fields).json()['results']
+                self.assertTrue(all(trip['total_revenue'] is not None for trip in results))
+        self.async_client.logout()
+        results = self.get_async('/api/trips/', fields='id,total_revenue').json()['results']
+        self.assertTrue(all(trip['total_revenue'] is None for trip in results))
+
+    def test_queries_are_counted(self):
+        response = self.get_async('/api/trips/', expand='images')
+        # COUNT, page, images
+        self.assertIn('desc="3 queries"', response['Server-Timing'])
+
+
+class ResponseEncodingTests(APITestCase):
+    """orjson renders what the stdlib did; bodies are compressed when the client accepts it"""
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        make_trips(self.creator, 10)
+
+    def test_engines_render_the_same_bytes(self):
+        data = {
+            'price': Decimal('250.50'), 'day': date(2030, 3, 1),
+            'at': datetime(2030, 3, 1, 9, 30, 15, 250000, tzinfo=dt_timezone.utc),
+            'title': 'Cox\'s Bazar \u2028 \u09ac\u09be\u0982\u09b2\u09be', 3: [None, True, 1.5],
+        }
+        rendered = JSONRenderer().render(data)
+        with override_settings(API_JSON_ENGINE='json'):
+            self.assertEqual(rendered, JSONRenderer().render(data))
+            stdlib_page = self.client.get('/api/trips/', {'expand': 'creator'}).content
+        cache.clear()
+        self.assertEqual(self.client.get('/api/trips/', {'expand': 'creator'}).content, stdlib_page)
+
+    def test_parser(self):
+        self.client.force_authenticate(self.creator)
+        response = self.client.post(
+            '/api/trips/import/', '{"trips": [{"title": "Broken"', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+        self.assertEqual(
+            JSONParser().parse(BytesIO('{"price": 1.5, "title": "\u09ac"}'.encode('utf-16')), None, {'encoding': 'utf-16'}),
+            {'price': 1.5, 'title': '\u09ac'},
+        )
+
+    def test_compression_is_negotiated(self):
+        plain = self.client.get('/api/trips/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        cases = [
+            ('gzip, deflate', 'gzip'), ('br;q=0, gzip;q=0.5', 'gzip'), ('*', 'br' if brotli else 'gzip'),
+            ('gzip;q=0', None), ('identity', None),
+        ]
+        for accept_encoding, encoding in cases:
+            with self.subTest(accept_encoding):
+                response = self.client.get('/api/trips/', HTTP_ACCEPT_ENCODING=accept_encoding)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+                self.assertIn('Accept-Encoding', response['Vary'])
+                if encoding == 'gzip':
+                    self.assertEqual(gzip.decompress(response.content), plain.content)
+                    self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+    def test_small_and_html_bodies_are_left_alone(self):
+        with override_settings(COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.client.get('/api/trips/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('Accept-Encoding', response.get('Vary', ''))
+        # HTML pages carry CSRF tokens
+        response = self.client.get('/admin/login/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertGreater(len(response.content), 1024)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_export_is_compressed(self):
+        self.client.force_authenticate(self.creator)
+        plain = b''.join(self.client.get(reverse('trip-export'), {'format': 'ndjson'}).streaming_content)
+        with override_settings(EXPORT_CHUNK_SIZE=3):
+            response = self.client.get(reverse('trip-export'), {'format': 'ndjson'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+        self.assertEqual(len(plain.splitlines()), 10)
+
+    def test_async_catalogue(self):
+        async def fetch():
+            return await self.async_client.get('/api/trips/', headers={'Accept-Encoding': 'gzip'})
+
+        plain = self.client.get('/api/trips/')
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            response = async_to_sync(fetch)()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+
+class CompiledSerializerTests(APITestCase):
+    """Compiled trip/booking/user serializers render exactly what DRF renders"""
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123',
+            first_name='Nadia', bio='Guide', avatar='avatars/creator.jpg', avatar_variants=self.variants('avatars/c'),
+        )
+        self.booker = User.objects.create_user(
+            username='booker', email='booker@example.com', password='password123'
+        )
+        trips = make_trips(self.creator, 6, price_per_person=Decimal('1250.50'))
+        make_trips(self.booker, 2, status='draft')
+        TripImage.objects.bulk_create([
+            TripImage(trip=trips[0], image='trip_images/a.jpg', caption='Beach', variants=self.variants('trip_images/a')),
+            TripImage(trip=trips[0], image='trip_images/b.jpg'),
+            TripImage(trip=trips[1], image='trip_images/c.jpg', variants={'status': 'failed'}),
+        ])
+        for trip in trips[:3]:
+            Booking.objects.create(
+                user=self.booker, trip=trip, number_of_people=2, total_price=Decimal('2501.00'),
+                special_requests='Window seat',
+            )
+        self.trip = trips[0]
+
+    @staticmethod
+    def variants(prefix):
+        return {'status': 'ready', 'width': 800, 'height': 600, 'sizes': {
+            'small': {'name': f'{prefix}_small.webp', 'width': 320, 'height': 240},
+        }}
+
+    def get_both(self, user, url, params):
+        """(DRF, compiled) response bodies - the catalogue cache is off"""
+        self.client.force_authenticate(user)
+        bodies = []
+        for compiled in [False, True]:
+            with override_settings(API_COMPILED_SERIALIZERS=compiled, TRIP_CACHE_ALIAS='dummy', CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'dummy': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+            }):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200, response.content)
+                bodies.append(response.content)
+        return bodies
+
+    def test_endpoints_match_drf(self):
+        full_trip = 'creator,images,description,max_participants,total_revenue,created_at,updated_at'
+        cases = [
+            (None, '/api/trips/', {}),
+            (None, '/api/trips/', {'expand': full_trip}),
+            (self.creator, '/api/trips/', {'fields': 'id,total_revenue,creator.bio,creator.avatar,images.image'}),
+            (None, f'/api/trips/{self.trip.pk}/', {}),
+            (self.creator, reverse('user-trips'), {}),
+            (self.booker, reverse('user-bookings'), {}),
+            (self.booker, reverse('user-bookings'), {'expand': ','.join(
+                ['user', 'special_requests', 'updated_at', *(f'trip.{name}' for name in full_trip.split(','))]
+            )}),
+            (self.creator, reverse('trip-bookings', args=[self.trip.pk]), {'expand': 'user'}),
+            (self.creator, reverse('user-profile'), {}),
+        ]
+        for user, url, params in cases:
+            with self.subTest(url=url, **params):
+                drf, compiled = self.get_both(user, url, params)
+                self.assertEqual(compiled, drf)
+
+    def test_unusual_values_match_drf(self):
+        trip = Trip(
+            id=1, creator=self.creator, title='', destination='Sylhet', start_date=date(2030, 1, 1),
+            end_date=date(2030, 1, 2), max_participants=3, price_per_person=Decimal('99.5'), status='',
+            created_at=datetime(2030, 1, 1, 12, 0), updated_at=datetime(2030, 1, 1, 12, 0, tzinfo=dt_timezone.utc),
+        )
+        context = {'request': None}
+        with override_settings(API_COMPILED_SERIALIZERS=False):
+            drf = TripSerializer(trip, context=context).data
+        self.assertEqual(TripSerializer(trip, context=context).data, drf)
+        self.assertEqual((drf['price_per_person'], drf['status']), ('99.50', ''))
+        # Not a model instance - DRF's own path
+        context = {'field_spec': FieldSpec(fields={'title': {}})}
+        self.assertEqual(TripSerializer({'id': 1, 'title': 'Dict'}, context=context).data, {'id': 1, 'title': 'Dict'})
+
+
+class TripExportTests(APITestCase):
+    """Trips export endpoint and export_data command"""
+
+    def setUp(self):
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        make_trips(self.creator, 3)
+        make_trips(self.creator, 2, status='draft')
+        make_trips(User.objects.create_user(username='other', email='other@example.com', password='password123'), 4)
+
+    def test_endpoint_exports_own_trips(self):
+        self.client.force_authenticate(self.creator)
+        response = self.client.get(reverse('trip-export'), {'status': 'draft'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), list(Trip.EXPORT_COLUMNS))
+        self.assertEqual(len(lines), 3)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_data', 'trips', '--format', 'ndjson', '--creator', 'creator', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+
+        with tempfile.NamedTemporaryFile(suffix='.csv') as output:
+            call_command('export_data', 'bookings', '--output', output.name, stderr=StringIO())
+            self.assertEqual(output.read().decode().strip(), ','.join(Booking.EXPORT_COLUMNS))
+
+
+def import_row(**kwargs):
+    row = {
+        'title': 'Imported trip', 'description': 'From a catalogue', 'destination': 'Bandarban',
+        'start_date': '2030-05-01', 'end_date': '2030-05-04', 'max_participants': 12,
+        'price_per_person': '300.00', 'status': 'published',
+    }
+    row.update(kwargs)
+    return row
+
+
+class TripImportTests(APITestCase):
+    """Bulk import validates like the API, resolves creators in bulk and reports rejects"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='operator', email='operator@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def post(self, rows, **data):
+        return self.client.post(reverse('trip-import'), {'trips': rows, **data}, format='json')
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        response = self.post([
+            import_row(title='Hill trek'),
+            import_row(start_date='2030-05-04', end_date='2030-05-01'),
+            import_row(max_participants='many'),
+            import_row(title='Tea trail', status=''),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['imported'], response.data['rejected']), (1, 3))
+        self.assertEqual(
+            [error['row'] for error in response.data['errors']], [2, 3, 4]
+        )
+        # Same date rule as TripSerializer
+        self.assertEqual(
+            response.data['errors'][0]['errors']['non_field_errors'], ['Start date must be before end date']
+        )
+        trip = Trip.objects.get()
+        self.assertEqual((trip.title, trip.creator, trip.status), ('Hill trek', self.user, 'published'))
+
+    def test_imported_trips_are_listed_and_searchable(self):
+        self.assertEqual(self.client.get(reverse('trip-list')).data['count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post([import_row(title='Waterfall hike')])
+        self.assertEqual(self.client.get(reverse('trip-list')).data['count'], 1)
+        response = self.client.get(reverse('trip-list'), {'search': 'waterfall'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_dry_run_and_limits(self):
+        response = self.post([import_row()], dry_run=True)
+        self.assertEqual((response.data['dry_run'], response.data['imported']), (True, 1))
+        self.assertFalse(Trip.objects.exists())
+
+        with override_settings(TRIP_IMPORT_MAX_ROWS=2):
+            response = self.post([import_row()] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Trip.objects.exists())
+
+    def test_csv_upload(self):
+        rows = [import_row(title=f'Trip {i}') for i in range(3)]
+        lines = [','.join(rows[0])] + [','.join(str(value) for value in row.values()) for row in rows]
+        upload = SimpleUploadedFile('catalogue.csv', ('\ufeff' + '\n'.join(lines)).encode('utf-8'))
+        response = self.client.post(reverse('trip-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.data['imported'], 3)
+
+        upload = SimpleUploadedFile('catalogue.json', b'[{"title": ')
+        response = self.client.post(reverse('trip-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_resolves_creators_in_bulk(self):
+        User.objects.create_user(username='second', email='second@example.com', password='password123')
+        rows = [import_row(creator='operator'), import_row(creator='second'), import_row(creator='ghost')]
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as source:
+            source.write('\n'.join(json.dumps(row) for row in rows * 2))
+            source.flush()
+            with CaptureQueriesContext(connection) as queries:
+                call_command('import_trips', source.name, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Trip.objects.filter(creator__username='second').count(), 2)
+        self.assertEqual(Trip.objects.count(), 4)
+        # One user lookup, then the inserts - nothing per row
+        self.assertEqual(sum('FROM "users"' in query['sql'] for query in queries.captured_queries), 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(APITestCase):
+    """Catalogue reads go to the replica - a user who just booked reads the primary"""
+
+    @classmethod
+    def setUpClass(cls):
+        # 'replica' is a separate empty database, like a replica that hasn't
+        # caught up. Only these tests need it, so the alias is added here rather
+        # than in settings - and listed in `databases` only once it exists, as
+        # the runner checks the aliases test classes declare before any runs
+        connections.settings['replica'] = connections.configure_settings({
+            'default': connections.settings['default'],
+            'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        })['replica']
+        connections['replica'].creation.create_test_db(verbosity=0, serialize=False)
+        cls.databases = {'default', 'replica'}
+        cls.addClassCleanup(cls.remove_replica)
+        super().setUpClass()
+
+    @classmethod
+    def remove_replica(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123'
+        )
+        self.booker = User.objects.create_user(
+            username='booker', email='booker@example.com', password='password123'
+        )
+        self.trip = make_trips(self.creator, 1)[0]
+        self.detail = reverse('trip-detail', args=[self.trip.pk])
+
+    def book(self):
+        self.client.force_login(self.booker)
+        response = self.client.post(
+            reverse('booking-create'), {'trip_id': self.trip.pk, 'participants': 1}
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_catalogue_reads_from_replica(self):
+        self.assertEqual(self.client.get(reverse('trip-list')).data['count'], 0)
+        self.assertEqual(self.client.get(self.detail).status_code, 404)
+
+        # Everything else reads the primary
+        self.client.force_login(self.creator)
+        self.assertEqual(self.client.get(reverse('user-trips')).data['count'], 1)
+
+    def test_booking_pins_user_to_primary(self):
+        self.book()
+        self.assertEqual(self.client.get(self.detail).status_code, 200)
+        self.assertEqual(self.client.get(reverse('trip-list')).data['count'], 1)
+
+        # Other readers stay on the replica (for pages not cached from the primary yet)
+        self.client.logout()
+        response = self.client.get(reverse('trip-list'), {'ordering': 'start_date'})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_async_views_use_the_same_routing(self):
+        async def fetch():
+            return await self.async_client.get(self.detail)
+
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            self.assertEqual(async_to_sync(fetch)().status_code, 404)
+        self.book()
+        self.async_client.force_login(self.booker)
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            self.assertEqual(async_to_sync(fetch)().status_code, 200)
+
+    def test_replica_pages_carry_no_validators(self):
+        # A lagging replica's page must not be tagged with the newer version
+        self.assertFalse(self.client.get(reverse('trip-list')).has_header('ETag'))
+        self.book()
+        # Still cached from the replica - then a page the pinned user renders on the primary
+        self.assertFalse(self.client.get(reverse('trip-list')).has_header('ETag'))
+        response = self.client.get(reverse('trip-list'), {'ordering': 'start_date'})
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_replica_pages_are_cached_briefly(self):
+        with mock.patch.object(catalogue_cache.cache, 'set', wraps=catalogue_cache.cache.set) as cache_set:
+            self.client.get(reverse('trip-list'))
+        self.assertEqual(cache_set.call_args.args[2], 10)
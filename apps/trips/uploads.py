@@ -0,0 +1,56 @@
+"""
+Upload handling for gallery uploads
+Why: A gallery is 20-50 photos in one request - buffering them in memory
+or reading a body that is already over the limit wastes the server
+What: Files are spooled to temporary files chunk by chunk, and the
+request is cut off as soon as it is known to be too large
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload, TemporaryFileUploadHandler
+
+
+class UploadLimitHandler(FileUploadHandler):
+    """
+    Count files and bytes while the body is parsed
+    Sits in front of the handler that stores the data; `error` is set
+    when the upload was stopped
+    """
+
+    def __init__(self, request=None, max_files=None, max_bytes=None):
+        super().__init__(request)
+        self.max_files = max_files or settings.TRIP_GALLERY_MAX_FILES
+        self.max_bytes = max_bytes or settings.TRIP_GALLERY_MAX_BYTES
+        self.files = 0
+        self.received = 0
+        self.declared = None
+        self.error = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.declared = content_length
+
+    def new_file(self, *args, **kwargs):
+        # Content-Length covers the whole body - no need to read it to know
+        if self.declared and self.declared > self.max_bytes:
+            self.stop(f'Upload is larger than {self.max_bytes} bytes')
+        self.files += 1
+        if self.files > self.max_files:
+            self.stop(f'At most {self.max_files} files per upload')
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            self.stop(f'Upload is larger than {self.max_bytes} bytes')
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+    def stop(self, error):
+        self.error = error
+        # Don't read the rest of the body
+        raise StopUpload(connection_reset=True)
+
+
+def gallery_upload_handlers(request):
+    """Limit checks first, then spool every file to disk (never to memory)"""
+    return [UploadLimitHandler(request), TemporaryFileUploadHandler(request)]
@@ -1,16 +1,31 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Catalogue reads - async views under ASGI, so readers don't each hold a thread
+if settings.ASYNC_CATALOGUE:
+    trip_list = async_views.AsyncTripListView.as_view()
+    trip_detail = async_views.AsyncTripDetailView.as_view()
+else:
+    trip_list = views.TripListView.as_view()
+    trip_detail = views.TripDetailView.as_view()
 
 urlpatterns = [
     # Trip CRUD operations
-    path('', views.TripListView.as_view(), name='trip-list'),
+    path('', trip_list, name='trip-list'),
     path('create/', views.TripCreateView.as_view(), name='trip-create'),
-    path('<int:pk>/', views.TripDetailView.as_view(), name='trip-detail'),
+    path('import/', views.TripImportView.as_view(), name='trip-import'),
+    path('<int:pk>/', trip_detail, name='trip-detail'),
     path('<int:pk>/update/', views.TripUpdateView.as_view(), name='trip-update'),
     
     # User's trips
     path('my-trips/', views.UserTripsView.as_view(), name='user-trips'),
+    path('export/', views.export_trips, name='trip-export'),
     
     # Trip images
     path('<int:trip_id>/upload-image/', views.upload_trip_image, name='upload-trip-image'),
+    path('<int:trip_id>/upload-images/', views.TripGalleryUploadView.as_view(), name='upload-trip-gallery'),
+    
+    # Catalogue cache counters (staff only)
+    path('cache-stats/', views.catalogue_cache_stats, name='trip-cache-stats'),
 ]
\ No newline at end of file
@@ -1,23 +1,43 @@
+from itertools import islice
+from django.conf import settings
 from rest_framework import generics, permissions, filters, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from sharetrip.exports import EXPORT_RENDERERS, export_response
+from sharetrip.instrumentation import InstrumentedSerializerMixin
+from sharetrip.renderers import JSONParser
+from sharetrip.routers import ReplicaReadMixin
+from sharetrip.sparse import SparseFieldsViewMixin
+from .cache import CachedListMixin, CachedRetrieveMixin, catalogue_cache
+from .filters import TripFilterSet
+from .imports import ImportFormatError, guess_format, import_trips, read_rows, text_stream
 from .models import Trip, TripImage
-from .serializers import TripSerializer, TripCreateSerializer, TripImageSerializer
+from .search import TripSearchFilter
+from .serializers import (
+    TripSerializer, TripCreateSerializer, TripImageSerializer, TripGallerySerializer,
+    TripExportSerializer, TripImportRequestSerializer,
+)
+from .uploads import gallery_upload_handlers
 
-class TripListView(generics.ListAPIView):
+class TripListView(ReplicaReadMixin, CachedListMixin, SparseFieldsViewMixin,
+                   InstrumentedSerializerMixin, generics.ListAPIView):
     """
     List all published trips
     Why: Show available trips to all users
-    What: GET endpoint with filtering and search
+    What: GET endpoint with filtering and search, served from the catalogue cache
+    (misses read from a replica when DATABASE_REPLICAS are set). Trip cards by
+    default - ?expand=creator,images or ?fields= for more
     """
     serializer_class = TripSerializer
     permission_classes = [permissions.AllowAny]  # Anyone can view trips
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # Search runs last so its relevance ordering isn't replaced by the default ordering
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, TripSearchFilter]
     
-    # Filter fields
-    filterset_fields = ['destination', 'status']
-    search_fields = ['title', 'description', 'destination']
+    # ?destination=, dates, price and free seats (filters.py) - ?search= matches
+    # title, description and destination
+    filterset_class = TripFilterSet
     ordering_fields = ['start_date', 'price_per_person', 'created_at']
     ordering = ['-created_at']  # Default ordering
     
@@ -26,19 +46,20 @@ class TripListView(generics.ListAPIView):
         Filter trips based on parameters
         Why: Only show published trips to regular users
         """
-        return Trip.objects.filter(status='published')
+        return Trip.objects.published().with_listing_stats()
 
-class TripDetailView(generics.RetrieveAPIView):
+class TripDetailView(ReplicaReadMixin, CachedRetrieveMixin, SparseFieldsViewMixin,
+                     InstrumentedSerializerMixin, generics.RetrieveAPIView):
     """
     Get trip details
     Why: Show complete trip information
-    What: GET endpoint for single trip
+    What: GET endpoint for single trip, served from the catalogue cache
     """
     serializer_class = TripSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        return Trip.objects.filter(status='published')
+        return Trip.objects.published().with_listing_stats()
 
 class TripCreateView(generics.CreateAPIView):
     """
@@ -49,18 +70,19 @@ class TripCreateView(generics.CreateAPIView):
     serializer_class = TripCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class UserTripsView(generics.ListAPIView):
+class UserTripsView(SparseFieldsViewMixin, InstrumentedSerializerMixin, generics.ListAPIView):
     """
     List user's own trips
     Why: Show trips created by the current user
-    What: GET endpoint for user's trips (all statuses)
+    What: GET endpoint for user's trips (all statuses), as cards with their revenue
     """
     serializer_class = TripSerializer
     permission_classes = [permissions.IsAuthenticated]
+    card_expand = ['total_revenue']
     
     def get_queryset(self):
         """Return trips created by current user"""
-        return Trip.objects.filter(creator=self.request.user)
+        return Trip.objects.filter(creator=self.request.user).with_listing_stats()
 
 class TripUpdateView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -73,7 +95,7 @@ class TripUpdateView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         """Only allow users to update their own trips"""
-        return Trip.objects.filter(creator=self.request.user)
+        return Trip.objects.filter(creator=self.request.user).with_listing_stats()
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -95,4 +117,111 @@ def upload_trip_image(request, trip_id):
     if serializer.is_valid():
         serializer.save(trip=trip)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class TripGalleryUploadView(generics.GenericAPIView):
+    """
+    Upload a gallery of images for a trip in one request
+    Why: One request per photo made 50-photo galleries slow
+    What: POST multipart with repeated `images` (and optional `captions`);
+    files stream to disk, rows are inserted with one bulk_create
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    
+    def initialize_request(self, request, *args, **kwargs):
+        # Handlers must be in place before anything reads the body -
+        # the CSRF check of session auth already does
+        request.upload_handlers = gallery_upload_handlers(request)
+        self.upload_limits = request.upload_handlers[0]
+        return super().initialize_request(request, *args, **kwargs)
+    
+    def post(self, request, trip_id):
+        try:
+            trip = Trip.objects.get(id=trip_id, creator=request.user)
+        except Trip.DoesNotExist:
+            return Response(
+                {'error': 'Trip not found or not owned by you'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        serializer = TripGallerySerializer(data=request.data)
+        if self.upload_limits.error:
+            return Response(
+                {'error': self.upload_limits.error},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        serializer.is_valid(raise_exception=True)
+        
+        images = TripImage.objects.bulk_add(trip, serializer.validated_data['uploads'])
+        return Response(
+            TripImageSerializer(images, many=True, context={'request': request}).data,
+            status=status.HTTP_201_CREATED
+        )
+
+class TripImportView(generics.GenericAPIView):
+    """
+    Import many trips at once
+    Why: Onboarding an operator's catalogue one POST per trip is far too slow
+    What: POST a CSV/JSON/NDJSON `file` (multipart) or a `trips` list (JSON),
+    optional `dry_run`. Rows are created as the current user; the response
+    counts imported and rejected rows and lists each rejected row's errors
+    """
+    serializer_class = TripImportRequestSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser, JSONParser]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        max_rows = getattr(settings, 'TRIP_IMPORT_MAX_ROWS', 5000)
+
+        if 'file' in params:
+            upload = params['file']
+            fmt = params.get('format') or guess_format(upload.name)
+            rows = read_rows(text_stream(upload), fmt)
+        else:
+            rows = params['trips']
+        try:
+            rows = list(islice(rows, max_rows + 1))
+        except ImportFormatError as error:
+            return Response({'file': [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > max_rows:
+            return Response(
+                {'error': f'At most {max_rows} trips per request - use the import_trips command for more'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        report = import_trips(rows, creator=request.user, dry_run=params['dry_run'])
+        return Response(report.as_dict())
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def catalogue_cache_stats(request):
+    """
+    Catalogue cache hit/miss counters
+    Why: Check the cache is actually absorbing catalogue traffic
+    What: GET endpoint for staff, counters are per process
+    """
+    return Response(catalogue_cache.stats())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@renderer_classes(EXPORT_RENDERERS)
+def export_trips(request):
+    """
+    Export trips as CSV or NDJSON
+    Why: Creators and finance want every trip with its seat and revenue counters
+    What: Streams the user's trips (all trips for staff), ?format=csv|ndjson, optional ?status=
+    """
+    params = TripExportSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+
+    trips = Trip.objects.all()
+    if not request.user.is_staff:
+        trips = trips.filter(creator=request.user)
+    if 'status' in params.validated_data:
+        trips = trips.filter(status=params.validated_data['status'])
+    return export_response(request, trips, Trip.EXPORT_COLUMNS, 'trips')
@@ -0,0 +1,118 @@
+"""
+Token authentication for API clients
+Why: With sessions only, every API request reads the session table, loads
+the whole users row (bio included) and runs CSRF checks
+What: Signed, stateless bearer tokens - `Authorization: Bearer <token>` -
+carrying the user id and a hash of the password, so changing the password
+revokes every token. The user behind a token is cached in-process for a few
+seconds, loaded with only the columns permission checks need.
+
+Settings:
+    USER_TOKEN_MAX_AGE    seconds a token stays valid
+    USER_AUTH_CACHE_TTL   seconds a resolved user is reused; 0 turns the cache off
+    USER_AUTH_CACHE_SIZE  users kept per process (least recently used dropped first)
+
+The cache is per process: a save/delete of the user clears it here, other
+processes see the change within USER_AUTH_CACHE_TTL.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils.crypto import constant_time_compare
+from rest_framework import authentication, exceptions
+
+SALT = 'sharetrip.users.token'
+KEYWORD = 'Bearer'
+
+# Everything AbstractUser permission checks and the views read from request.user
+USER_FIELDS = ['id', 'username', 'password', 'is_active', 'is_staff', 'is_superuser']
+
+
+def _auth_hash(user):
+    # Only a prefix travels in the token - enough to notice a password change
+    return user.get_session_auth_hash()[:16]
+
+
+def make_token(user):
+    return signing.dumps({'u': user.pk, 'h': _auth_hash(user)}, salt=SALT, compress=False)
+
+
+class UserCache:
+    """Thread-safe LRU of user id -> (expiry, user, auth hash)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    def get(self, user_id):
+        ttl = getattr(settings, 'USER_AUTH_CACHE_TTL', 30)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry and entry[0] > now:
+                self._users.move_to_end(user_id)
+                return entry[1], entry[2]
+
+        user = get_user_model().objects.only(*USER_FIELDS).filter(pk=user_id).first()
+        if user is None:
+            return None, None
+        auth_hash = _auth_hash(user)
+        if ttl:
+            with self._lock:
+                self._users[user_id] = (now + ttl, user, auth_hash)
+                self._users.move_to_end(user_id)
+                while len(self._users) > getattr(settings, 'USER_AUTH_CACHE_SIZE', 10000):
+                    self._users.popitem(last=False)
+        return user, auth_hash
+
+    def forget(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+class BearerTokenAuthentication(authentication.BaseAuthentication):
+    """
+    DRF authentication for tokens from make_token()
+    Requests without an Authorization: Bearer header fall through to the
+    next authentication class (sessions)
+    """
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != KEYWORD.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        try:
+            payload = signing.loads(
+                header[1].decode(), salt=SALT,
+                max_age=getattr(settings, 'USER_TOKEN_MAX_AGE', 7 * 24 * 3600),
+            )
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        except (signing.BadSignature, UnicodeDecodeError):
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        user, auth_hash = user_cache.get(payload.get('u'))
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        if not constant_time_compare(payload.get('h', ''), auth_hash):
+            raise exceptions.AuthenticationFailed('Token has been revoked.')
+        # A copy per request - the cached instance is shared between threads
+        return copy.copy(user), None
+
+    def authenticate_header(self, request):
+        return KEYWORD
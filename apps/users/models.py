@@ -6,6 +6,8 @@ class User(AbstractUser):
     phone = models.CharField(max_length=15, blank=True)
     bio = models.TextField(max_length=500, blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # Resized WebP versions of the avatar, filled in by sharetrip.images
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     date_of_birth = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True) 
     updated_at = models.DateTimeField(auto_now=True)     
@@ -1,9 +1,12 @@
 from rest_framework import serializers
-from django.contrib.auth import get_user_model
+from django.contrib.auth import authenticate, get_user_model
+from sharetrip.compiled import CompiledRepresentationMixin
+from sharetrip.images import ImageVariantsField
+from sharetrip.sparse import SparseFieldsMixin
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, CompiledRepresentationMixin, serializers.ModelSerializer):
     """
     Serializer for User model
     Why: Converts Python objects to JSON and vice versa
@@ -12,12 +15,21 @@ class UserSerializer(serializers.ModelSerializer):
     
     # Custom field - not in model but calculated
     full_name = serializers.SerializerMethodField()
+    # Resized avatar URLs, filled in after upload
+    avatar_variants = ImageVariantsField('avatar')
+    
+    # Enough to show who someone is - no bio, phone or birthday
+    card_fields = ['id', 'username', 'full_name', 'avatar_variants']
+    field_columns = {
+        'full_name': ['first_name', 'last_name'],
+        'avatar_variants': ['avatar', 'avatar_variants'],
+    }
     
     class Meta:
         model = User
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name', 
-            'full_name', 'phone', 'bio', 'avatar', 'date_of_birth'
+            'full_name', 'phone', 'bio', 'avatar', 'avatar_variants', 'date_of_birth'
         ]
         # Hide sensitive fields in API responses
         extra_kwargs = {
@@ -65,4 +77,21 @@ class UserCreateSerializer(serializers.ModelSerializer):
         
         # Create user with hashed password
         user = User.objects.create_user(**validated_data)
-        return user
\ No newline at end of file
+        return user
+
+class TokenObtainSerializer(serializers.Serializer):
+    """
+    Credentials exchanged for an API token
+    Why: Mobile/API clients authenticate with a bearer token instead of a session
+    """
+    username = serializers.CharField()
+    password = serializers.CharField(write_only=True, style={'input_type': 'password'})
+
+    def validate(self, attrs):
+        user = authenticate(
+            self.context.get('request'), username=attrs['username'], password=attrs['password']
+        )
+        if user is None:
+            raise serializers.ValidationError('Unable to log in with provided credentials.')
+        attrs['user'] = user
+        return attrs
@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.bookings.models import Booking
+from apps.bookings.signals import booking_status_changed, bookings_bulk_created
+from apps.trips.models import Trip, trips_bulk_created
+from apps.trips.signals import PREVIOUS_STATE_FIELDS, invalidate_creator_trips
+from sharetrip.images import (
+    AVATAR_SIZES, delete_variants, schedule_processing, track_image_change,
+)
+from .authentication import USER_FIELDS, user_cache
+from .models import User
+from .stats import invalidate_dashboards
+
+
+@receiver(pre_save, sender=User)
+def remember_avatar_upload(sender, instance, update_fields=None, **kwargs):
+    # Logins save with update_fields=['last_login'] and skip the lookup
+    track_image_change(instance, 'avatar', 'avatar_variants', update_fields)
+
+
+@receiver(post_save, sender=User)
+def process_avatar(sender, instance, **kwargs):
+    """Resize a new avatar off the request, then drop the trip pages showing it"""
+    if getattr(instance, '_image_changed', False):
+        user_id = instance.pk
+        schedule_processing(
+            instance, 'avatar', 'avatar_variants', AVATAR_SIZES,
+            on_done=lambda: invalidate_creator_trips(user_id)
+        )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, update_fields=None, **kwargs):
+    """Token auth must see new passwords and deactivations (authentication.py)"""
+    # Logins save only last_login, which isn't cached
+    if update_fields and not set(update_fields) & set(USER_FIELDS):
+        return
+    # After commit - forgotten earlier, a token request could cache the old row again
+    user_id = instance.pk
+    transaction.on_commit(lambda: user_cache.forget(user_id))
+
+
+@receiver(post_delete, sender=User)
+def delete_avatar_variants(sender, instance, **kwargs):
+    storage, variants = instance.avatar.storage, instance.avatar_variants
+    transaction.on_commit(lambda: delete_variants(storage, variants))
+
+
+# Dashboard cache (stats.py)
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_booker_dashboard(sender, instance, **kwargs):
+    invalidate_dashboards([instance.user_id])
+
+
+@receiver(booking_status_changed)
+def invalidate_status_dashboards(sender, booking, **kwargs):
+    # Confirm/cancel change the booker's spend and the creator's revenue
+    invalidate_dashboards([booking.user_id, booking.trip.creator_id])
+
+
+@receiver(bookings_bulk_created)
+def invalidate_bulk_booker_dashboards(sender, bookings, **kwargs):
+    invalidate_dashboards([booking.user_id for booking in bookings])
+
+
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+def invalidate_trip_dashboards(sender, instance, created=False, **kwargs):
+    """The creator's numbers, and the upcoming trips of everyone booked on it"""
+    user_ids = [instance.creator_id]
+    # A new trip has no bookings; a deleted one had its bookings deleted first
+    if kwargs['signal'] is post_save and not created and _shown_to_bookers_changed(instance):
+        user_ids += Booking.objects.filter(trip_id=instance.pk).values_list('user_id', flat=True)
+    invalidate_dashboards(user_ids)
+
+
+def _shown_to_bookers_changed(trip):
+    """Whether the save changed what bookers' dashboards show of the trip"""
+    # Filled in by apps.trips.signals before the save
+    previous = getattr(trip, '_previous_state', None)
+    if previous is None:
+        return True
+    return any(previous[field] != getattr(trip, field) for field in PREVIOUS_STATE_FIELDS)
+
+
+@receiver(trips_bulk_created)
+def invalidate_importer_dashboards(sender, trips, **kwargs):
+    invalidate_dashboards([trip.creator_id for trip in trips])
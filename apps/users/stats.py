@@ -0,0 +1,121 @@
+"""
+Dashboard numbers for a user
+Why: user_stats counted and sliced separately and loaded each recent
+booking's trip on its own
+What: Conditional aggregation - one query for all booking numbers, one for
+all trip numbers, one per short list - so the cost doesn't grow with the
+user's history. Results are cached per user and dropped on writes
+(see signals.py).
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.trips.models import Trip
+
+LIST_SIZE = 5
+
+
+def _sum(field, **filters):
+    return Coalesce(
+        Sum(field, filter=Q(**filters) if filters else None),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def _money(value):
+    # SQLite sums come back without the field's decimal places
+    return str(Decimal(value).quantize(Decimal('0.01')))
+
+
+def dashboard(user):
+    """Everything user_stats returns, in a constant number of queries"""
+    bookings = Booking.objects.filter(user=user).aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+        confirmed=Count('id', filter=Q(status='confirmed')),
+        cancelled=Count('id', filter=Q(status='cancelled')),
+        spent=_sum('total_price', status='confirmed'),
+    )
+    # Revenue is the seat-inventory counter on each trip - no join to bookings
+    trips = Trip.objects.filter(creator=user).aggregate(
+        total=Count('id'),
+        published=Count('id', filter=Q(status='published')),
+        revenue=_sum('confirmed_revenue'),
+    )
+
+    recent_trips = (
+        Trip.objects.filter(creator=user).order_by('-created_at')
+        .values('id', 'title', 'destination')[:LIST_SIZE]
+    )
+    recent_bookings = (
+        Booking.objects.filter(user=user).order_by('-booking_date')
+        .values('id', 'status', trip_title=F('trip__title'))[:LIST_SIZE]
+    )
+    upcoming = (
+        Booking.objects.filter(
+            user=user, status__in=['pending', 'confirmed'],
+            trip__start_date__gte=timezone.localdate(),
+        )
+        .order_by('trip__start_date', 'id')
+        .values(
+            'trip_id', 'status', 'number_of_people',
+            booking_id=F('id'),
+            title=F('trip__title'),
+            destination=F('trip__destination'),
+            start_date=F('trip__start_date'),
+        )[:LIST_SIZE]
+    )
+
+    return {
+        'trips_created': trips['total'],
+        'trips_published': trips['published'],
+        'revenue_earned': _money(trips['revenue']),
+        'bookings_made': bookings['total'],
+        'bookings_by_status': {
+            'pending': bookings['pending'],
+            'confirmed': bookings['confirmed'],
+            'cancelled': bookings['cancelled'],
+        },
+        'total_spent': _money(bookings['spent']),
+        'upcoming_trips': [
+            dict(trip, start_date=trip['start_date'].isoformat()) for trip in upcoming
+        ],
+        'recent_trips': list(recent_trips),
+        'recent_bookings': list(recent_bookings),
+    }
+
+
+# Per-user cache
+def _cache():
+    return caches[getattr(settings, 'USER_STATS_CACHE_ALIAS', 'default')]
+
+
+def _key(user_id):
+    return f'users:stats:{user_id}'
+
+
+def cached_dashboard(user):
+    """dashboard() served from the cache when USER_STATS_CACHE_TIMEOUT is set"""
+    timeout = getattr(settings, 'USER_STATS_CACHE_TIMEOUT', 0)
+    if not timeout:
+        return dashboard(user)
+    data = _cache().get(_key(user.pk))
+    if data is None:
+        data = dashboard(user)
+        _cache().set(_key(user.pk), data, timeout)
+    return data
+
+
+def invalidate_dashboards(user_ids):
+    """Drop cached dashboards once the write is committed"""
+    keys = [_key(user_id) for user_id in set(user_ids) if user_id]
+    if keys:
+        transaction.on_commit(lambda: _cache().delete_many(keys))
@@ -1,3 +1,252 @@
-from django.test import TestCase
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.bookings.models import Booking
+from apps.bookings.tests import make_trip, make_user
+from apps.trips.tests import jpeg_upload
+from .authentication import user_cache
+
+User = get_user_model()
+
+
+class AvatarProcessingTests(APITestCase):
+    """A new avatar is resized after commit, logins don't trigger any work"""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media, IMAGE_PROCESSING_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user(
+            username='asha', email='asha@example.com', password='password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_avatar_upload_is_resized(self):
+        self.assertIsNone(self.client.get(reverse('user-profile')).data['avatar_variants'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('user-profile'), {'avatar': jpeg_upload('me.jpg', (600, 600))},
+                format='multipart'
+            )
+        self.assertEqual(response.status_code, 200)
+
+        self.user.refresh_from_db()
+        variants = self.client.get(reverse('user-profile')).data['avatar_variants']
+        self.assertEqual(variants['status'], 'ready')
+        self.assertEqual(variants['sizes']['small']['width'], 64)
+        self.assertTrue(variants['sizes']['medium']['url'].endswith('_medium.webp'))
+
+    def test_replacing_avatar_drops_old_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('user-profile'), {'avatar': jpeg_upload('one.jpg')}, format='multipart')
+        self.user.refresh_from_db()
+        old = [variant['name'] for variant in self.user.avatar_variants['sizes'].values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('user-profile'), {'avatar': jpeg_upload('two.jpg')}, format='multipart')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_variants['status'], 'ready')
+        for name in old:
+            self.assertFalse(self.user.avatar.storage.exists(name))
+
+    def test_login_does_not_reprocess(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save(update_fields=['last_login'])
+        self.assertEqual(callbacks, [])
+
+    def test_processed_avatar_changes_profile_etag(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.patch(reverse('user-profile'), {'avatar': jpeg_upload('me.jpg')}, format='multipart')
+        etag = self.client.get(reverse('user-profile'))['ETag']
+        for callback in callbacks:
+            callback()
+
+        response = self.client.get(reverse('user-profile'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['avatar_variants']['status'], 'ready')
+
+
+class ProfileConditionalGetTests(APITestCase):
+    """The profile revalidates from updated_at alone"""
+
+    def setUp(self):
+        self.user = make_user('asha')
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_profile_is_not_modified(self):
+        response = self.client.get(reverse('user-profile'))
+        self.assertEqual(response['Cache-Control'], 'no-cache, private')
+        with self.assertNumQueries(1):
+            revalidated = self.client.get(reverse('user-profile'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        revalidated = self.client.get(reverse('user-profile'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_update_changes_etag(self):
+        etag = self.client.get(reverse('user-profile'))['ETag']
+        self.client.patch(reverse('user-profile'), {'bio': 'Hiker'})
+        response = self.client.get(reverse('user-profile'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['bio'], 'Hiker')
+
+    def test_fields_pick_profile_fields(self):
+        response = self.client.get(reverse('user-profile'), {'fields': 'username,full_name'})
+        self.assertEqual(response.data, {'id': self.user.id, 'username': 'asha', 'full_name': ''})
+
+        # Updates take every field, whatever the query string says
+        response = self.client.patch(reverse('user-profile') + '?fields=username', {'bio': 'Hiker'})
+        self.assertEqual(response.data['bio'], 'Hiker')
+
+    def test_etags_are_per_user(self):
+        etag = self.client.get(reverse('user-profile'))['ETag']
+        self.client.force_authenticate(make_user('bilal'))
+        self.assertEqual(self.client.get(reverse('user-profile'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(USER_STATS_CACHE_TIMEOUT=60)
+class UserStatsTests(APITestCase):
+    """The dashboard costs the same few queries however long the user's history is"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.creator = make_user('creator')
+        self.user = make_user('asha')
+        self.client.force_authenticate(self.user)
+
+    def book(self, trip, user=None, seats=1, status='pending'):
+        return Booking.objects.create(
+            user=user or self.user, trip=trip, status=status,
+            number_of_people=seats, total_price=seats * trip.price_per_person,
+        )
+
+    def stats(self):
+        return self.client.get(reverse('user-stats'))
+
+    def test_aggregates(self):
+        self.book(make_trip(self.creator, title='A'), seats=2, status='confirmed')
+        self.book(make_trip(self.creator, title='B'), status='cancelled')
+        self.book(make_trip(self.creator, title='C'))
+        own = make_trip(self.user, title='Mine', confirmed_revenue='150.00')
+
+        data = self.stats().data
+        self.assertEqual(data['bookings_made'], 3)
+        self.assertEqual(data['bookings_by_status'], {'pending': 1, 'confirmed': 1, 'cancelled': 1})
+        self.assertEqual(data['total_spent'], '200.00')
+        self.assertEqual(data['trips_created'], 1)
+        self.assertEqual(data['revenue_earned'], '150.00')
+        self.assertEqual(data['recent_trips'], [{'id': own.id, 'title': 'Mine', 'destination': 'Khulna'}])
+        self.assertEqual([b['trip_title'] for b in data['recent_bookings']], ['C', 'B', 'A'])
+        # Cancelled bookings aren't upcoming
+        self.assertEqual([t['title'] for t in data['upcoming_trips']], ['A', 'C'])
+
+    def test_query_count_does_not_grow_with_bookings(self):
+        for i in range(8):
+            self.book(make_trip(self.creator, title=f'Trip {i}'))
+        # 5 dashboard queries, no cache
+        with override_settings(USER_STATS_CACHE_TIMEOUT=0), self.assertNumQueries(5):
+            self.stats()
+
+    def test_cached_until_a_booking_changes(self):
+        trip = make_trip(self.creator)
+        self.stats()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.stats().data['bookings_made'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.reserve_seats(1)
+            booking = self.book(trip)
+        self.assertEqual(self.stats().data['bookings_made'], 1)
+
+        self.client.force_authenticate(self.creator)
+        self.assertEqual(self.stats().data['revenue_earned'], '0.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.confirm()
+        self.assertEqual(self.stats().data['revenue_earned'], '100.00')
+
+
+    def test_trip_edit_reaches_bookers_only_if_they_see_it(self):
+        trip = make_trip(self.creator, title='Beach')
+        self.book(trip)
+        self.stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.description = 'Now with snorkelling'
+            trip.save()
+        with self.assertNumQueries(0):
+            self.stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.title = 'Coral beach'
+            trip.save()
+        self.assertEqual(self.stats().data['upcoming_trips'][0]['title'], 'Coral beach')
+
+class TokenAuthenticationTests(APITestCase):
+    """Bearer tokens resolve the user from an in-process cache of a few columns"""
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create_user(
+            username='asha', email='asha@example.com', password='password123', bio='x' * 400
+        )
+        response = self.client.post(
+            reverse('user-token'), {'username': 'asha', 'password': 'password123'}
+        )
+        self.assertEqual(response.data['token_type'], 'Bearer')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']}")
+
+    def test_user_is_looked_up_once(self):
+        with self.assertNumQueries(1 + 5):  # user (first request only) + dashboard
+            self.client.get(reverse('user-stats'))
+        with self.assertNumQueries(0):  # dashboard cached, user cached
+            response = self.client.get(reverse('user-stats'))
+        self.assertEqual(response.status_code, 200)
+
+        # Only the columns permission checks need
+        with self.assertNumQueries(1) as queries:
+            user_cache.clear()
+            self.client.get(reverse('user-stats'))
+        self.assertNotIn('bio', queries.captured_queries[0]['sql'])
+
+    def test_profile_reads_and_updates_the_full_row(self):
+        response = self.client.patch(reverse('user-profile'), {'first_name': 'Asha'})
+        self.assertEqual(response.data['bio'], 'x' * 400)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Asha')
+
+    def test_password_change_revokes_tokens(self):
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 200)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.set_password('new-password-456')
+            self.user.save()
+        # Forgotten once the change is committed - not before, when the old row could be cached again
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 200)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 403)
+
+    def test_bad_tokens_and_credentials(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        response = self.client.get(reverse('user-profile'))
+        self.assertEqual(response.data['detail'], 'Invalid token.')
+
+        with override_settings(USER_TOKEN_MAX_AGE=-1):
+            token = self.client.post(
+                reverse('user-token'), {'username': 'asha', 'password': 'password123'}
+            ).data['token']
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEqual(self.client.get(reverse('user-profile')).data['detail'], 'Token has expired.')
+
+        response = self.client.post(reverse('user-token'), {'username': 'asha', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 400)
@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     # User authentication and profile
     path('register/', views.UserCreateView.as_view(), name='user-register'),
+    path('token/', views.obtain_token, name='user-token'),
     path('profile/', views.UserProfileView.as_view(), name='user-profile'),
     path('stats/', views.user_stats, name='user-stats'),
 ]
\ No newline at end of file
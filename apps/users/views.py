@@ -1,12 +1,17 @@
 from rest_framework import generics, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .serializers import UserSerializer, UserCreateSerializer
+from sharetrip.conditional import make_etag, not_modified, set_validators
+from sharetrip.sparse import SparseFieldsViewMixin
+from .authentication import KEYWORD, make_token
+from .serializers import TokenObtainSerializer, UserSerializer, UserCreateSerializer
+from .stats import cached_dashboard
 
 User = get_user_model()
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(SparseFieldsViewMixin, generics.RetrieveUpdateAPIView):
     """
     View for user profile
     Why: Allows users to view and update their profile
@@ -16,8 +21,29 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        """Return the current user"""
-        return self.request.user
+        """
+        Return the current user
+        Token requests carry a partially loaded, cached user - read the row
+        (only the columns of the requested ?fields=)
+        """
+        return self.filter_queryset(User.objects.all()).get(pk=self.request.user.pk)
+    
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Answer revalidations from updated_at alone
+        Why: Polling clients got the whole profile again when nothing changed
+        What: ETag/Last-Modified from updated_at - a matching If-None-Match or
+        If-Modified-Since gets 304 without loading the row or serializing it
+        """
+        updated_at = User.objects.filter(pk=request.user.pk).values_list('updated_at', flat=True).get()
+        # ?fields= changes the body, not updated_at
+        etag = make_etag('user', request.user.pk, updated_at, sorted(request.query_params.lists()))
+        response = not_modified(request, etag, updated_at, private=True)
+        if response is None:
+            response = set_validators(
+                super().retrieve(request, *args, **kwargs), etag, updated_at, private=True
+            )
+        return response
 
 class UserCreateView(generics.CreateAPIView):
     """
@@ -29,33 +55,31 @@ class UserCreateView(generics.CreateAPIView):
     serializer_class = UserCreateSerializer
     permission_classes = [permissions.AllowAny]  # Anyone can register
 
+@api_view(['POST'])
+@authentication_classes([])  # A stale token or session mustn't block getting a new one
+@permission_classes([permissions.AllowAny])
+def obtain_token(request):
+    """
+    Exchange username and password for an API token
+    Why: Token requests skip the session lookup and CSRF checks
+    What: Returns a signed token for `Authorization: Bearer <token>` - it
+    stops working when it expires or the password changes
+    """
+    serializer = TokenObtainSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    return Response({
+        'token': make_token(serializer.validated_data['user']),
+        'token_type': KEYWORD,
+        'expires_in': settings.USER_TOKEN_MAX_AGE,
+    })
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def user_stats(request):
     """
     Get user statistics
     Why: Provide dashboard data for users
-    What: Returns trips created, bookings made, etc.
+    What: Trips created, bookings by status, spend, revenue earned as a
+    creator, upcoming and recent trips - constant number of queries, cached per user
     """
-    user = request.user
-    
-    # Count user's trips and bookings
-    trips_created = user.created_trips.count()
-    bookings_made = user.bookings.count()
-    
-    # Get recent activity
-    recent_trips = user.created_trips.order_by('-created_at')[:5]
-    recent_bookings = user.bookings.order_by('-booking_date')[:5]
-    
-    return Response({
-        'trips_created': trips_created,
-        'bookings_made': bookings_made,
-        'recent_trips': [
-            {'id': trip.id, 'title': trip.title, 'destination': trip.destination}
-            for trip in recent_trips
-        ],
-        'recent_bookings': [
-            {'id': booking.id, 'trip_title': booking.trip.title, 'status': booking.status}
-            for booking in recent_bookings
-        ]
-    })
\ No newline at end of file
+    return Response(cached_dashboard(request.user))
@@ -0,0 +1,47 @@
+"""
+Benchmark suite for the ShareTrip API
+
+Usage:
+    python -m benchmarks seed --preset small      # build benchmarks.sqlite3
+    python -m benchmarks run --output benchmarks/results/before.json
+    python -m benchmarks run --compare benchmarks/results/before.json
+    python -m benchmarks run --server wsgi --concurrency 8
+    python -m benchmarks run --no-cache --only trips.list
+    python -m benchmarks servers --concurrency 1 16 64   # WSGI vs ASGI (async catalogue)
+    python -m benchmarks contention --threads 16          # parallel bookings, stock vs tuned SQLite
+    python -m benchmarks encoding --rows 1000             # json vs orjson, gzip/brotli sizes
+    python -m benchmarks serializers --rows 1000          # DRF vs compiled serializers
+
+Everything runs against its own database file (benchmarks.sqlite3 by default),
+never against db.sqlite3.
+"""
+import os
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DATABASE = BASE_DIR / 'benchmarks.sqlite3'
+
+
+def setup_django(database=DEFAULT_DATABASE, use_cache=True):
+    """
+    Configure Django for a benchmark process
+    database: SQLite file to use instead of the development database
+    use_cache: False swaps the trip catalogue cache for a dummy cache,
+    so the numbers show the uncached code path
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sharetrip.settings')
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+
+    # Connections are opened lazily, so changing settings here still applies
+    if settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):  # stock or tuned (sharetrip.sqlite3)
+        settings.DATABASES['default']['NAME'] = str(database)
+    settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + ['testserver', 'localhost', '127.0.0.1']
+    if not use_cache:
+        settings.CACHES['benchmark-dummy'] = {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }
+        settings.TRIP_CACHE_ALIAS = 'benchmark-dummy'
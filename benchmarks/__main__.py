@@ -0,0 +1,263 @@
+"""
+Command line for the benchmark suite - see benchmarks/__init__.py
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+from . import DEFAULT_DATABASE, setup_django
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('--database', default=str(DEFAULT_DATABASE), help='SQLite file to use')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='Create and fill the benchmark database')
+    seed_parser.add_argument('--preset', default='small', help='tiny, small or large')
+    seed_parser.add_argument('--users', type=int)
+    seed_parser.add_argument('--trips', type=int)
+    seed_parser.add_argument('--bookings', type=int)
+    seed_parser.add_argument('--images-per-trip', type=int)
+    seed_parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed, same data)')
+
+    run_parser = commands.add_parser('run', help='Benchmark the API endpoints')
+    run_parser.add_argument('--server', default='client',
+                            help="'client' (in-process test client), 'wsgi', 'asgi' or a base URL")
+    run_parser.add_argument('--iterations', type=int, default=50)
+    run_parser.add_argument('--warmup', type=int, default=5)
+    run_parser.add_argument('--concurrency', type=int, default=1, help='Parallel requests (server modes)')
+    run_parser.add_argument('--only', nargs='*', help='Only scenarios whose name contains one of these')
+    run_parser.add_argument('--no-cache', action='store_true', help='Bypass the catalogue cache')
+    run_parser.add_argument('--output', help='Write results as JSON')
+    run_parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    run_parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed p95 slowdown before a regression is reported (0.2 = 20%%)')
+
+    servers_parser = commands.add_parser(
+        'servers', help='Compare the WSGI and ASGI servers on the catalogue endpoints'
+    )
+    servers_parser.add_argument('--servers', nargs='+', default=['wsgi', 'asgi'])
+    servers_parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 16, 64])
+    servers_parser.add_argument('--iterations', type=int, default=200)
+    servers_parser.add_argument('--warmup', type=int, default=10)
+    servers_parser.add_argument('--only', nargs='*', default=['trips.list', 'trips.detail'])
+    servers_parser.add_argument('--no-cache', action='store_true', help='Bypass the catalogue cache')
+    servers_parser.add_argument('--output', help='Write all results as JSON')
+
+    contention_parser = commands.add_parser(
+        'contention', help='Parallel bookings - lock errors and throughput, stock vs tuned SQLite'
+    )
+    contention_parser.add_argument('--profiles', nargs='+', default=['stock', 'tuned'],
+                                   choices=['stock', 'tuned'])
+    contention_parser.add_argument('--threads', type=int, default=16)
+    contention_parser.add_argument('--bookings', type=int, default=50, help='Bookings per thread')
+    contention_parser.add_argument('--output', help='Write all results as JSON')
+
+    encoding_parser = commands.add_parser(
+        'encoding', help='JSON engines (render/parse CPU) and compression (bytes) on large lists'
+    )
+    encoding_parser.add_argument('--rows', type=int, default=1000, help='Trips and bookings per list')
+    encoding_parser.add_argument('--iterations', type=int, default=20)
+    encoding_parser.add_argument('--output', help='Write all results as JSON')
+
+    serializers_parser = commands.add_parser(
+        'serializers', help='DRF vs compiled serializers (CPU) on large trip and booking lists'
+    )
+    serializers_parser.add_argument('--rows', type=int, default=1000, help='Trips and bookings per list')
+    serializers_parser.add_argument('--iterations', type=int, default=10)
+    serializers_parser.add_argument('--output', help='Write all results as JSON')
+
+    args = parser.parse_args(argv)
+    if args.command == 'servers':
+        return servers_command(args)
+    if args.command == 'contention':
+        if len(args.profiles) > 1:
+            return contention_command(args)
+        # One profile, in this process - read by the settings
+        os.environ['DATABASE_SQLITE_TUNED'] = '1' if args.profiles == ['tuned'] else '0'
+
+    if getattr(args, 'server', None) == 'asgi':
+        # What asgi.py does - must be set before the settings are read
+        os.environ['SHARETRIP_ASYNC_CATALOGUE'] = '1'
+    setup_django(args.database, use_cache=not getattr(args, 'no_cache', False))
+
+    if args.command == 'seed':
+        return seed_command(args)
+    if args.command == 'contention':
+        return contention_run(args)
+    if args.command == 'encoding':
+        return encoding_command(args)
+    if args.command == 'serializers':
+        return serializers_command(args)
+    return run_command(args)
+
+
+def seed_command(args):
+    from django.core.management import call_command
+    from apps.trips.models import Trip
+    from .seed import PRESETS, seed
+
+    call_command('migrate', verbosity=0)
+    if Trip.objects.exists():
+        sys.exit(f'{args.database} already has data - delete it to reseed')
+
+    counts = dict(PRESETS[args.preset])
+    for key in counts:
+        value = getattr(args, key)
+        if value is not None:
+            counts[key] = value
+    seed(random_seed=args.seed, **counts)
+
+
+def run_command(args):
+    from . import runner
+
+    stop = None
+    if args.server == 'client':
+        driver = runner.TestClientDriver()
+    else:
+        if args.server == 'wsgi':
+            base_url, stop = runner.start_wsgi_server()
+        elif args.server == 'asgi':
+            base_url, stop = runner.start_asgi_server()
+        else:
+            base_url = args.server
+        scenarios = runner.build_scenarios()
+        driver = runner.HTTPDriver(
+            base_url, runner.session_cookies(s.user for s in scenarios), name=args.server
+        )
+
+    try:
+        results = runner.run(driver, args.iterations, args.warmup, args.concurrency, args.only)
+    finally:
+        if stop:
+            stop()
+    results['meta']['cache'] = not args.no_cache
+
+    if args.output:
+        runner.save(results, args.output)
+    if args.compare:
+        regressions = runner.compare(results, runner.load(args.compare), args.threshold)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            return 1
+    return 0
+
+
+def servers_command(args):
+    """
+    Run the same scenarios against each server at each concurrency level
+    Every run is its own process, so each server gets its own settings and URLconf
+    """
+    results = {}
+    for server in args.servers:
+        for concurrency in args.concurrency:
+            with tempfile.NamedTemporaryFile(suffix='.json') as output:
+                command = [
+                    sys.executable, '-m', 'benchmarks', '--database', args.database, 'run',
+                    '--server', server, '--concurrency', str(concurrency),
+                    '--iterations', str(args.iterations), '--warmup', str(args.warmup),
+                    '--output', output.name, '--only', *args.only,
+                ]
+                if args.no_cache:
+                    command.append('--no-cache')
+                print(f'== {server}, concurrency {concurrency}')
+                subprocess.run(command, check=True)
+                results[f'{server}@{concurrency}'] = json.load(output)
+
+    print()
+    print(f"{'endpoint':<28}{'conc':>6}" + ''.join(f'{server + " p95 / req/s":>26}' for server in args.servers))
+    first = results[f'{args.servers[0]}@{args.concurrency[0]}']
+    for name in first['endpoints']:
+        for concurrency in args.concurrency:
+            row = f'{name:<28}{concurrency:>6}'
+            for server in args.servers:
+                stats = results[f'{server}@{concurrency}']['endpoints'][name]
+                row += f"{stats['p95_ms']:>14}ms {stats['throughput_rps']:>9}"
+            print(row)
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+    return 0
+
+
+def contention_run(args):
+    from .contention import run
+
+    results = run(args.threads, args.bookings)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+    return 0
+
+
+def contention_command(args):
+    """
+    Run the booking benchmark once per SQLite profile, each in its own process
+    on its own copy of the database - WAL mode sticks to a file once set
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in args.profiles:
+            database = os.path.join(directory, f'{profile}.sqlite3')
+            shutil.copyfile(args.database, database)
+            with sqlite3.connect(database) as connection:
+                connection.execute('PRAGMA journal_mode = DELETE')
+            output = os.path.join(directory, f'{profile}.json')
+            print(f'== {profile}')
+            subprocess.run([
+                sys.executable, '-m', 'benchmarks', '--database', database, 'contention',
+                '--profiles', profile, '--threads', str(args.threads),
+                '--bookings', str(args.bookings), '--output', output,
+            ], check=True)
+            with open(output) as handle:
+                results[profile] = json.load(handle)
+
+    columns = ['journal_mode', 'attempts', 'booked', 'locked', 'lock_error_rate', 'bookings_per_s', 'p50_ms', 'p95_ms']
+    print()
+    print(f"{'':<16}" + ''.join(f'{profile:>14}' for profile in results))
+    for column in columns:
+        print(f'{column:<16}' + ''.join(f'{str(row[column]):>14}' for row in results.values()))
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+    return 0
+
+
+def encoding_command(args):
+    from .encoding import run
+
+    return print_results(run(args.rows, args.iterations), args.output)
+
+
+def serializers_command(args):
+    from .serialization import run
+
+    return print_results(run(args.rows, args.iterations), args.output)
+
+
+def print_results(results, output=None):
+    """{case: {metric: value}} as a table with a column per case"""
+    columns = list(next(iter(results.values())))
+    width = max(18, *(len(name) + 2 for name in results))
+    print(f"{'':<20}" + ''.join(f'{name:>{width}}' for name in results))
+    for column in columns:
+        print(f'{column:<20}' + ''.join(f'{str(row[column]):>{width}}' for row in results.values()))
+
+    if output:
+        with open(output, 'w') as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Parallel booking benchmark
+Why: Concurrent bookings on SQLite failed with `database is locked`; this
+measures how often, and the booking throughput, for a database profile
+What: `threads` users each book the same `bookings` trips, in the same order,
+on the test client - alternating POST /api/bookings/create/ and a one-item
+POST /api/bookings/bulk/ (which reads the trips before it writes), so every
+thread writes the same hot trip rows at the same time. Lock errors are
+counted, not retried.
+
+Run through `python -m benchmarks contention`, which repeats it for the stock
+and the tuned SQLite profile (DATABASE_SQLITE_TUNED) on copies of the
+benchmark database.
+"""
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sharetrip.instrumentation import percentile
+
+PREFIX = 'contention'
+
+
+def prepare(threads, bookings):
+    """Create the users and trips of one run - returns (usernames, trip ids)"""
+    from apps.trips.models import Trip
+    from apps.users.models import User
+
+    run = f'{PREFIX}{int(time.time() * 1000)}'
+    creator = User.objects.create_user(username=f'{run}-creator', email=f'{run}-creator@example.com')
+    users = User.objects.bulk_create(
+        User(username=f'{run}-{number}', email=f'{run}-{number}@example.com') for number in range(threads)
+    )
+    start = date.today() + timedelta(days=60)
+    trips = Trip.objects.bulk_create(
+        Trip(
+            creator=creator, title=f'Contention {number}', description='Benchmark trip',
+            destination='Benchmark', start_date=start, end_date=start + timedelta(days=3),
+            max_participants=threads, price_per_person=Decimal('100.00'), status='published',
+        )
+        for number in range(bookings)
+    )
+    return [user.username for user in users], [trip.pk for trip in trips]
+
+
+def book_all(username, trip_ids, barrier):
+    """One thread - returns [(milliseconds, outcome)]"""
+    from django.db import OperationalError, connections
+    from django.test import Client
+    from apps.users.models import User
+
+    client = Client()
+    client.force_login(User.objects.get(username=username))
+    samples = []
+    try:
+        barrier.wait()
+        for number, trip_id in enumerate(trip_ids):
+            start = time.perf_counter()
+            try:
+                if number % 2:
+                    response = client.post(
+                        '/api/bookings/bulk/', {'bookings': [{'trip_id': trip_id, 'participants': 1}]},
+                        content_type='application/json',
+                    )
+                    booked = response.status_code == 200 and response.json()['failed'] == 0
+                else:
+                    response = client.post(
+                        '/api/bookings/create/', {'trip_id': trip_id, 'participants': 1}
+                    )
+                    booked = response.status_code == 201
+                outcome = 'booked' if booked else f'http {response.status_code}'
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                outcome = 'locked'
+            samples.append(((time.perf_counter() - start) * 1000, outcome))
+    finally:
+        connections.close_all()
+    return samples
+
+
+def run(threads=16, bookings=50):
+    from django.conf import settings
+    from django.db import connection
+
+    # Lock errors are 500s - handle them as production does, not with the debug page
+    settings.DEBUG = False
+    usernames, trip_ids = prepare(threads, bookings)
+    barrier = threading.Barrier(threads + 1)
+    results = [None] * threads
+
+    def worker(index):
+        results[index] = book_all(usernames[index], trip_ids, barrier)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [sample for samples in results for sample in samples]
+    booked = sorted(ms for ms, outcome in samples if outcome == 'booked')
+    locked = sum(1 for _, outcome in samples if outcome == 'locked')
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        journal_mode = cursor.fetchone()[0]
+    return {
+        'engine': connection.settings_dict['ENGINE'],
+        'journal_mode': journal_mode,
+        'threads': threads,
+        'attempts': len(samples),
+        'booked': len(booked),
+        'locked': locked,
+        'other_errors': len(samples) - len(booked) - locked,
+        'lock_error_rate': round(locked / len(samples), 4) if samples else None,
+        'bookings_per_s': round(len(booked) / elapsed, 1),
+        'p50_ms': round(percentile(booked, 0.50), 2) if booked else None,
+        'p95_ms': round(percentile(booked, 0.95), 2) if booked else None,
+        'elapsed_s': round(elapsed, 2),
+    }
@@ -0,0 +1,63 @@
+"""
+JSON engine and compression benchmark
+Why: Shows what the orjson renderer/parser (sharetrip.renderers) and the
+response compression (sharetrip.compression) save on large lists
+What: Serializes `rows` trips and `rows` bookings as the list endpoints do,
+then for each JSON engine times rendering the list and parsing it back, and
+for each encoding the compressed size and the time to compress. Times are
+CPU time (process_time), the median of `iterations` runs.
+
+Run through `python -m benchmarks encoding`.
+"""
+import io
+import statistics
+import time
+
+from django.test import override_settings
+
+
+def cpu_ms(function, iterations):
+    """Median CPU milliseconds of function()"""
+    samples = []
+    for _ in range(iterations):
+        start = time.process_time()
+        function()
+        samples.append((time.process_time() - start) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def payloads(rows):
+    """{name: serialized list} - the full representation of each item"""
+    from apps.bookings.models import Booking
+    from apps.bookings.serializers import BookingSerializer
+    from apps.trips.models import Trip
+    from apps.trips.serializers import TripSerializer
+
+    trips = Trip.objects.select_related('creator').prefetch_related('images').order_by('id')[:rows]
+    bookings = Booking.objects.select_related('trip__creator', 'user').order_by('id')[:rows]
+    return {
+        f'trips x{rows}': TripSerializer(trips, many=True).data,
+        f'bookings x{rows}': BookingSerializer(bookings, many=True).data,
+    }
+
+
+def run(rows=1000, iterations=20):
+    from sharetrip.compression import Brotli, Gzip, brotli
+    from sharetrip.renderers import ENGINES, JSONParser, JSONRenderer
+
+    encoders = [Gzip()] + ([Brotli()] if brotli is not None else [])
+    results = {}
+    for name, data in payloads(rows).items():
+        result = results[name] = {}
+        for engine in ENGINES:
+            with override_settings(API_JSON_ENGINE=engine):
+                body = JSONRenderer().render(data)
+                result[f'{engine}_render_ms'] = cpu_ms(lambda: JSONRenderer().render(data), iterations)
+                result[f'{engine}_parse_ms'] = cpu_ms(
+                    lambda: JSONParser().parse(io.BytesIO(body), 'application/json', {}), iterations
+                )
+        result['identity_bytes'] = len(body)
+        for encoder in encoders:
+            result[f'{encoder.encoding}_bytes'] = len(encoder.compress(body))
+            result[f'{encoder.encoding}_ms'] = cpu_ms(lambda: encoder.compress(body), iterations)
+    return results
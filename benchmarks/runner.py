@@ -0,0 +1,278 @@
+"""
+Drive the API endpoints and report latency, throughput and query counts
+What: Each scenario is requested `iterations` times through Django's test
+client (in-process) or over HTTP against a local WSGI/ASGI server, and the
+results are written as JSON that can be compared with an earlier run
+"""
+import json
+import platform
+import re
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from sharetrip.instrumentation import percentile
+
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+
+
+class Scenario:
+    """One endpoint to benchmark - path is a callable so ids can vary per run"""
+
+    def __init__(self, name, path, user=None):
+        self.name = name
+        self.path = path
+        self.user = user
+
+
+def build_scenarios():
+    """Endpoints with realistic parameters picked from the seeded data"""
+    from apps.bookings.models import Booking
+    from apps.trips.models import Trip
+    from apps.users.models import User
+
+    published = list(
+        Trip.objects.published().order_by('id').values_list('id', flat=True)[:1000]
+    )
+    booker = User.objects.get(username='user1')
+    # The seed makes user0 the creator of every 50th trip
+    popular = Trip.objects.filter(creator__username='user0').order_by('-confirmed_seats').first()
+    creator = popular.creator
+    deep_page = max(Trip.objects.published().count() // 10 // 2, 1)
+    booking_count = Booking.objects.filter(trip=popular).count()
+
+    def cycle(values):
+        state = {'i': 0}
+
+        def next_value():
+            state['i'] += 1
+            return values[state['i'] % len(values)]
+        return next_value
+
+    trip_id = cycle(published)
+    return [
+        Scenario('trips.list', lambda: '/api/trips/'),
+        Scenario('trips.list.deep_page', lambda: f'/api/trips/?page={deep_page}'),
+        Scenario('trips.list.cursor', lambda: '/api/trips/?cursor='),
+        Scenario('trips.list.destination', lambda: '/api/trips/?destination=Sylhet'),
+        Scenario('trips.search', lambda: '/api/trips/?search=beach%20tre'),
+        Scenario('trips.detail', lambda: f'/api/trips/{trip_id()}/'),
+        Scenario('trips.mine', lambda: '/api/trips/my-trips/', user=creator),
+        Scenario('bookings.mine', lambda: '/api/bookings/my-bookings/', user=booker),
+        Scenario(
+            f'bookings.trip ({booking_count} bookings)',
+            lambda: f'/api/bookings/trip/{popular.id}/',
+            user=creator
+        ),
+        Scenario('users.profile', lambda: '/api/users/profile/', user=booker),
+        Scenario('users.stats', lambda: '/api/users/stats/', user=booker),
+        Scenario('analytics.creator', lambda: '/api/analytics/creator/?interval=week', user=creator),
+    ]
+
+
+def session_cookies(users):
+    """Log users in once and return their session cookie headers"""
+    from django.conf import settings
+    from django.test import Client
+
+    cookies = {}
+    for user in users:
+        if user is None or user.pk in cookies:
+            continue
+        client = Client()
+        client.force_login(user)
+        cookies[user.pk] = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+    return cookies
+
+
+# Drivers - each returns (status code, body bytes, query count or None)
+class TestClientDriver:
+    """In-process requests through django.test.Client"""
+    name = 'test-client'
+
+    def __init__(self):
+        from django.test import Client
+        self.clients = {}
+        self.anonymous = Client()
+        self.Client = Client
+
+    def request(self, path, user=None, headers=None):
+        client = self.anonymous
+        if user is not None:
+            if user.pk not in self.clients:
+                self.clients[user.pk] = self.Client()
+                self.clients[user.pk].force_login(user)
+            client = self.clients[user.pk]
+        extra = {f"HTTP_{key.upper().replace('-', '_')}": value for key, value in (headers or {}).items()}
+        response = client.get(path, **extra)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, len(body), queries_from(response.get('Server-Timing', ''))
+
+
+class HTTPDriver:
+    """Real HTTP requests against a running server"""
+
+    def __init__(self, base_url, cookies, name='http'):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = cookies
+        self.name = name
+
+    def request(self, path, user=None, headers=None):
+        request = urllib.request.Request(self.base_url + path, headers=dict(headers or {}))
+        if user is not None:
+            request.add_header('Cookie', self.cookies[user.pk])
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                body = response.read()
+                return response.status, len(body), queries_from(response.headers.get('Server-Timing', ''))
+        except urllib.error.HTTPError as error:
+            return error.code, len(error.read()), None
+
+
+def queries_from(server_timing):
+    match = QUERIES_PATTERN.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+# Local servers
+def start_wsgi_server(port=0):
+    """Threaded WSGI server (the one runserver uses) in a background thread"""
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', port), QuietHandler, allow_reuse_address=True)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}', server.shutdown
+
+
+def start_asgi_server(port=8765, app='sharetrip.asgi:application'):
+    """uvicorn in a background thread - needs `pip install uvicorn`"""
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit('ASGI mode needs uvicorn: pip install uvicorn')
+
+    config = uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', lifespan='off')
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+    return f'http://127.0.0.1:{port}', stop
+
+
+# Running and reporting
+def measure(driver, scenario, iterations, warmup, concurrency=1, headers=None):
+    """Run one scenario and summarize it"""
+    for _ in range(warmup):
+        driver.request(scenario.path(), scenario.user, headers)
+
+    def one(_):
+        path = scenario.path()
+        start = time.perf_counter()
+        status, size, queries = driver.request(path, scenario.user, headers)
+        return (time.perf_counter() - start) * 1000, status, size, queries
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(one, range(iterations)))
+    else:
+        samples = [one(i) for i in range(iterations)]
+    elapsed = time.perf_counter() - started
+
+    durations = sorted(sample[0] for sample in samples)
+    queries = [sample[3] for sample in samples if sample[3] is not None]
+    return {
+        'requests': iterations,
+        'errors': sum(1 for sample in samples if sample[1] >= 400),
+        'p50_ms': round(percentile(durations, 0.50), 2),
+        'p95_ms': round(percentile(durations, 0.95), 2),
+        'p99_ms': round(percentile(durations, 0.99), 2),
+        'mean_ms': round(sum(durations) / len(durations), 2),
+        'throughput_rps': round(iterations / elapsed, 1),
+        'queries': max(queries) if queries else None,
+        'bytes': round(sum(sample[2] for sample in samples) / len(samples)),
+    }
+
+
+def environment():
+    """What the numbers depend on - recorded so runs can be compared fairly"""
+    import django
+    from django.db import connection
+    from apps.bookings.models import Booking
+    from apps.trips.models import Trip
+    from apps.users.models import User
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': f'{platform.system()} {platform.machine()}',
+        'database': connection.vendor,
+        'dataset': {
+            'users': User.objects.count(),
+            'trips': Trip.objects.count(),
+            'bookings': Booking.objects.count(),
+        },
+    }
+
+
+def run(driver, iterations=50, warmup=5, concurrency=1, only=None, headers=None, log=print):
+    scenarios = [s for s in build_scenarios() if not only or any(o in s.name for o in only)]
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = measure(driver, scenario, iterations, warmup, concurrency, headers)
+        row = results[scenario.name]
+        log(f"{scenario.name:<36} p50 {row['p50_ms']:>8}ms  p95 {row['p95_ms']:>8}ms  "
+            f"{row['throughput_rps']:>7} req/s  {row['queries']} queries  {row['bytes']} B")
+    return {
+        'meta': dict(environment(), driver=driver.name, iterations=iterations,
+                     warmup=warmup, concurrency=concurrency),
+        'endpoints': results,
+    }
+
+
+def compare(current, previous, threshold=0.2):
+    """
+    Compare two result files endpoint by endpoint
+    Returns a list of regressions: p95 slower or more queries than before
+    """
+    regressions = []
+    for name, now in current['endpoints'].items():
+        before = previous['endpoints'].get(name)
+        if not before:
+            continue
+        if before['p95_ms'] and now['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {now['p95_ms']}ms")
+        if before['queries'] is not None and (now['queries'] or 0) > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {now['queries']}")
+    return regressions
+
+
+def load(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save(results, path):
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
@@ -0,0 +1,152 @@
+"""
+Fast, reproducible dataset generator
+Why: Benchmarks need realistic volumes (100k users, 50k trips, 1M bookings)
+What: Deterministic random data written with batched bulk_create; seat
+counters are computed while generating so no recount pass is needed
+"""
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+PRESETS = {
+    'tiny': {'users': 200, 'trips': 100, 'bookings': 1000, 'images_per_trip': 2},
+    'small': {'users': 5000, 'trips': 2500, 'bookings': 50000, 'images_per_trip': 3},
+    'large': {'users': 100000, 'trips': 50000, 'bookings': 1000000, 'images_per_trip': 3},
+}
+
+DESTINATIONS = [
+    "Cox's Bazar", 'Sylhet', 'Bandarban', 'Rangamati', 'Sundarbans', 'Saint Martin',
+    'Srimangal', 'Kuakata', 'Khagrachari', 'Sajek Valley', 'Paharpur', 'Dhaka',
+]
+WORDS = [
+    'beach', 'hill', 'tea', 'river', 'forest', 'island', 'trek', 'sunset', 'boat',
+    'village', 'waterfall', 'camp', 'heritage', 'food', 'wildlife', 'lake', 'cruise',
+]
+STATUSES = ['published'] * 8 + ['draft', 'completed']
+BOOKING_STATUSES = ['confirmed'] * 6 + ['pending'] * 3 + ['cancelled']
+
+# Benchmark users share one password so hashing runs once
+PASSWORD = 'benchmark-password'
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(users, trips, bookings, images_per_trip, random_seed=42, batch_size=5000, log=print):
+    """
+    Fill an empty database with benchmark data
+    Returns the counts that were written
+    """
+    from apps.bookings.models import Booking
+    from apps.trips.models import Trip, TripImage
+    from apps.users.models import User
+
+    rng = random.Random(random_seed)
+    started = time.perf_counter()
+    password = make_password(PASSWORD)
+
+    # Users - user0 is the creator of the most popular trips, user1 a frequent booker
+    with transaction.atomic():
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'user{i}',
+                    email=f'user{i}@example.com',
+                    password=password,
+                    first_name=rng.choice(['Asha', 'Rafi', 'Nila', 'Tanvir', 'Mina']),
+                    last_name=rng.choice(['Rahman', 'Hossain', 'Akter', 'Islam']),
+                    bio=sentence(rng, 30),
+                )
+                for i in range(users)
+            ),
+            batch_size=batch_size,
+        )
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    log(f'users: {len(user_ids)}')
+
+    # Trips, images and bookings are generated one chunk of trips at a time
+    bookings_per_trip = bookings / max(trips, 1)
+    written = {'trips': 0, 'images': 0, 'bookings': 0}
+    trip_chunk = max(batch_size // max(int(bookings_per_trip), 1), 100)
+    today = date.today()
+
+    for chunk_start in range(0, trips, trip_chunk):
+        chunk = range(chunk_start, min(chunk_start + trip_chunk, trips))
+        trip_objects, planned = [], []
+        for i in chunk:
+            capacity = rng.randint(10, 80)
+            # Skewed demand - a few trips get far more bookings than others
+            wanted = min(int(rng.expovariate(1 / bookings_per_trip)), len(user_ids) - 1)
+            bookers = rng.sample(user_ids, wanted) if wanted else []
+            rows, confirmed, pending, revenue = [], 0, 0, Decimal('0')
+            price = Decimal(rng.randint(20, 500) * 10)
+            for user_id in bookers:
+                seats = rng.randint(1, 4)
+                status = rng.choice(BOOKING_STATUSES)
+                if status != 'cancelled' and confirmed + pending + seats > capacity:
+                    status = 'cancelled'
+                if status == 'confirmed':
+                    confirmed += seats
+                    revenue += seats * price
+                elif status == 'pending':
+                    pending += seats
+                rows.append((user_id, status, seats, seats * price))
+
+            start = today + timedelta(days=rng.randint(-180, 365))
+            trip_objects.append(Trip(
+                title=f'{sentence(rng, 3).title()} {i}',
+                description=sentence(rng, 80),
+                destination=rng.choice(DESTINATIONS),
+                creator_id=user_ids[0] if i % 50 == 0 else rng.choice(user_ids),
+                start_date=start,
+                end_date=start + timedelta(days=rng.randint(1, 10)),
+                max_participants=capacity,
+                price_per_person=price,
+                status=rng.choice(STATUSES),
+                confirmed_seats=confirmed,
+                pending_seats=pending,
+                confirmed_revenue=revenue,
+            ))
+            planned.append(rows)
+
+        with transaction.atomic():
+            Trip.objects.bulk_create(trip_objects, batch_size=batch_size)
+            TripImage.objects.bulk_create(
+                (
+                    TripImage(trip=trip, image=f'trip_images/bench_{trip.id}_{n}.jpg', caption=f'Photo {n}')
+                    for trip in trip_objects for n in range(images_per_trip)
+                ),
+                batch_size=batch_size,
+            )
+            Booking.objects.bulk_create(
+                (
+                    Booking(
+                        trip=trip, user_id=user_id, status=status,
+                        number_of_people=seats, total_price=total
+                    )
+                    for trip, rows in zip(trip_objects, planned)
+                    for user_id, status, seats, total in rows
+                ),
+                batch_size=batch_size,
+            )
+        written['trips'] += len(trip_objects)
+        written['images'] += len(trip_objects) * images_per_trip
+        written['bookings'] += sum(len(rows) for rows in planned)
+        log(f"trips: {written['trips']}/{trips}  bookings: {written['bookings']}")
+
+    # bulk_create skips the save signals that maintain the search index
+    from apps.trips.search import get_search_backend
+    get_search_backend().rebuild(batch_size=batch_size)
+    # ... and the analytics rollups
+    from apps.analytics.rollups import rebuild
+    rebuild(batch_size=batch_size)
+
+    written['users'] = len(user_ids)
+    written['seconds'] = round(time.perf_counter() - started, 1)
+    log(f"done in {written['seconds']}s")
+    return written
@@ -0,0 +1,61 @@
+"""
+Serializer benchmark
+Why: Shows what the compiled representations (sharetrip.compiled) save over
+DRF's to_representation on large lists
+What: Serializes `rows` trips and `rows` bookings - cards and the full
+representation, nested creator/user/images included - with
+API_COMPILED_SERIALIZERS off and on, checks both render the same JSON, and
+reports the median CPU time of `iterations` runs. Rows are loaded once, so
+no query time is included.
+
+Run through `python -m benchmarks serializers`.
+"""
+from django.test import override_settings
+
+from .encoding import cpu_ms
+
+
+def cases(rows):
+    """{name: (serializer class, instances, field spec)}"""
+    from apps.bookings.models import Booking
+    from apps.bookings.serializers import BookingSerializer
+    from apps.trips.models import Trip
+    from apps.trips.serializers import TripSerializer
+    from sharetrip.sparse import FieldSpec
+
+    trips = list(Trip.objects.select_related('creator').prefetch_related('images').order_by('id')[:rows])
+    bookings = list(
+        Booking.objects.select_related('trip__creator', 'user').prefetch_related('trip__images').order_by('id')[:rows]
+    )
+    return {
+        f'trip cards x{rows}': (TripSerializer, trips, FieldSpec(card=True)),
+        f'trips x{rows}': (TripSerializer, trips, None),
+        f'booking cards x{rows}': (BookingSerializer, bookings, FieldSpec(card=True)),
+        f'bookings x{rows}': (BookingSerializer, bookings, None),
+    }
+
+
+def run(rows=1000, iterations=10):
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from sharetrip.renderers import JSONRenderer
+
+    request = Request(APIRequestFactory().get('/api/trips/'))
+    results = {}
+    for name, (serializer_class, instances, spec) in cases(rows).items():
+        # The creator of the first row - its total_revenue is filled in
+        request.user = getattr(instances[0], 'creator', None) or instances[0].user
+        context = {'request': request, 'field_spec': spec}
+
+        def serialize():
+            return serializer_class(instances, many=True, context=context).data
+
+        result = results[name] = {}
+        bodies = []
+        for compiled in [False, True]:
+            with override_settings(API_COMPILED_SERIALIZERS=compiled):
+                bodies.append(JSONRenderer().render(serialize()))
+                result['compiled_ms' if compiled else 'drf_ms'] = cpu_ms(serialize, iterations)
+        result['speedup'] = round(result['drf_ms'] / result['compiled_ms'], 2)
+        result['identical'] = bodies[0] == bodies[1]
+    return results
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sharetrip.settings')
+# Route the trips catalogue to its async views (settings.ASYNC_CATALOGUE)
+os.environ.setdefault('SHARETRIP_ASYNC_CATALOGUE', '1')
 
 application = get_asgi_application()
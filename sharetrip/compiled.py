@@ -0,0 +1,163 @@
+"""
+Compiled representations
+Why: With the queries fixed, DRF's per-field machinery - get_attribute(), the
+None/SkipField checks and a to_representation() call per field and row - was
+most of the CPU time of trip and booking lists
+What: Serializers with CompiledRepresentationMixin render model instances
+through a plan built once per serializer (so once per response for a list):
+for each field, an attrgetter for its model attribute and a converter for
+its type - int, str, ISO dates, quantized Decimals, choices, method fields,
+nested serializers. Other fields (files, image variants, dotted sources,
+custom fields) keep DRF's own code, so the output is the same either way.
+
+Settings:
+    API_COMPILED_SERIALIZERS  False renders through DRF's to_representation (default True)
+"""
+import datetime
+import decimal
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import fields, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import ISO_8601, api_settings
+
+SKIP = object()
+
+
+def _identity(value):
+    return value
+
+
+def _drf_getter(field):
+    """DRF's attribute lookup for one field - defaults, SkipField and PKOnlyObject included"""
+    def get(instance):
+        try:
+            attribute = field.get_attribute(instance)
+        except SkipField:
+            return SKIP
+        check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        return None if check_for_none is None else field.to_representation(attribute)
+    return get
+
+
+def _model_getter(field, model):
+    """
+    attrgetter for a field that reads one field (or relation) of the model,
+    else None - fields with their own get_attribute() (related fields, image
+    variants) keep it
+    """
+    if len(field.source_attrs) != 1 or type(field).get_attribute is not fields.Field.get_attribute:
+        return None
+    name = field.source_attrs[0]
+    try:
+        model_field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if not model_field.concrete and model_field.get_accessor_name() != name:
+        return None
+    return attrgetter(name)
+
+
+def _is_stock(field, field_class):
+    return type(field).to_representation is field_class.to_representation
+
+
+def _converter(field):
+    """
+    The field's to_representation() for non-None values, with the common
+    cases done inline - each falls back to the field for anything unusual
+    """
+    to_representation = field.to_representation
+    if _is_stock(field, fields.IntegerField):
+        return int
+    if _is_stock(field, fields.CharField):
+        return str
+    if _is_stock(field, fields.ChoiceField):
+        choices = field.choice_strings_to_values
+
+        def convert_choice(value):
+            return choices.get(value, value) if value.__class__ is str and value else to_representation(value)
+        return convert_choice
+    if _is_stock(field, fields.DateField) and getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+        def convert_date(value):
+            return value.isoformat() if value.__class__ is datetime.date else to_representation(value)
+        return convert_date
+    if _is_stock(field, fields.DateTimeField) and getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601:
+        timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if timezone is None:
+            return to_representation
+
+        def convert_datetime(value):
+            if value.__class__ is not datetime.datetime or value.tzinfo is None:
+                return to_representation(value)
+            try:
+                value = value.astimezone(timezone).isoformat()
+            except OverflowError:
+                return to_representation(value)
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert_datetime
+    if (
+        _is_stock(field, fields.DecimalField) and field.decimal_places is not None
+        and getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        and not field.normalize_output and not field.localize
+    ):
+        exponent, max_digits = -field.decimal_places, field.max_digits
+
+        def convert_decimal(value):
+            # Already at the field's precision (as the database returns it) -
+            # quantizing would change nothing
+            if value.__class__ is decimal.Decimal:
+                digits = value.as_tuple()
+                if digits.exponent == exponent and (max_digits is None or len(digits.digits) <= max_digits):
+                    return f'{value:f}'
+            return to_representation(value)
+        return convert_decimal
+    return to_representation
+
+
+class CompiledRepresentationMixin:
+    """
+    ModelSerializer mixin - to_representation() through a plan built from
+    the serializer's readable fields on first use
+    Instances of other classes (dicts, ...) go through DRF unchanged
+    """
+
+    def representation_plan(self):
+        """[(name, get, convert)] - get returns SKIP to leave the field out"""
+        model = self.Meta.model
+        plan = []
+        for field in self._readable_fields:
+            if _is_stock(field, fields.SerializerMethodField):
+                # DRF passes the instance itself (source='*')
+                plan.append((field.field_name, _identity, getattr(field.parent, field.method_name)))
+                continue
+            get = _model_getter(field, model)
+            if get is None:
+                plan.append((field.field_name, _drf_getter(field), _identity))
+            elif isinstance(field, serializers.BaseSerializer):
+                # Nested - compiled too if it has this mixin
+                plan.append((field.field_name, get, field.to_representation))
+            else:
+                plan.append((field.field_name, get, _converter(field)))
+        return plan
+
+    def to_representation(self, instance):
+        plan = getattr(self, '_representation_plan', None)
+        if plan is None:
+            if not getattr(settings, 'API_COMPILED_SERIALIZERS', True):
+                return super().to_representation(instance)
+            plan = self._representation_plan = self.representation_plan()
+        if not isinstance(instance, self.Meta.model):
+            return super().to_representation(instance)
+
+        ret = {}
+        for name, get, convert in plan:
+            value = get(instance)
+            if value is None:
+                ret[name] = None
+            elif value is not SKIP:
+                ret[name] = convert(value)
+        return ret
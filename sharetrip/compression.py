@@ -0,0 +1,189 @@
+"""
+Response compression
+Why: Trip and booking lists are repetitive JSON - mostly field names - and
+went out uncompressed
+What: Responses of a compressible type (JSON, NDJSON, CSV, text) with at
+least COMPRESSION_MIN_SIZE bytes of body are sent gzip- or brotli-encoded,
+whichever the client's Accept-Encoding prefers (brotli on a tie - it's
+smaller). Streaming exports are compressed block by block as they go out.
+HTML isn't compressed - its pages carry CSRF tokens (BREACH).
+
+Brotli needs the `brotli` package; without it only gzip is offered.
+
+Settings:
+    COMPRESSION_MIN_SIZE        smallest body worth compressing, in bytes (default 1024)
+    COMPRESSION_GZIP_LEVEL      1-9 (default 6)
+    COMPRESSION_BROTLI_QUALITY  0-11 (default 4 - the top levels are for static files)
+"""
+import zlib
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+    'text/csv', 'text/plain', 'text/css', 'text/javascript', 'text/xml',
+}
+
+# zlib window bits for a gzip header and trailer
+GZIP_WBITS = 31
+
+
+class Gzip:
+    """One response's gzip encoder - compress() a body, or block()... finish() a stream"""
+    encoding = 'gzip'
+
+    def __init__(self, level=6):
+        self.level = level
+        self._stream = None
+
+    def compress(self, data):
+        return zlib.compress(data, self.level, wbits=GZIP_WBITS)
+
+    def block(self, data):
+        if self._stream is None:
+            self._stream = zlib.compressobj(self.level, wbits=GZIP_WBITS)
+        # Flushed per block - the client gets each block as soon as it's encoded
+        return self._stream.compress(data) + self._stream.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._stream.flush() if self._stream else self.compress(b'')
+
+
+class Brotli:
+    """One response's brotli encoder - same interface as Gzip"""
+    encoding = 'br'
+
+    def __init__(self, quality=4):
+        self.quality = quality
+        self._stream = None
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def block(self, data):
+        if self._stream is None:
+            self._stream = brotli.Compressor(quality=self.quality)
+        return self._stream.process(data) + self._stream.flush()
+
+    def finish(self):
+        return self._stream.finish() if self._stream else self.compress(b'')
+
+
+def is_compressible(response):
+    if response.has_header('Content-Encoding'):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES or content_type.endswith('+json')
+
+
+def accepted_encodings(header):
+    """Accept-Encoding -> {encoding: q}"""
+    accepted = {}
+    for item in header.split(','):
+        name, *params = item.split(';')
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name.strip():
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Compress response bodies the client accepts compressed
+    Put it below PerformanceMiddleware - the byte counts are then what is
+    sent - and above anything that changes the body
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        # In order of preference
+        self.encoders = [partial(Gzip, getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6))]
+        if brotli is not None:
+            self.encoders.insert(0, partial(Brotli, getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4)))
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def negotiate(self, request):
+        """The encoder for the client's Accept-Encoding, or None"""
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        chosen, chosen_q = None, 0.0
+        for encoder in self.encoders:
+            q = accepted.get(encoder.func.encoding, accepted.get('*', 0.0))
+            if q > chosen_q:
+                chosen, chosen_q = encoder, q
+        return chosen() if chosen else None
+
+    def process_response(self, request, response):
+        if not is_compressible(response):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoder = self.negotiate(request)
+        if encoder is None:
+            return response
+
+        if response.streaming:
+            blocks = response.streaming_content
+            response.streaming_content = (
+                self.acompress_blocks(encoder, blocks) if response.is_async
+                else self.compress_blocks(encoder, blocks)
+            )
+            # The compressed length isn't known until the last block
+            del response.headers['Content-Length']
+        else:
+            body = encoder.compress(response.content)
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response.headers['Content-Length'] = str(len(body))
+
+        # The bytes differ per encoding - a strong ETag has to become weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoder.encoding
+        return response
+
+    @staticmethod
+    def compress_blocks(encoder, blocks):
+        for block in blocks:
+            data = encoder.block(block)
+            if data:
+                yield data
+        yield encoder.finish()
+
+    @staticmethod
+    async def acompress_blocks(encoder, blocks):
+        async for block in blocks:
+            data = encoder.block(block)
+            if data:
+                yield data
+        yield encoder.finish()
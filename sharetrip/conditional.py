@@ -0,0 +1,55 @@
+"""
+Conditional GET
+Why: Polling clients re-downloaded whole trip pages and profiles that hadn't changed
+What: Helpers for views that know a page's ETag/Last-Modified before rendering
+it - answer If-None-Match/If-Modified-Since with 304 Not Modified, otherwise
+put the validators on the full response.
+
+Responses are marked `no-cache`: clients keep them but revalidate every time,
+rather than reusing them unchecked for a while because Last-Modified is old.
+HTTP dates have whole seconds, so a client sending only If-Modified-Since
+can miss a second change within the same second - If-None-Match wins when
+both are sent.
+"""
+import hashlib
+from datetime import datetime
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Weak ETag from the values the page is derived from"""
+    return 'W/"%s"' % hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _timestamp(last_modified):
+    if isinstance(last_modified, datetime):
+        last_modified = last_modified.timestamp()
+    return int(last_modified) if last_modified is not None else None
+
+
+def not_modified(request, etag, last_modified=None, private=False):
+    """
+    304 response if the client's copy is current, else None
+    last_modified: datetime or epoch seconds
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(last_modified)
+    )
+    if response is None or response.status_code != 304:
+        return None
+    return set_validators(response, etag, last_modified, private)
+
+
+def set_validators(response, etag, last_modified=None, private=False):
+    """ETag, Last-Modified and Cache-Control for a page clients may revalidate"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    directives = {'no_cache': True}
+    if private:
+        # Per-user content must not be stored by shared caches
+        directives['private'] = True
+    patch_cache_control(response, **directives)
+    return response
@@ -0,0 +1,91 @@
+"""
+Database configuration from the environment
+Why: settings.py hardcoded SQLite without CONN_MAX_AGE, so every request
+opened a new connection and production couldn't point at PostgreSQL
+What: DATABASES built from URLs, with persistent, health-checked connections.
+Read replicas get their own aliases; sharetrip.routers sends catalogue
+reads to them.
+
+Environment:
+    DATABASE_URL           primary, e.g. postgres://user:secret@db:5432/sharetrip?sslmode=require
+                           (default: db.sqlite3 next to manage.py)
+    DATABASE_REPLICA_URLS  comma-separated read replicas - aliases replica1, replica2, ...
+    DATABASE_CONN_MAX_AGE  seconds a connection is kept between requests (default 60, 0 closes it)
+    DATABASE_SQLITE_TUNED  1 to run a SQLite primary with SQLITE_TUNED_PRAGMAS and
+                           BEGIN IMMEDIATE write transactions (sharetrip.sqlite3)
+
+Only the standard library is used here - this module is imported by settings.py.
+"""
+import os
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+ENGINES = {
+    'postgres': 'django.db.backends.postgresql',
+    'postgresql': 'django.db.backends.postgresql',
+    'pgsql': 'django.db.backends.postgresql',
+    'sqlite': 'django.db.backends.sqlite3',
+}
+
+# Single-node SQLite profile - applied to every new connection
+SQLITE_TUNED_PRAGMAS = {
+    'journal_mode': 'WAL',     # Readers and the writer don't block each other
+    'synchronous': 'NORMAL',   # fsync at checkpoints, not every commit - safe with WAL
+    'busy_timeout': 5000,      # ms to wait for the write lock before `database is locked`
+    'cache_size': -65536,      # 64 MiB page cache per connection (negative = KiB)
+    'mmap_size': 268435456,    # Read the first 256 MiB of the file through mmap
+    'temp_store': 'MEMORY',    # Sorts and temporary indexes stay off disk
+}
+
+
+def parse_url(url, conn_max_age=0):
+    """One DATABASES entry from a postgres:// or sqlite:/// URL"""
+    parts = urlsplit(url)
+    engine = ENGINES.get(parts.scheme)
+    if engine is None:
+        raise ImproperlyConfigured(f'Unsupported database URL scheme {parts.scheme!r}')
+
+    config = {
+        'ENGINE': engine,
+        'CONN_MAX_AGE': conn_max_age,
+        # A connection kept from an earlier request is checked before reuse
+        'CONN_HEALTH_CHECKS': conn_max_age != 0,
+    }
+    if engine.endswith('sqlite3'):
+        # sqlite:///relative/path, sqlite:////absolute/path, sqlite://:memory:
+        config['NAME'] = parts.path[1:] if parts.path else parts.netloc
+        return config
+
+    config.update({
+        'NAME': unquote(parts.path.lstrip('/')),
+        'USER': unquote(parts.username or ''),
+        'PASSWORD': unquote(parts.password or ''),
+        'HOST': parts.hostname or '',
+        'PORT': str(parts.port or ''),
+        # ?sslmode=require&connect_timeout=5 -> connection options
+        'OPTIONS': dict(parse_qsl(parts.query)),
+    })
+    return config
+
+
+def databases_from_env(default_url, environ=os.environ):
+    """
+    Return (DATABASES, replica aliases)
+    Replicas mirror the primary in tests - Django doesn't create test databases for them
+    """
+    conn_max_age = int(environ.get('DATABASE_CONN_MAX_AGE', 60))
+    databases = {'default': parse_url(environ.get('DATABASE_URL') or default_url, conn_max_age)}
+    if environ.get('DATABASE_SQLITE_TUNED') == '1' and databases['default']['ENGINE'] == ENGINES['sqlite']:
+        databases['default'].update({
+            'ENGINE': 'sharetrip.sqlite3',
+            'OPTIONS': {'pragmas': dict(SQLITE_TUNED_PRAGMAS)},
+        })
+
+    replicas = []
+    urls = [url.strip() for url in environ.get('DATABASE_REPLICA_URLS', '').split(',')]
+    for number, url in enumerate(filter(None, urls), 1):
+        alias = f'replica{number}'
+        databases[alias] = dict(parse_url(url, conn_max_age), TEST={'MIRROR': 'default'})
+        replicas.append(alias)
+    return databases, replicas
@@ -0,0 +1,223 @@
+"""
+Off-request image processing
+
+Uploads are stored as-is on the request thread. Once the upload is
+committed, a process pool decodes it and writes resized WebP variants -
+orientation applied, EXIF/GPS metadata dropped - and the dimensions and
+variant names are recorded on the row. Serializers return the variant URLs
+instead of the multi-megabyte original.
+
+Settings:
+    IMAGE_PROCESSING_WORKERS  processes in the pool; 0 processes inline
+                              in the committing thread (tests, management commands)
+"""
+import io
+import logging
+import multiprocessing
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger('sharetrip.images')
+
+# Longest edge in pixels per variant - images are never upscaled
+TRIP_IMAGE_SIZES = {'small': 320, 'medium': 800, 'large': 1600}
+AVATAR_SIZES = {'small': 64, 'medium': 256}
+WEBP_QUALITY = 80
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def render_variants(data, sizes):
+    """
+    Decode an image and encode one WebP per size
+    Runs in a worker process - takes and returns plain bytes/dicts only
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    rendered = {'width': image.width, 'height': image.height, 'sizes': {}}
+    for name, edge in sizes.items():
+        variant = image.copy()
+        variant.thumbnail((edge, edge))
+        buffer = io.BytesIO()
+        # No exif= argument, so no metadata is written
+        variant.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+        rendered['sizes'][name] = (buffer.getvalue(), variant.width, variant.height)
+    return rendered
+
+
+def pool():
+    """
+    Process pool that does the decoding/encoding, plus a thread pool of the
+    same size that feeds it - each thread holds at most one image in memory
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = settings.IMAGE_PROCESSING_WORKERS
+            # spawn, not fork - forking a threaded server process is unsafe
+            _pool = (
+                ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')),
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix='images'),
+            )
+        return _pool
+
+
+def schedule_processing(instance, field_name, variants_field, sizes, on_done=None):
+    """Make the variants of `instance.<field_name>` once the current transaction commits"""
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(
+        lambda: dispatch(model, pk, field_name, variants_field, sizes, on_done)
+    )
+
+
+def dispatch(model, pk, field_name, variants_field, sizes, on_done=None):
+    if getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2) == 0:
+        process(model, pk, field_name, variants_field, sizes, on_done)
+        return
+
+    processes, threads = pool()
+
+    def in_background():
+        try:
+            process(
+                model, pk, field_name, variants_field, sizes, on_done,
+                render=lambda data, sizes: processes.submit(render_variants, data, sizes).result()
+            )
+        except Exception:
+            logger.exception('Image processing failed for %s %s', model.__name__, pk)
+        finally:
+            close_old_connections()
+
+    threads.submit(in_background)
+
+
+def process(model, pk, field_name, variants_field, sizes, on_done=None, render=render_variants):
+    """Read the stored upload, render its variants and record them"""
+    file = getattr(model._default_manager.filter(pk=pk).first(), field_name, None)
+    if not file:
+        return
+    with file.open('rb'):
+        data = file.read()
+    try:
+        rendered = render(data, sizes)
+    except Exception:
+        rendered = None
+        logger.exception('Could not process %s', file.name)
+    store_variants(model, pk, field_name, variants_field, file.name, rendered, on_done)
+
+
+def store_variants(model, pk, field_name, variants_field, name, rendered, on_done=None):
+    """
+    Save the rendered files and record them on the row
+    The UPDATE only matches while the row still points at the same upload,
+    so a slow job can't overwrite the variants of a newer image
+    """
+    storage = model._meta.get_field(field_name).storage
+    if rendered is None:
+        variants = {'status': 'failed'}
+    else:
+        directory, filename = posixpath.split(name)
+        stem = posixpath.splitext(filename)[0]
+        variants = {
+            'status': 'ready',
+            'width': rendered['width'],
+            'height': rendered['height'],
+            'sizes': {},
+        }
+        for size, (data, width, height) in rendered['sizes'].items():
+            saved = storage.save(
+                posixpath.join(directory, 'variants', f'{stem}_{size}.webp'), ContentFile(data)
+            )
+            variants['sizes'][size] = {'name': saved, 'width': width, 'height': height}
+
+    changes = {variants_field: variants}
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        # The row serializes differently now - its ETag (sharetrip.conditional) must change
+        changes['updated_at'] = timezone.now()
+    updated = model._default_manager.filter(pk=pk, **{field_name: name}).update(**changes)
+    if not updated:
+        delete_variants(storage, variants)
+    elif on_done:
+        on_done()
+
+
+def delete_variants(storage, variants):
+    for variant in (variants or {}).get('sizes', {}).values():
+        storage.delete(variant['name'])
+
+
+def track_image_change(instance, field_name, variants_field, update_fields=None):
+    """
+    pre_save helper - flag a new upload and drop the variants of the old one
+    Sets `instance._image_changed` for the post_save handler
+    """
+    instance._image_changed = False
+    if update_fields is not None and field_name not in update_fields:
+        return
+    file = getattr(instance, field_name)
+    previous = None
+    if instance.pk:
+        previous = type(instance)._default_manager.filter(pk=instance.pk).values_list(
+            field_name, flat=True
+        ).first()
+    if (file.name or None) == (previous or None):
+        return
+
+    instance._image_changed = bool(file)
+    old_variants = getattr(instance, variants_field)
+    setattr(instance, variants_field, {})
+    if old_variants:
+        storage = file.storage
+        transaction.on_commit(lambda: delete_variants(storage, old_variants))
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only representation of a variants JSON column
+    {'status': 'ready', 'width': .., 'height': .., 'sizes': {'small': {'url', 'width', 'height'}}}
+    Status is 'pending' until the pool has processed the upload, None without an image
+    """
+
+    def __init__(self, image_field, **kwargs):
+        kwargs['read_only'] = True
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return getattr(instance, self.image_field), super().get_attribute(instance)
+
+    def to_representation(self, value):
+        file, variants = value
+        if not file:
+            return None
+        if not variants:
+            return {'status': 'pending'}
+        if variants.get('status') != 'ready':
+            return {'status': variants.get('status')}
+
+        request = self.context.get('request')
+        sizes = {}
+        for size, variant in variants['sizes'].items():
+            url = file.storage.url(variant['name'])
+            sizes[size] = {
+                'url': request.build_absolute_uri(url) if request else url,
+                'width': variant['width'],
+                'height': variant['height'],
+            }
+        return {
+            'status': 'ready',
+            'width': variants['width'],
+            'height': variants['height'],
+            'sizes': sizes,
+        }
@@ -0,0 +1,261 @@
+"""
+Request-level performance instrumentation
+
+Records for every request: wall time, DB query count and time, serializer
+time and response size. Emits them as a Server-Timing header, keeps rolling
+per-endpoint histograms (see sharetrip.views.performance_metrics) and logs
+repeated query signatures - the fingerprint of an N+1 pattern.
+
+Settings:
+    PERF_INSTRUMENTATION            turn the middleware on/off (default True)
+    PERF_DUPLICATE_QUERY_THRESHOLD  log a query run this many times in one request
+    PERF_HISTOGRAM_WINDOW           samples kept per endpoint
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('sharetrip.performance')
+
+# Upper bounds (ms) of the latency histogram buckets
+HISTOGRAM_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf')]
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Numbers collected while one request is handled"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.signatures = Counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def duplicates(self, threshold):
+        return [(sql, count) for sql, count in self.signatures.most_common() if count >= threshold]
+
+
+def query_signature(sql):
+    """Collapse a SQL string so repeats of the same query shape compare equal"""
+    sql = re.sub(r'IN \((?:%s, )*%s\)', 'IN (...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def record_query(execute, sql, params, many, context):
+    """connection.execute_wrapper hook - times every query of the request"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.query_count += 1
+        metrics.signatures[query_signature(sql)] += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    """
+    Keep record_query on the connection for good
+    Why: Async views run their queries on another thread (sync_to_async), so a
+    per-request execute_wrapper on the request thread would miss them. The
+    wrapper does nothing outside a measured request.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class EndpointStats:
+    """
+    Rolling per-endpoint numbers
+    Why: The last N samples show current behaviour, not the process lifetime
+    """
+
+    def __init__(self, window):
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self._window))
+
+    def add(self, endpoint, sample):
+        with self._lock:
+            self._samples[endpoint].append(sample)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def snapshot(self):
+        with self._lock:
+            samples = {endpoint: list(values) for endpoint, values in self._samples.items()}
+        return {endpoint: summarize(values) for endpoint, values in sorted(samples.items())}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples):
+    """Percentiles, averages and a latency histogram for a list of samples"""
+    durations = sorted(sample['duration_ms'] for sample in samples)
+    histogram = Counter()
+    for duration in durations:
+        bucket = next(bound for bound in HISTOGRAM_BUCKETS if duration <= bound)
+        histogram['+Inf' if bucket == float('inf') else f'<={bucket}ms'] += 1
+    count = len(samples)
+    return {
+        'count': count,
+        'p50_ms': percentile(durations, 0.50),
+        'p95_ms': percentile(durations, 0.95),
+        'p99_ms': percentile(durations, 0.99),
+        'avg_queries': round(sum(s['queries'] for s in samples) / count, 2),
+        'avg_db_ms': round(sum(s['db_ms'] for s in samples) / count, 2),
+        'avg_serializer_ms': round(sum(s['serializer_ms'] for s in samples) / count, 2),
+        'avg_bytes': round(sum(s['bytes'] for s in samples) / count),
+        'histogram': dict(histogram),
+    }
+
+
+endpoint_stats = EndpointStats(getattr(settings, 'PERF_HISTOGRAM_WINDOW', 1000))
+
+
+def endpoint_name(request):
+    """Route pattern + method, e.g. 'GET api/trips/<int:pk>/'"""
+    match = getattr(request, 'resolver_match', None)
+    route = match.route if match else 'unresolved'
+    return f'{request.method} {route}'
+
+
+class PerformanceMiddleware:
+    """
+    Measure each request and publish the numbers
+    Put it near the top of MIDDLEWARE so the wall time covers the other middleware
+    Sync and async capable - under ASGI it doesn't push async views onto a thread
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERF_INSTRUMENTATION', True)
+        self.duplicate_threshold = getattr(settings, 'PERF_DUPLICATE_QUERY_THRESHOLD', 5)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        # Connections opened before this module was imported missed the signal
+        for alias in connections:
+            install_query_recorder(connections[alias])
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self.publish(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        # The context (and so the metrics) follows the request into sync_to_async threads
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self.publish(request, response, metrics)
+        return response
+
+    def publish(self, request, response, metrics):
+        total_ms = metrics.elapsed() * 1000
+        db_ms = metrics.db_time * 1000
+        serializer_ms = metrics.serializer_time * 1000
+        size = 0 if response.streaming else len(response.content)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_ms:.1f};desc="{metrics.query_count} queries"',
+            f'serializer;dur={serializer_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        endpoint = endpoint_name(request)
+        endpoint_stats.add(endpoint, {
+            'duration_ms': round(total_ms, 2),
+            'queries': metrics.query_count,
+            'db_ms': round(db_ms, 2),
+            'serializer_ms': round(serializer_ms, 2),
+            'bytes': size,
+        })
+
+        for sql, count in metrics.duplicates(self.duplicate_threshold):
+            logger.warning(
+                'Repeated query on %s: %d times in one request (possible N+1): %s',
+                endpoint, count, sql
+            )
+
+
+class InstrumentedSerializerMixin:
+    """
+    DRF view mixin that adds serializer time to the request metrics
+    Why: Serialization time is otherwise hidden inside the view time
+    What: Times every access to `serializer.data` made by the view
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        serializer.__class__ = timed_serializer_class(serializer.__class__)
+        return serializer
+
+
+_timed_classes = {}
+
+
+def timed_serializer_class(serializer_class):
+    """Subclass of `serializer_class` whose `data` property is timed (cached)"""
+    if serializer_class not in _timed_classes:
+        def data(self):
+            metrics = _current.get()
+            start = time.perf_counter()
+            try:
+                return super(timed_class, self).data
+            finally:
+                if metrics is not None:
+                    metrics.serializer_time += time.perf_counter() - start
+
+        timed_class = type(serializer_class.__name__, (serializer_class,), {
+            'data': property(data),
+            '__module__': serializer_class.__module__,
+        })
+        _timed_classes[serializer_class] = timed_class
+    return _timed_classes[serializer_class]
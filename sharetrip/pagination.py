@@ -0,0 +1,198 @@
+"""
+Pagination classes shared by the API
+
+PageNumberPagination needs COUNT(*) and OFFSET scans, which get slower the
+deeper a client pages. Keyset pagination filters on the position of the last
+row seen instead, so every page costs the same and new rows can't shift pages.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (ordering field, id)
+    Why: Page 500 costs the same as page 1 - no COUNT(*), no OFFSET
+    What: The ordering field comes from the view's OrderingFilter (first
+    field only) or the model's default ordering; id breaks ties
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request, view)
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views"""
+        queryset = self.page_queryset(queryset, request, view)
+        return self.set_page([obj async for obj in queryset])
+
+    def page_queryset(self, queryset, request, view):
+        """The query for the requested page, plus one extra row"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.field_name, self.descending = self.get_ordering(request, queryset, view)
+        self.field = queryset.model._meta.get_field(self.field_name)
+        self.position, self.backwards = self.decode_cursor(request)
+
+        reverse = self.descending != self.backwards
+        order = [f'-{self.field_name}', '-pk'] if reverse else [self.field_name, 'pk']
+        queryset = queryset.order_by(*order)
+        if self.position is not None:
+            value, pk = self.position
+            if reverse:
+                after = Q(**{f'{self.field_name}__lt': value}) | Q(**{self.field_name: value, 'pk__lt': pk})
+            else:
+                after = Q(**{f'{self.field_name}__gt': value}) | Q(**{self.field_name: value, 'pk__gt': pk})
+            queryset = queryset.filter(after)
+
+        # One extra row tells us whether there is another page
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.backwards:
+            results.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        self.page = results
+        return results
+
+    def get_ordering(self, request, queryset, view):
+        """Return (field name, descending) for the keyset"""
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if not ordering:
+            ordering = queryset.query.order_by or queryset.model._meta.ordering or ['-pk']
+
+        first = ordering[0]
+        field_name = first.lstrip('-')
+        if field_name == 'pk':
+            field_name = queryset.model._meta.pk.name
+        return field_name, first.startswith('-')
+
+    # Cursor encoding
+    def encode_cursor(self, obj, backwards):
+        payload = {
+            'o': self.field_name,
+            'v': self.field.value_to_string(obj),
+            'pk': obj.pk,
+            'b': backwards,
+        }
+        cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """Return ((value, pk), backwards) or (None, False) for the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if payload['o'] != self.field_name:
+                raise ValueError('Cursor was made for a different ordering')
+            value = self.field.to_python(payload['v'])
+            return (value, int(payload['pk'])), bool(payload['b'])
+        except (ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], backwards=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], backwards=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PageOrCursorPagination(PageNumberPagination):
+    """
+    Page numbers by default, keyset pagination when ?cursor= is sent
+    Why: Existing web clients keep ?page=, mobile clients that scroll deep
+    start with ?cursor= and follow the `next` links
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            self.keyset.page_size = self.get_page_size(request) or self.page_size
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset for async views
+        Same pages and errors as the sync path, counted and fetched with the async ORM
+        (`async for`, not aiterator(), so the queryset's prefetch_related() applies)
+        """
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            self.keyset.page_size = self.get_page_size(request) or self.page_size
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return [obj async for obj in queryset]
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Paginator.count is a cached property - fill it in without a sync query
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        return self.page.object_list
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,34 @@
+"""
+Query plan helpers
+Why: Catch endpoints whose queries fall back to full table scans
+What: Runs EXPLAIN on a queryset and reports tables read without an index
+"""
+import re
+
+from django.db import connections
+
+# SQLite: "SCAN trips" is a full scan, "SCAN trips USING INDEX x" walks an index
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (\w+)(?! USING)(?:\s|$)')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def explain(queryset):
+    """Return the database's query plan for a queryset as text"""
+    return queryset.explain()
+
+
+def full_scans(queryset):
+    """
+    Return the tables the queryset reads with a full scan
+    On PostgreSQL sequential scans are disabled for the EXPLAIN, so a seq scan
+    in the plan means no usable index exists (not just that the table is small)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        pattern = POSTGRES_FULL_SCAN
+    else:
+        pattern = SQLITE_FULL_SCAN
+    plan = explain(queryset)
+    return sorted({match.group(1) for match in pattern.finditer(plan)})
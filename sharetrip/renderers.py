@@ -0,0 +1,80 @@
+"""
+JSON renderer and parser
+Why: Encoding a page of trips or bookings with the standard library's json
+module cost about as much CPU as building it
+What: DRF's JSONRenderer/JSONParser on orjson when settings.API_JSON_ENGINE
+is 'orjson' - same bytes out (exponents aside: 1e16, not 1e+16), same data
+in. Values orjson doesn't encode itself (dates, datetimes, Decimals, lazy
+strings, ...) go through DRF's encoder, so a datetime is still
+'2026-06-01T09:30:00Z' and a Decimal outside a serializer still a number.
+Indented output (the browsable API) and values orjson refuses (integers over
+64 bits) take the stdlib path.
+
+Settings:
+    API_JSON_ENGINE  'orjson' (default) or 'json' - the standard library, as DRF does
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - listed in requirements.txt
+    orjson = None
+
+ENGINES = ('orjson', 'json')
+
+# Dates and datetimes are left to DRF's encoder - orjson writes +00:00, not Z
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+_default = JSONEncoder().default
+
+
+def json_engine():
+    """'orjson' or 'json', from settings.API_JSON_ENGINE"""
+    engine = getattr(settings, 'API_JSON_ENGINE', 'orjson')
+    if engine not in ENGINES:
+        raise ImproperlyConfigured(f'API_JSON_ENGINE must be one of {ENGINES}, not {engine!r}')
+    if engine == 'orjson' and orjson is None:
+        raise ImproperlyConfigured("API_JSON_ENGINE is 'orjson' but orjson isn't installed: pip install orjson")
+    return engine
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """DRF's JSONRenderer, on orjson unless API_JSON_ENGINE says otherwise"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None or json_engine() != 'orjson' or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # As DRF does - keep the output a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class JSONParser(parsers.JSONParser):
+    """DRF's JSONParser, on orjson unless API_JSON_ENGINE says otherwise"""
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if json_engine() != 'orjson' or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read()
+        try:
+            if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+                body = body.decode(encoding)
+            # orjson rejects NaN and Infinity, as DRF's strict parsing does
+            return orjson.loads(body)
+        except (ValueError, LookupError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,175 @@
+"""
+Read replica routing
+Why: The catalogue (TripListView/TripDetailView) is most of the read traffic
+and doesn't need the primary
+What: Views wrapped in replica_reads() read from one replica per request
+(settings.DATABASE_REPLICAS); everything else - and every write - uses the
+primary. A user who wrote something (a booking, a trip) is pinned to the
+primary for DATABASE_REPLICA_PIN_SECONDS, so they read their own writes
+while the replicas catch up.
+
+Pins are kept in the default cache by user id, so they work for session and
+token clients alike - share the cache between processes (Redis/Memcached)
+for them to follow the user across servers.
+"""
+import random
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY = 'default'
+
+
+class RoutingState:
+    """Per request: the replica reads go to (None = primary) and whether anything was written"""
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+_state = ContextVar('sharetrip_db_routing', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_seconds():
+    return getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 10)
+
+
+def _pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(_pin_key(user.pk)) is not None
+
+
+async def ais_pinned(user):
+    return user.is_authenticated and await cache.aget(_pin_key(user.pk)) is not None
+
+
+def pin_to_primary(user):
+    """Send the user's catalogue reads to the primary for the next few seconds"""
+    if user.is_authenticated:
+        cache.set(_pin_key(user.pk), True, pin_seconds())
+
+
+def current_replica():
+    """The replica this request reads from, or None"""
+    state = _state.get()
+    return state.replica if state else None
+
+
+@contextmanager
+def _reading_from(replica):
+    state = _state.get()
+    if state is None or replica is None:
+        yield
+        return
+    previous, state.replica = state.replica, replica
+    try:
+        yield
+    finally:
+        state.replica = previous
+
+
+def _choose_replica():
+    # One replica per request, so a page and its count agree
+    return random.choice(replicas()) if replicas() and _state.get() is not None else None
+
+
+@contextmanager
+def replica_reads(request):
+    """Route the reads inside the block to a replica, unless the user is pinned"""
+    replica = _choose_replica()
+    if replica and is_pinned(request.user):
+        replica = None
+    with _reading_from(replica):
+        yield
+
+
+@asynccontextmanager
+async def areplica_reads(request):
+    """replica_reads() for async views"""
+    replica = _choose_replica()
+    if replica and await ais_pinned(request.user):
+        replica = None
+    with _reading_from(replica):
+        yield
+
+
+class PrimaryReplicaRouter:
+    """Reads go to the replica chosen by replica_reads(), if any - writes to the primary"""
+
+    def db_for_read(self, model, **hints):
+        return current_replica() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Give each request its routing state and pin users who wrote something
+    Put it above SessionMiddleware - session saves count as writes too
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and replicas():
+            self.pin(request)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and replicas():
+            # The session user is loaded lazily - with a query
+            await sync_to_async(self.pin)(request)
+        return response
+
+    def pin(self, request):
+        # DRF sets request.user on the Django request once it authenticates
+        user = getattr(request, 'user', None)
+        if user is not None:
+            pin_to_primary(user)
+
+
+class ReplicaReadMixin:
+    """DRF view mixin - GET handlers read from a replica (after authentication)"""
+
+    def get(self, request, *args, **kwargs):
+        with replica_reads(request):
+            return super().get(request, *args, **kwargs)
@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
 
+from .databases import databases_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -29,11 +31,15 @@ INSTALLED_APPS = [
     'apps.users',                  # User management
     'apps.trips',                  # Trip management
     'apps.bookings',               # Booking management
+    'apps.analytics',              # Creator revenue/occupancy rollups
 ]
 
 # Middleware - processes requests/responses in order
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Must be at top for CORS
+    'sharetrip.instrumentation.PerformanceMiddleware',  # Timing, query counts, Server-Timing
+    'sharetrip.compression.CompressionMiddleware',  # gzip/brotli - below the timing, so it counts sent bytes
+    'sharetrip.routers.DatabaseRoutingMiddleware',  # Replica reads, primary after a write
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,25 +69,83 @@ TEMPLATES = [
 ]
 
 # Database configuration - SQLite for development (simple to start)
-DATABASES = {
+# Production sets DATABASE_URL (PostgreSQL) and optionally DATABASE_REPLICA_URLS,
+# see sharetrip/databases.py. Connections persist for DATABASE_CONN_MAX_AGE seconds.
+DATABASES, DATABASE_REPLICAS = databases_from_env(f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
+DATABASE_ROUTERS = ['sharetrip.routers.PrimaryReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = 10  # Reads stay on the primary this long after a user's write
+
+# Cache configuration - local memory by default
+# Point BACKEND/LOCATION at Redis or Memcached to share the cache between processes
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sharetrip',
     }
 }
 
+# Public trip catalogue cache (TripListView/TripDetailView)
+TRIP_CACHE_ALIAS = 'default'  # Which CACHES entry to use
+TRIP_CACHE_TIMEOUT = 300      # Seconds - also bounds staleness of nested creator data
+
+# Rows accepted by one POST /api/trips/import/ - bigger catalogues use import_trips
+TRIP_IMPORT_MAX_ROWS = 5000
+
+# Rows fetched and encoded per block by the CSV/NDJSON exports (sharetrip/exports.py)
+EXPORT_CHUNK_SIZE = 2000
+
+# Per-user dashboard cache (apps/users/stats.py) - 0 turns it off
+USER_STATS_CACHE_TIMEOUT = 60
+
+# Serve the trips catalogue (list/detail) from async views - set by asgi.py
+ASYNC_CATALOGUE = os.environ.get('SHARETRIP_ASYNC_CATALOGUE') == '1'
+
+# Performance instrumentation (sharetrip/instrumentation.py)
+PERF_INSTRUMENTATION = True            # Measure every request
+PERF_DUPLICATE_QUERY_THRESHOLD = 5     # Log a query repeated this often in one request (N+1)
+PERF_HISTOGRAM_WINDOW = 1000           # Samples kept per endpoint
+
+# JSON engine of the API renderer/parser (sharetrip/renderers.py): 'orjson' or 'json' (stdlib)
+API_JSON_ENGINE = os.environ.get('API_JSON_ENGINE', 'orjson')
+
+# Trip/booking/user serializers render through compiled field plans (sharetrip/compiled.py)
+API_COMPILED_SERIALIZERS = True
+
+# Response compression (sharetrip/compression.py) - brotli when the package is installed
+COMPRESSION_MIN_SIZE = 1024       # Bytes - smaller bodies go out as they are
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+
 # Django REST Framework configuration
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'sharetrip.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'sharetrip.renderers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        # Without a session cookie this costs nothing, so token requests pass straight through
         'rest_framework.authentication.SessionAuthentication',
+        # Authorization: Bearer <token> from /api/users/token/ - no session or CSRF work
+        'apps.users.authentication.BearerTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Page numbers by default, keyset (cursor) pages with ?cursor=
+    'DEFAULT_PAGINATION_CLASS': 'sharetrip.pagination.PageOrCursorPagination',
     'PAGE_SIZE': 10
 }
 
+# API tokens (apps/users/authentication.py)
+USER_TOKEN_MAX_AGE = 7 * 24 * 3600  # Seconds a token stays valid
+USER_AUTH_CACHE_TTL = 30            # Seconds a token's user is reused in-process
+USER_AUTH_CACHE_SIZE = 10000
+
 # CORS settings - allows frontend to connect to our API
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # React development server
@@ -96,6 +160,13 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Thumbnail pool for uploads (sharetrip.images) - 0 processes inline
+IMAGE_PROCESSING_WORKERS = 2
+
+# Gallery uploads (apps.trips.uploads) - checked while the body is read
+TRIP_GALLERY_MAX_FILES = 50
+TRIP_GALLERY_MAX_BYTES = 250 * 1024 * 1024
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -0,0 +1,230 @@
+"""
+Sparse fieldsets
+Why: Trip lists shipped every trip's description, its creator's profile (bio
+included) and all its images, even to clients that only render cards - and
+the queries loaded all of it
+What: `?fields=` picks the fields of a GET response, `?expand=` adds fields
+to the default; fields of nested objects are dotted:
+
+    ?fields=id,title,creator.username   exactly these fields
+    ?expand=creator,images              the default plus these
+    ?expand=trip.creator                the same, inside a nested object
+
+Lists default to each serializer's compact `card_fields`, single objects to
+every field; `id` is always included. Views with SparseFieldsViewMixin then load only what the
+response renders: .only() the columns, select_related() the nested objects
+and a pruned prefetch for nested lists - relations nobody asked for aren't
+queried.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import mixins, serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_field_paths(value):
+    """'id,creator.username' -> {'id': {}, 'creator': {'username': {}}}"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class FieldSpec:
+    """
+    The fields one serializer of a response renders
+    fields: {name: nested paths}, or None for the serializer's default
+    expand: {name: nested paths} added to the default
+    card: lists - the default is the serializer's card_fields
+    """
+
+    def __init__(self, fields=None, expand=None, card=False, path=''):
+        self.fields = fields or None
+        self.expand = expand or {}
+        self.card = card
+        self.path = path
+
+    @classmethod
+    def from_request(cls, request, card=False, default_expand=()):
+        params = request.query_params
+        fields = parse_field_paths(params.get(FIELDS_PARAM, ''))
+        expand = parse_field_paths(params.get(EXPAND_PARAM, ''))
+        if not fields:
+            for name, nested in parse_field_paths(','.join(default_expand)).items():
+                expand.setdefault(name, nested)
+        return cls(fields, expand, card)
+
+    def nested(self, name):
+        return FieldSpec(
+            (self.fields or {}).get(name), self.expand.get(name), self.card, f'{self.path}{name}.'
+        )
+
+
+def _nested_serializer(field):
+    return field.child if isinstance(field, serializers.ListSerializer) else field
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin - renders the fields its FieldSpec selects
+    card_fields: the compact default for lists (None: every field)
+    field_columns: model columns read by fields that aren't a model field
+    (method fields, ...) - LoadPlan needs them for .only()
+    The root serializer takes its FieldSpec from context['field_spec'],
+    nested ones are handed theirs by the parent; without one, nothing changes
+    """
+    card_fields = None
+    field_columns = {}
+
+    @property
+    def field_spec(self):
+        if hasattr(self, '_field_spec'):
+            return self._field_spec
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return self.context.get('field_spec') if parent is None else None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        spec = self.field_spec
+        if spec is None:
+            return fields
+
+        readable = [name for name, field in fields.items() if not field.write_only]
+        if spec.fields is not None:
+            names = list(spec.fields)
+            if 'id' in readable and 'id' not in names:
+                # The id always comes along - clients and the catalogue cache key on it
+                names.insert(0, 'id')
+        elif spec.card and self.card_fields is not None:
+            names = list(self.card_fields)
+        else:
+            names = readable
+        names += [name for name in spec.expand if name not in names]
+
+        errors = [f'Unknown field: {spec.path}{name}' for name in names if name not in readable]
+        for name in names:
+            if name not in readable:
+                continue
+            nested, nested_spec = _nested_serializer(fields[name]), spec.nested(name)
+            if isinstance(nested, SparseFieldsMixin):
+                nested._field_spec = nested_spec
+            elif nested_spec.fields or nested_spec.expand:
+                errors.append(f'Field has no fields: {spec.path}{name}')
+        if errors:
+            raise serializers.ValidationError({FIELDS_PARAM: errors})
+        # Write-only fields don't render - they stay for input
+        return {name: field for name, field in fields.items() if name in names or field.write_only}
+
+
+class LoadPlan:
+    """
+    What a serializer's fields read from the database
+    Columns for .only(), forward relations to select_related() and reverse
+    ones to prefetch - each prefetch with its own plan applied. When a field's
+    columns aren't known (a method field missing from field_columns) every
+    column is loaded.
+    """
+
+    def __init__(self, serializer, model, required=()):
+        self.model = model
+        self.columns = []
+        self.select = []
+        self.prefetch = []
+        self.complete = True
+        self._add(serializer, model, '', required)
+
+    def _add(self, serializer, model, prefix, required=()):
+        columns = [model._meta.pk.name, *required]
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            nested = _nested_serializer(field)
+            if isinstance(nested, serializers.BaseSerializer):
+                relation = model._meta.get_field(field.source)
+                if relation.concrete:
+                    # Forward foreign key - joined into the same query
+                    columns.append(field.source)
+                    self.select.append(prefix + field.source)
+                    self._add(nested, relation.related_model, f'{prefix}{field.source}__')
+                else:
+                    # Reverse relation - one query for the whole page, with the
+                    # key it is matched back on
+                    plan = LoadPlan(nested, relation.related_model, required=[relation.field.name])
+                    queryset = plan.apply(relation.related_model._default_manager.all())
+                    self.prefetch.append(Prefetch(prefix + field.source, queryset=queryset))
+                continue
+            for column in getattr(serializer, 'field_columns', {}).get(name, [field.source]):
+                if self._is_column(model, column):
+                    columns.append(column)
+                else:
+                    self.complete = False
+        self.columns += [prefix + column for column in dict.fromkeys(columns)]
+
+    @staticmethod
+    def _is_column(model, name):
+        try:
+            return model._meta.get_field(name).concrete
+        except FieldDoesNotExist:
+            return False
+
+    def apply(self, queryset):
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if self.select:
+            queryset = queryset.select_related(*self.select)
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch)
+        if not self.complete:
+            return queryset
+        # Ordering columns too - cursor pagination reads them from the last row
+        ordering = [
+            name.lstrip('-') for name in [*queryset.query.order_by, *self.model._meta.ordering]
+            if isinstance(name, str)
+        ]
+        return queryset.only(*self.columns, *[name for name in ordering if self._is_column(self.model, name)])
+
+
+class SparseFieldsViewMixin:
+    """
+    DRF view mixin - ?fields=/?expand= on GET, the card representation for
+    lists, and a queryset that loads only what the response renders
+    card_expand: fields this view's lists add to the card
+    """
+    card_expand = []
+
+    def is_list_view(self):
+        action = getattr(self, 'action', None)
+        return action == 'list' if action else isinstance(self, mixins.ListModelMixin)
+
+    def get_field_spec(self):
+        """None when the response renders the serializer as it is"""
+        request = self.request
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        if not hasattr(self, '_field_spec'):
+            is_list = self.is_list_view()
+            params = request.query_params
+            if is_list or FIELDS_PARAM in params or EXPAND_PARAM in params:
+                self._field_spec = FieldSpec.from_request(
+                    request, card=is_list, default_expand=self.card_expand if is_list else ()
+                )
+            else:
+                self._field_spec = None
+        return self._field_spec
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['field_spec'] = self.get_field_spec()
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.get_field_spec() is None:
+            return queryset
+        return LoadPlan(self.get_serializer(), queryset.model).apply(queryset)
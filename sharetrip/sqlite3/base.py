@@ -0,0 +1,38 @@
+"""
+SQLite backend with connection pragmas and write transactions
+Why: Single-node deploys stay on SQLite, where concurrent bookings failed
+with `database is locked` - a transaction that reads first takes the write
+lock only at its first write, and SQLite can't wait its way out of that
+(another writer may have changed what it read), so it fails at once
+What: The stock backend plus
+- OPTIONS['pragmas'], run on every new connection (WAL, busy_timeout, ...)
+- BEGIN IMMEDIATE for sharetrip.transactions.write_atomic() blocks, so they
+  queue for the write lock (up to busy_timeout) before reading anything
+
+ENGINE 'sharetrip.sqlite3' - sharetrip.databases selects it when
+DATABASE_SQLITE_TUNED is set.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Set by write_atomic() while its transaction begins
+        self.begin_immediate = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # Not a sqlite3.connect() argument
+        self.pragmas = params.pop('pragmas', {})
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN')
@@ -0,0 +1,30 @@
+"""
+Transactions that read, then write
+Why: Booking transactions check seats or statuses and then update them; on
+SQLite a plain BEGIN lets two of them read concurrently and then one fails
+with `database is locked` when it tries to write
+What: write_atomic() - transaction.atomic() that, on the tuned SQLite
+backend (sharetrip.sqlite3), begins with BEGIN IMMEDIATE so the write lock
+is taken up front and waited for. On other databases, or inside an outer
+transaction, it is plain atomic().
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def write_atomic(using=None):
+    connection = transaction.get_connection(using)
+    if not hasattr(connection, 'begin_immediate') or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using):
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
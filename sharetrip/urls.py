@@ -15,8 +15,15 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from .views import performance_metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/users/', include('apps.users.urls')),
+    path('api/trips/', include('apps.trips.urls')),
+    path('api/bookings/', include('apps.bookings.urls')),
+    path('api/analytics/', include('apps.analytics.urls')),
+    path('api/metrics/', performance_metrics, name='performance-metrics'),
 ]
@@ -0,0 +1,20 @@
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .instrumentation import endpoint_stats
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAdminUser])
+def performance_metrics(request):
+    """
+    Rolling per-endpoint performance numbers
+    Why: See where request time goes without attaching a profiler
+    What: GET returns latency percentiles, histogram, queries, DB/serializer
+    time and response size per endpoint (this process only); DELETE resets
+    """
+    if request.method == 'DELETE':
+        endpoint_stats.reset()
+        return Response(status=204)
+    return Response(endpoint_stats.snapshot())